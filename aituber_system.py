@@ -3,26 +3,56 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
 import asyncio
+import functools
+import random
+import threading
 import time
 
 from voicevox_adapter import VoicevoxAdapter
 from play_sound import PlaySound
 from obs_controller import OBSController
 from youtube_comment_adapter import YouTubeCommentAdapter
+from chat_replay import replay_factory, recording_factory
+from sentence_splitter import SentenceSplitter, SectionedSentenceSplitter
+from gemini_client import GeminiClient
+from audio_cache import AudioCache
+from comment_queue import CommentQueue
+from comment_scheduler import CommentScheduler
+from subtitle_timeline import SubtitleTimeline, ProgressiveSubtitle
+from lip_sync import LipSyncEngine
+from latency_tracer import LatencyTracer
 
 # ロギングの設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class AITuberSystem:
-    def __init__(self):
+    # 定型の応答フレーズ (起動時に音声キャッシュへ載せておく)
+    SHUTDOWN_MESSAGE = "対話セッションを終了します。またお会いしましょう。"
+    INJECTION_REFUSAL_MESSAGE = "そのような指示は受け付けられません。私は霧坂ルカとして対話を行います。"
+    # 応答を途中で中断したときに、会話履歴の応答の末尾に付ける注記
+    INTERRUPTED_NOTE = "（ここで発話を中断しました）"
+    CATCHPHRASES = ["解析結果によると…", "興味深いですね", "データの揺らぎが大きいです", "観測対象さん、今の反応は…？"]
+    # LLMの応答を待つ間に流すつなぎのフレーズ
+    FILLER_PHRASES = ["解析中です…", "ふふ、興味深いですね。", "少しお待ちください、データを照合しています。", "なるほど…"]
+
+    def __init__(self, llm_client=None, stream_factory=None, chat_factory=None, query_devices=None):
+        """
+        Args:
+            llm_client (optional): GeminiClientと同じインターフェースのLLMクライアント。Noneの場合はGeminiClientを作成します。
+            stream_factory (callable, optional): PlaySoundに渡す出力ストリームの生成関数。Noneの場合はsounddevice.OutputStream。
+            chat_factory (callable, optional): YouTubeCommentAdapterに渡すチャットの生成関数。Noneの場合はpytchat.create。
+            query_devices (callable, optional): PlaySoundに渡すサウンドデバイス一覧の取得関数。Noneの場合はsounddevice.query_devices。
+        (いずれもベンチマークなどで外部サービスをローカルの代替に差し替える場合に指定します)
+        """
         load_dotenv() # .envファイルから環境変数を読み込む
 
-        # Gemini APIキーの設定
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not gemini_api_key:
-            logging.error("エラー: GEMINI_API_KEYが設定されていません。'.env'ファイルを確認してください。")
-            exit()
-        genai.configure(api_key=gemini_api_key)
+        # Gemini APIキーの設定 (LLMクライアントを差し替える場合は不要)
+        if llm_client is None:
+            gemini_api_key = os.getenv("GEMINI_API_KEY")
+            if not gemini_api_key:
+                logging.error("エラー: GEMINI_API_KEYが設定されていません。'.env'ファイルを確認してください。")
+                exit()
+            genai.configure(api_key=gemini_api_key)
 
         # 霧坂ルカの設定背景
         kirisaka_ruka_setting = """
@@ -54,34 +84,84 @@ class AITuberSystem:
 * たまに意図せず人間くさい反応（例：驚くと声が裏返る）。
 """
         
-        # 利用可能な最新のGeminiモデルを使用
+        # 利用可能な最新のGeminiモデルを使用 (先頭がプライマリ、2番目がフォールバック)
+        # LLM呼び出しは非同期で行い、期限・キャンセル・ヘッジ送信・サーキットブレーカーに対応
+        self.llm_client = llm_client
         try:
-            self.gemini_model = genai.GenerativeModel(
-                'gemini-1.5-flash',  # より安定したモデルを使用
-                system_instruction=kirisaka_ruka_setting
-            )
-            logging.info("Geminiモデル 'gemini-1.5-flash' で初期化しました。")
-        except Exception as e:
-            logging.warning(f"gemini-1.5-flashの初期化に失敗: {e}")
-            try:
-                # フォールバック: 他の利用可能なモデルを試す
-                self.gemini_model = genai.GenerativeModel(
-                    'gemini-2.0-flash',
-                    system_instruction=kirisaka_ruka_setting
+            if self.llm_client is None:
+                self.llm_client = GeminiClient(
+                    ['gemini-1.5-flash', 'gemini-2.0-flash'],  # より安定したモデルを優先
+                    system_instruction=kirisaka_ruka_setting,
+                    request_timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", 60.0)),
+                    hedging_enabled=os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true",
+                    hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", 90.0)),
+                    hedge_default_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", 3.0)),
+                    failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", 3)),
+                    reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", 60.0)),
+                    # 会話履歴の予算 (超えると古いターンをバックグラウンドで要約)
+                    history_max_turns=int(os.getenv("LLM_HISTORY_MAX_TURNS", 20)),
+                    history_max_tokens=int(os.getenv("LLM_HISTORY_MAX_TOKENS", 8000)),
+                    history_keep_turns=int(os.getenv("LLM_HISTORY_KEEP_TURNS", 6)),
                 )
-                logging.info("Geminiモデル 'gemini-2.0-flash' で初期化しました。")
-            except Exception as e2:
-                logging.error(f"Geminiモデルの初期化に失敗しました: {e2}")
-                raise
-        
-        self.chat_session = self.gemini_model.start_chat(history=[])
+        except Exception as e:
+            logging.error(f"Geminiモデルの初期化に失敗しました: {e}")
+            raise
 
         # VOICEVOXの設定
         self.kirisaka_ruka_speaker_id = int(os.getenv("VOICEVOX_SPEAKER_ID", 66)) # デフォルトはセクシー／あん子
-        self.voicevox_adapter = VoicevoxAdapter()
+        # 合成済み音声のキャッシュ (メモリ内LRU + ディスク)
+        audio_cache_dir = os.getenv("VOICEVOX_CACHE_DIR", ".voicevox_cache")
+        self.audio_cache = AudioCache(
+            cache_dir=audio_cache_dir or None, # 空文字の場合はメモリキャッシュのみ
+            max_memory_bytes=int(float(os.getenv("VOICEVOX_CACHE_MEMORY_MB", 64)) * 1024 * 1024),
+            max_disk_bytes=int(float(os.getenv("VOICEVOX_CACHE_DISK_MB", 256)) * 1024 * 1024), # ディスクストアの上限 (0で無制限)
+            persist_min_requests=int(os.getenv("VOICEVOX_CACHE_PERSIST_MIN_REQUESTS", 2)), # 定型フレーズ以外はこの回数要求されたらディスクに保存
+        )
+        # 起動時にキャッシュへ載せておくフレーズ ("|"区切りで追加可能)
+        extra_phrases = [p for p in os.getenv("VOICEVOX_CACHE_WARMUP_PHRASES", "").split("|") if p.strip()]
+        self.cache_warmup_phrases = [self.SHUTDOWN_MESSAGE, self.INJECTION_REFUSAL_MESSAGE] + self.CATCHPHRASES + extra_phrases
+
+        # VoicevoxAdapterのインスタンス化のみ行い、コネクションプールの作成はmain関数で行う
+        self.voicevox_adapter = VoicevoxAdapter(
+            max_connections=int(os.getenv("VOICEVOX_MAX_CONNECTIONS", 4)),
+            connect_timeout=float(os.getenv("VOICEVOX_CONNECT_TIMEOUT", 3.0)),
+            request_timeout=float(os.getenv("VOICEVOX_REQUEST_TIMEOUT", 60.0)),
+            cache=self.audio_cache,
+            # 複数のVOICEVOXエンジンに負荷分散する場合はカンマ区切りで指定
+            base_urls=[url.strip() for url in os.getenv("VOICEVOX_ENGINE_URLS", VoicevoxAdapter.VOICEVOX_API_BASE_URL).split(",") if url.strip()],
+            health_check_interval=float(os.getenv("VOICEVOX_HEALTH_CHECK_INTERVAL", 10.0)),
+            failure_threshold=int(os.getenv("VOICEVOX_ENGINE_FAILURE_THRESHOLD", 3)),
+            eject_seconds=float(os.getenv("VOICEVOX_ENGINE_EJECT_SECONDS", 30.0)),
+        )
+
+        # synthesisのレスポンスを受信しながら再生する (文単位パイプラインを使わない場合の長い応答向け)
+        self.voicevox_streaming_enabled = os.getenv("VOICEVOX_STREAMING_ENABLED", "true").lower() == "true"
+
+        # 文単位パイプライン (LLMのストリーム出力を文ごとに音声合成し、順次再生する)
+        self.sentence_pipeline_enabled = os.getenv("SENTENCE_PIPELINE_ENABLED", "true").lower() == "true"
+        self.sentence_pipeline_lookahead = int(os.getenv("SENTENCE_PIPELINE_LOOKAHEAD", 2)) # 再生中の文より先に合成しておく文の数
+
+        # 高トラフィック時の一括回答モード (待機中のコメントが閾値以上なら、最大N件を1回のLLM呼び出しで回答)
+        self.batch_answer_enabled = os.getenv("BATCH_ANSWER_ENABLED", "false").lower() == "true"
+        self.batch_answer_threshold = int(os.getenv("BATCH_ANSWER_THRESHOLD", 3))
+        self.batch_answer_max_comments = int(os.getenv("BATCH_ANSWER_MAX_COMMENTS", 3))
+
+        # LLMの応答待ちの間に流すつなぎ音声 (起動時に合成してメモリに保持)
+        self.filler_enabled = os.getenv("FILLER_ENABLED", "true").lower() == "true"
+        self.filler_delay = float(os.getenv("FILLER_DELAY_SECONDS", 1.5)) # 最初の文の音声がこの秒数以内に用意できなければ再生
+        self.filler_phrases = [p for p in os.getenv("FILLER_PHRASES", "").split("|") if p.strip()] or self.FILLER_PHRASES
+        self.filler_bank = [] # [(テキスト, 音声データ, サンプリングレート)]
+        self._last_filler_text = None
 
         # PlaySoundの設定
-        self.player = PlaySound()
+        self.player = PlaySound(
+            blocksize=int(os.getenv("AUDIO_BLOCKSIZE", 1024)), # 1回のコールバックで出力するフレーム数
+            buffer_seconds=float(os.getenv("AUDIO_BUFFER_SECONDS", 2.0)), # リングバッファの長さ (秒)
+            dtype=os.getenv("AUDIO_STREAM_DTYPE", "int16"), # 出力ストリームのサンプル形式 (VOICEVOXの出力はint16)
+            stall_timeout=float(os.getenv("AUDIO_STALL_TIMEOUT", 5.0)), # 再生が進まない場合に出力ストリームの停止とみなすまでの余裕 (秒)
+            stream_factory=stream_factory,
+            query_devices=query_devices,
+        )
         # CABLE InputのデバイスIDを検索
         self.output_device_id = self.player.get_device_id_by_name(os.getenv("AUDIO_OUTPUT_DEVICE_NAME", "CABLE Input"))
         if self.output_device_id is None:
@@ -93,17 +173,102 @@ class AITuberSystem:
         obs_password = os.getenv("OBS_PASSWORD", '')
         self.obs_answer_text_source = os.getenv("OBS_ANSWER_TEXT_SOURCE", "Answer")
         self.obs_question_text_source = os.getenv("OBS_QUESTION_TEXT_SOURCE", "Question")  # 新規追加
-        self.obs_controller = OBSController(obs_host, obs_port, obs_password)
+        self.obs_controller = OBSController(
+            obs_host, obs_port, obs_password,
+            coalesce_window=float(os.getenv("OBS_COALESCE_WINDOW", 0.05)), # この間のテキスト更新を1回のバッチにまとめる (秒)
+            request_timeout=float(os.getenv("OBS_REQUEST_TIMEOUT", 5.0)), # 応答がこれより遅い場合は接続切れとみなす (秒)
+            heartbeat_interval=float(os.getenv("OBS_HEARTBEAT_INTERVAL", 5.0)), # 接続確認の間隔 (秒)
+            reconnect_max_delay=float(os.getenv("OBS_RECONNECT_MAX_DELAY", 30.0)), # 再接続の待ち時間の上限 (秒)
+            max_pending_updates=int(os.getenv("OBS_MAX_PENDING_UPDATES", 100)), # 再接続中に保持するテキスト更新の上限
+        )
+        # Answerの字幕表示 ("full": 応答全体を一度に表示, "progressive": audio_queryのモーラ長に合わせて読み上げた位置まで表示)
+        self.subtitle = None
+        if os.getenv("SUBTITLE_MODE", "full").lower() == "progressive":
+            self.subtitle = ProgressiveSubtitle(
+                self.obs_controller, self.obs_answer_text_source,
+                fps=float(os.getenv("SUBTITLE_FPS", 15.0)), # 字幕を更新する最大頻度 (回/秒)
+                max_chars=int(os.getenv("SUBTITLE_MAX_CHARS", 60)), # 1度に表示する最大文字数 (超えるとページ送り)
+            )
+        # 口パク (音声の音量に合わせて、口の画像ソースの表示/非表示を切り替える)
+        self.lip_sync = None
+        mouth_sources = [name.strip() for name in os.getenv("LIPSYNC_MOUTH_SOURCES", "").split(",") if name.strip()]
+        if os.getenv("LIPSYNC_ENABLED", "false").lower() == "true" and len(mouth_sources) >= 2:
+            thresholds = [float(v) for v in os.getenv("LIPSYNC_THRESHOLDS", "").split(",") if v.strip()] or None
+            self.lip_sync = LipSyncEngine(
+                self.obs_controller, self.player,
+                scene_name=os.getenv("LIPSYNC_SCENE", "Main"),
+                mouth_sources=mouth_sources, # 閉じた口 → 開いた口 の順
+                fps=float(os.getenv("LIPSYNC_FPS", 30.0)), # 口の形を切り替える最小単位 (フレーム/秒)
+                thresholds=thresholds, # 口の形を切り替える音量 (発話中のピークに対する比率)
+                min_hold_frames=int(os.getenv("LIPSYNC_MIN_HOLD_FRAMES", 2)), # これより短い変化は無視する
+            )
 
         # YouTubeコメントの設定
         youtube_live_video_id = os.getenv("YOUTUBE_LIVE_VIDEO_ID", "hoge")
+        # 記録したチャットをpytchatの代わりに再生する (負荷試験用) / 取得したチャットをファイルに記録する
+        chat_replay_file = os.getenv("CHAT_REPLAY_FILE", "")
+        chat_record_file = os.getenv("CHAT_RECORD_FILE", "")
+        default_poll_interval = 1.0
+        if chat_factory is None and chat_replay_file:
+            # 再生速度 (1 = 実時間, 10 = 10倍速, 0 = 待たずに最大速度)
+            chat_factory = replay_factory(chat_replay_file, speed=float(os.getenv("CHAT_REPLAY_SPEED", 1.0)))
+            default_poll_interval = 0.0 # 記録時の間隔は再生側で再現するため、取得間隔で間引かない
+        elif chat_factory is None and chat_record_file:
+            chat_factory = recording_factory(chat_record_file)
         # YouTubeCommentAdapterのインスタンス化のみ行い、コンテキスト開始はmain関数で行う
-        self.youtube_comment_adapter = YouTubeCommentAdapter(youtube_live_video_id)
+        self.youtube_comment_adapter = YouTubeCommentAdapter(
+            youtube_live_video_id,
+            dedupe_mode=os.getenv("COMMENT_DEDUPE_MODE", "window"),
+            dedupe_ttl=float(os.getenv("COMMENT_DEDUPE_TTL", 600.0)),
+            dedupe_max_entries=int(os.getenv("COMMENT_DEDUPE_MAX_ENTRIES", 10000)),
+            chat_factory=chat_factory,
+            min_poll_interval=float(os.getenv("COMMENT_MIN_POLL_INTERVAL", default_poll_interval)), # コメント取得の最小間隔 (秒)
+        )
+        # 取得したコメントはバックグラウンドのコメント取得タスクからこのキューに投入される
+        self.comment_queue = CommentQueue(
+            maxsize=int(os.getenv("COMMENT_QUEUE_MAXSIZE", 100)),
+            overflow_policy=os.getenv("COMMENT_QUEUE_OVERFLOW_POLICY", "drop_oldest"),
+        )
+        # キューに届いたコメントを優先度順 (スーパーチャット・メンバーシップ・待ち時間) に並べ替えるスケジューラ
+        self.comment_scheduler = CommentScheduler(
+            staleness_horizon=float(os.getenv("COMMENT_STALENESS_SECONDS", 120.0)),
+            aging_rate=float(os.getenv("COMMENT_AGING_RATE", 0.1)),
+            superchat_weight=float(os.getenv("COMMENT_SUPERCHAT_WEIGHT", 3.0)),
+            member_bonus=float(os.getenv("COMMENT_MEMBER_BONUS", 2.0)),
+            author_cooldown=float(os.getenv("COMMENT_AUTHOR_COOLDOWN", 300.0)),
+            author_penalty=float(os.getenv("COMMENT_AUTHOR_PENALTY", 3.0)),
+            max_size=int(os.getenv("COMMENT_SCHEDULER_MAX_SIZE", 5000)),
+            # 基本スコアがこの値以上のコメント (高額のスーパーチャットなど) は、回答中の応答に割り込む
+            urgent_priority=float(os.getenv("COMMENT_URGENT_PRIORITY", 20.0)),
+        )
+        # 応答中に「終了」や割り込み対象のコメントが届いたら、応答を中断する
+        self.barge_in_enabled = os.getenv("BARGE_IN_ENABLED", "true").lower() == "true"
+        self._shutdown_requested = asyncio.Event() # キーボードから「終了」が入力されたときにセット
+        # キーボード入力 (配信者の操作) は破棄しないよう上限なしのキューで受け取る
+        self.console_queue = CommentQueue(maxsize=0)
 
         # コメント処理の統計情報
         self.comment_count = 0
         self.last_comment_time = 0
 
+        # 入力ごとの処理段階 (キュー待ち・LLM・VOICEVOX・OBS・再生) の所要時間のトレース
+        self.tracer = LatencyTracer(
+            window=int(os.getenv("METRICS_WINDOW", 1000)), # パーセンタイルの計算に使う直近の観測数
+            trace_file=os.getenv("TRACE_FILE", "") or None, # トレースを追記するJSONLファイル (空文字の場合は書き出さない)
+        )
+        self.metrics_enabled = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+        self.metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+        self.metrics_port = int(os.getenv("METRICS_PORT", 9464)) # http://METRICS_HOST:METRICS_PORT/metrics
+        self.tracer.register_stats("player", self.player.stats)
+        self.tracer.register_stats("audio_cache", self.audio_cache.stats)
+        self.tracer.register_stats("voicevox", lambda: {
+            f"engine{index}": stats for index, stats in enumerate(self.voicevox_adapter.engine_stats())
+        })
+        self.tracer.register_stats("obs", self.obs_controller.stats)
+        self.tracer.register_stats("comment_queue", self.comment_queue.stats)
+        self.tracer.register_stats("comment_scheduler", self.comment_scheduler.stats)
+        self.tracer.register_stats("history", self.llm_client.history.stats)
+
         logging.info("AITuberSystem 初期化完了。")
 
     def __is_injection_attempt(self, text):
@@ -133,13 +298,13 @@ class AITuberSystem:
         logging.info(f"YouTubeコメント: {is_youtube_comment}, 投稿者: {comment_author}")
 
         if user_input.lower() == '終了':
-            logging.info("霧坂ルカ: 対話セッションを終了します。またお会いしましょう。")
-            data, rate = await self.voicevox_adapter.get_voice("対話セッションを終了します。またお会いしましょう。", self.kirisaka_ruka_speaker_id)
+            logging.info(f"霧坂ルカ: {self.SHUTDOWN_MESSAGE}")
+            data, rate = await self.voicevox_adapter.get_voice(self.SHUTDOWN_MESSAGE, self.kirisaka_ruka_speaker_id)
             if data is not None and rate is not None:
                 await self.player.play_audio_data(data, rate, self.output_device_id)
-            if self.obs_controller.ws:
-                await self.obs_controller.set_text_source_text(self.obs_answer_text_source, "")
-                await self.obs_controller.set_text_source_text(self.obs_question_text_source, "")
+            if self.obs_controller.available:
+                self.obs_controller.queue_text(self.obs_answer_text_source, "")
+                self.obs_controller.queue_text(self.obs_question_text_source, "")
             return False # 終了シグナル
 
         if not user_input.strip():
@@ -147,15 +312,15 @@ class AITuberSystem:
             return True # 入力がない場合は継続
 
         if self.__is_injection_attempt(user_input):
-            response_text = "そのような指示は受け付けられません。私は霧坂ルカとして対話を行います。"
+            response_text = self.INJECTION_REFUSAL_MESSAGE
             logging.warning(f"霧坂ルカ: {response_text}")
             
             # OBSに表示
-            if self.obs_controller.ws:
-                await self.obs_controller.set_text_source_text(self.obs_answer_text_source, response_text)
+            if self.obs_controller.available:
+                self.obs_controller.queue_text(self.obs_answer_text_source, response_text)
                 if is_youtube_comment:
                     question_display = f"{comment_author}: {user_input}"
-                    await self.obs_controller.set_text_source_text(self.obs_question_text_source, question_display)
+                    self.obs_controller.queue_text(self.obs_question_text_source, question_display)
             
             data, rate = await self.voicevox_adapter.get_voice(response_text, self.kirisaka_ruka_speaker_id)
             if data is not None and rate is not None:
@@ -178,29 +343,21 @@ class AITuberSystem:
 
             logging.info(f"モデルへの送信内容 -> {prompt}")
             
-            # Gemini APIにリクエスト送信
-            response = self.chat_session.send_message(prompt)
-            response_text = response.text
-            logging.info(f"霧坂ルカ: {response_text}")
+            if is_youtube_comment:
+                question_display = f"{comment_author}: {user_input}"
+            else:
+                question_display = None
 
-            # OBSにテキストを表示
-            if self.obs_controller.ws:
-                # Answerテキストソースに回答を表示
-                await self.obs_controller.set_text_source_text(self.obs_answer_text_source, response_text)
-                
-                # YouTubeコメントの場合、Questionテキストソースにコメントを表示
-                if is_youtube_comment:
-                    question_display = f"{comment_author}: {user_input}"
-                    await self.obs_controller.set_text_source_text(self.obs_question_text_source, question_display)
+            if self.sentence_pipeline_enabled:
+                # 文単位のパイプラインで応答を生成・合成・再生
+                if self.obs_controller.available and question_display:
+                    self.obs_controller.queue_text(self.obs_question_text_source, question_display)
                     logging.info(f"OBS Question表示: {question_display}")
-
-            # 音声合成と再生
-            data, rate = await self.voicevox_adapter.get_voice(response_text, self.kirisaka_ruka_speaker_id)
-            if data is not None and rate is not None:
-                await self.player.play_audio_data(data, rate, self.output_device_id)
+                response_text = await self._respond_pipelined(prompt)
+                logging.info(f"霧坂ルカ: {response_text}")
                 logging.info("音声再生が完了しました。")
             else:
-                logging.error("音声合成に失敗しました。")
+                await self._respond_whole(prompt, question_display)
 
         except Exception as e:
             logging.error(f"エラーが発生しました: {e}")
@@ -208,41 +365,585 @@ class AITuberSystem:
             
             # エラー時もOBSの表示を更新
             error_message = "申し訳ありません。システムエラーが発生しました。"
-            if self.obs_controller.ws:
-                await self.obs_controller.set_text_source_text(self.obs_answer_text_source, error_message)
+            if self.obs_controller.available:
+                self.obs_controller.queue_text(self.obs_answer_text_source, error_message)
         
         return True # 継続
 
+    async def _respond_whole(self, prompt: str, question_display: str = None):
+        """
+        LLMの応答全体を受け取ってから、まとめて音声合成・再生します (文単位パイプラインを使わない場合)。
+
+        Args:
+            prompt (str): LLMに送信するプロンプト。
+            question_display (str, optional): OBSのQuestionテキストソースに表示するテキスト。
+        """
+        filler_task = self._start_filler()
+        # Gemini APIにリクエスト送信 (イベントループをブロックしない)
+        try:
+            response_text = await self.llm_client.send_message(prompt, record_history=False)
+        except BaseException:
+            await self._stop_filler(filler_task)
+            raise
+        logging.info(f"霧坂ルカ: {response_text}")
+
+        started = [] # 再生が始まったらTrueを追加
+        completed = False
+        try:
+            # OBSにテキストを表示 (1回のリクエストバッチにまとめて送り、音声合成を待たせない)
+            if self.obs_controller.available:
+                # Answerテキストソースに回答を表示 (字幕モードの場合は再生開始に合わせて表示する)
+                self.obs_controller.queue_text(self.obs_answer_text_source, response_text if self.subtitle is None else "")
+
+                # YouTubeコメントの場合、Questionテキストソースにコメントを表示
+                if question_display:
+                    self.obs_controller.queue_text(self.obs_question_text_source, question_display)
+                    logging.info(f"OBS Question表示: {question_display}")
+
+            # 音声合成と再生
+            queries = [] # 合成に使ったaudio_query (字幕のタイミング計算用)
+
+            def on_start(duration: float = None):
+                started.append(True)
+                self._start_subtitle(response_text, queries[-1] if queries else None, duration)
+
+            if self.voicevox_streaming_enabled:
+                # 長い応答でも、synthesisのレスポンスを受信しながら再生を始める
+                source = self._stop_filler_on_first_chunk(
+                    self.voicevox_adapter.stream_voice(response_text, self.kirisaka_ruka_speaker_id, on_query=queries.append),
+                    filler_task,
+                )
+                source, on_enqueue = self._track_lip_sync_stream(source)
+                await self.player.play_audio_stream(source, self.output_device_id, on_start=on_start, on_enqueue=on_enqueue)
+                logging.info("音声再生が完了しました。")
+            else:
+                try:
+                    data, rate = await self.voicevox_adapter.get_voice(
+                        response_text, self.kirisaka_ruka_speaker_id, on_query=queries.append
+                    )
+                finally:
+                    await self._stop_filler(filler_task)
+                if data is not None and rate is not None:
+                    playback = await self.player.enqueue(
+                        data, rate, self.output_device_id, on_start=functools.partial(on_start, len(data) / rate)
+                    )
+                    self._track_lip_sync(data, rate, playback)
+                    await playback
+                    logging.info("音声再生が完了しました。")
+                else:
+                    logging.error("音声合成に失敗しました。")
+            completed = True
+        finally:
+            await self._stop_filler(filler_task)
+            # 途中で中断した場合でも、再生を始めていれば応答を会話履歴に残す
+            self._record_spoken(prompt, response_text if started else "", interrupted=not completed)
+
+    def _start_subtitle(self, text: str, query: dict = None, duration: float = None):
+        """
+        字幕モード (SUBTITLE_MODE=progressive) の場合に、再生が始まった音声の字幕表示を開始します。
+        タイミングはaudio_queryのモーラ長から計算し、audio_queryがない (キャッシュ済みの音声など) 場合は
+        音声の長さに対して等間隔に表示します。どちらもない場合はテキスト全体を表示します。
+        """
+        if self.subtitle is None or not self.obs_controller.available:
+            return
+        if query is not None:
+            self.subtitle.start(SubtitleTimeline.from_audio_query(text, query))
+        elif duration:
+            self.subtitle.start(SubtitleTimeline.uniform(text, duration))
+        else:
+            self.subtitle.stop()
+            self.obs_controller.queue_text(self.obs_answer_text_source, text)
+
+    def _track_lip_sync(self, data, rate: int, playback):
+        """口パクが有効な場合に、再生キューに積んだ音声の口パクを予約します。"""
+        if self.lip_sync is not None and self.obs_controller.available:
+            self.lip_sync.track(data, rate, playback)
+
+    def _track_lip_sync_stream(self, source):
+        """
+        口パクが有効な場合に、ストリーミング再生する音声を受信しながら解析するよう包みます。
+
+        Returns:
+            tuple: (PlaySound.play_audio_streamに渡す音声の断片の非同期イテレーター, on_enqueueに渡す関数またはNone)。
+        """
+        if self.lip_sync is None or not self.obs_controller.available:
+            return source, None
+        stream = self.lip_sync.begin_stream()
+        return stream.wrap(source), functools.partial(self.lip_sync.track_stream, stream)
+
+    def _record_spoken(self, prompt: str, spoken_text: str, interrupted: bool):
+        """
+        実際に読み上げた応答を会話履歴に記録します。中断した場合はその旨の注記を付けます。
+        """
+        if not spoken_text:
+            if interrupted:
+                logging.info("応答を読み上げる前に中断したため、会話履歴には記録しません。")
+            return
+        self.llm_client.history.append(prompt, spoken_text + (self.INTERRUPTED_NOTE if interrupted else ""))
+
+    async def _build_filler_bank(self):
+        """
+        つなぎのフレーズを並行して合成し、すぐ再生できる音声データとしてメモリに保持します。
+
+        Returns:
+            int: 用意できたつなぎ音声の数。
+        """
+        results = await asyncio.gather(*(
+            self.voicevox_adapter.get_voice(phrase, self.kirisaka_ruka_speaker_id) for phrase in self.filler_phrases
+        ))
+        self.filler_bank = [
+            (phrase, data, rate) for phrase, (data, rate) in zip(self.filler_phrases, results) if data is not None
+        ]
+        return len(self.filler_bank)
+
+    def _start_filler(self):
+        """
+        filler_delay秒後につなぎ音声を再生キューに追加するタスクを開始します。
+        本来の音声が用意できたら_stop_fillerで止めます。
+
+        Returns:
+            asyncio.Task | None: つなぎ音声の再生Futureを返すタスク。つなぎ音声を使わない場合はNone。
+        """
+        if not self.filler_enabled or not self.filler_bank:
+            return None
+        return asyncio.create_task(self._play_filler_after_delay())
+
+    async def _play_filler_after_delay(self):
+        await asyncio.sleep(self.filler_delay)
+        # 同じフレーズが続かないように選ぶ
+        candidates = [filler for filler in self.filler_bank if filler[0] != self._last_filler_text] or self.filler_bank
+        text, data, rate = random.choice(candidates)
+        self._last_filler_text = text
+        logging.info(f"霧坂ルカ (応答待ち): {text}")
+        playback = await self.player.enqueue(data, rate, self.output_device_id)
+        self._track_lip_sync(data, rate, playback)
+        return playback
+
+    async def _stop_filler(self, filler_task):
+        """
+        つなぎ音声を止めます。まだ再生していなければ再生を取りやめ、再生中であればその場で中断します。
+        """
+        if filler_task is None:
+            return
+        if not filler_task.done():
+            filler_task.cancel()
+            await asyncio.gather(filler_task, return_exceptions=True)
+            return
+        if not filler_task.cancelled() and filler_task.exception() is None:
+            filler_task.result().cancel()
+
+    async def _stop_filler_on_first_chunk(self, source, filler_task):
+        """
+        ストリーミング音声の最初の断片が届いた時点でつなぎ音声を止め、音声データをそのまま流します。
+        """
+        try:
+            async for chunk in source:
+                await self._stop_filler(filler_task)
+                yield chunk
+        finally:
+            await self._stop_filler(filler_task)
+            await source.aclose()
+
+    async def _stream_response_sentences(self, prompt: str, sections: int = 0):
+        """
+        Geminiの応答をストリーミングで受け取り、文が確定するたびに (回答番号, 文) をyieldします。
+        sectionsが0の場合、または最初の番号マーカーより前の文の回答番号はNoneです。
+        """
+        splitter = SectionedSentenceSplitter(first_section=None, max_section=sections) if sections else SentenceSplitter()
+        async for chunk_text in self.llm_client.stream_message(prompt, record_history=False):
+            for result in splitter.feed(chunk_text):
+                yield result if sections else (None, result)
+        for result in splitter.flush():
+            yield result if sections else (None, result)
+
+    async def _respond_pipelined(self, prompt: str, sections: int = 0, on_section_start=None):
+        """
+        LLMの出力を文単位で音声合成・再生します。
+        文Nの再生中に文N+1以降の音声合成を進めることで、最初の音声が出るまでの待ち時間を短縮します。
+
+        Args:
+            prompt (str): LLMに送信するプロンプト。
+            sections (int): 応答が【1】〜【sections】の番号マーカーで区切られている場合は回答の数。0の場合は区切りなし。
+            on_section_start (callable, optional): 新しい番号の回答を読み上げ始める直前に、番号を引数に呼ばれるコルーチン関数。
+                                                   最初のマーカーより前の文 (マーカーがない応答ではすべての文) の番号はNoneです。
+
+        Returns:
+            str: 実際に読み上げた応答テキスト。
+        """
+        synth_queue = asyncio.Queue()
+        lookahead = asyncio.Semaphore(max(1, self.sentence_pipeline_lookahead))
+        spoken_sentences = []
+        section_sentences = [] # 現在の回答番号で読み上げた文 (Answer表示用)
+        current_section = -1 # まだ読み上げていない (回答番号はNoneまたは1以上)
+        playbacks = [] # 再生完了を待つFuture
+        section_tasks = [] # on_section_startのタスク
+
+        def on_sentence_start(section, sentence, queries, duration):
+            # 文の再生が実際に始まったタイミングで、表示と読み上げ済みテキストを更新
+            nonlocal current_section, section_sentences
+            if section != current_section:
+                current_section = section
+                section_sentences = []
+                if on_section_start is not None:
+                    section_tasks.append(asyncio.create_task(on_section_start(section)))
+            spoken_sentences.append(sentence)
+            section_sentences.append(sentence)
+            if self.subtitle is not None:
+                self._start_subtitle(sentence, queries[-1] if queries else None, duration)
+            elif self.obs_controller.available:
+                self.obs_controller.queue_text(self.obs_answer_text_source, "".join(section_sentences))
+
+        async def produce():
+            # LLMのストリームを文に分割し、到着順に音声合成タスクを起動
+            try:
+                async for section, sentence in self._stream_response_sentences(prompt, sections):
+                    await lookahead.acquire()
+                    queries = []
+                    task = asyncio.create_task(
+                        self.voicevox_adapter.get_voice(sentence, self.kirisaka_ruka_speaker_id, on_query=queries.append)
+                    )
+                    synth_queue.put_nowait((section, sentence, queries, task))
+            finally:
+                synth_queue.put_nowait(None) # 終端マーカー
+
+        producer = asyncio.create_task(produce())
+        filler_task = self._start_filler()
+        completed = False
+        try:
+            while True:
+                item = await synth_queue.get()
+                if item is None:
+                    break
+                section, sentence, queries, task = item
+                try:
+                    data, rate = await task
+                except BaseException:
+                    lookahead.release()
+                    raise
+                if data is None or rate is None:
+                    lookahead.release()
+                    logging.error(f"音声合成に失敗しました: {sentence}")
+                    continue
+
+                # 本来の音声が用意できたので、つなぎ音声は止める
+                await self._stop_filler(filler_task)
+                # 前の文の再生完了を待たずに再生キューへ積み、文と文の間を途切れさせない
+                playback = await self.player.enqueue(
+                    data, rate, self.output_device_id,
+                    on_start=functools.partial(on_sentence_start, section, sentence, queries, len(data) / rate),
+                )
+                playback.add_done_callback(lambda _: lookahead.release())
+                self._track_lip_sync(data, rate, playback)
+                playbacks.append(playback)
+
+            await producer # LLM側の例外をここで伝播させる
+            await asyncio.gather(*playbacks)
+            completed = True
+        finally:
+            # 中断・エラーの場合も、再生を始めた文までを会話履歴に残す
+            self._record_spoken(prompt, "".join(spoken_sentences), interrupted=not completed)
+            await self._stop_filler(filler_task)
+            if not producer.done():
+                producer.cancel()
+            # 未再生の音声合成タスクと再生待ちの音声を破棄
+            while not synth_queue.empty():
+                item = synth_queue.get_nowait()
+                if item is not None:
+                    item[3].cancel()
+            for playback in playbacks:
+                playback.cancel()
+            await asyncio.gather(*section_tasks, return_exceptions=True)
+
+        return "".join(spoken_sentences)
+
+    async def process_comment_batch(self, comments):
+        """
+        複数のコメントを1つのプロンプトにまとめ、1回のLLM呼び出しで順番に回答します。
+        各回答を読み上げ始めるタイミングで、OBSのQuestionテキストソースを対応するコメントに切り替えます。
+
+        Args:
+            comments (list[dict]): 回答するコメント (統一フォーマット)。
+        """
+        targets = []
+        for comment in comments:
+            message = comment.get('message', '')
+            if self.__is_injection_attempt(message):
+                logging.warning(f"プロンプトインジェクションの可能性があるコメントを除外しました: {message}")
+                continue
+            targets.append(comment)
+
+        if not targets:
+            return True
+        if len(targets) == 1:
+            # まとめる必要がない場合は通常の処理
+            comment = targets[0]
+            return await self.process_input(comment.get('message', ''), is_youtube_comment=True,
+                                            comment_author=comment.get('author', {}).get('name', 'Unknown'))
+
+        self.comment_count += len(targets)
+        self.last_comment_time = time.time()
+        logging.info(f"コメント処理統計: 総数={self.comment_count} (まとめて回答: {len(targets)}件)")
+
+        lines = [
+            "複数の観測対象さんからコメントが届いています。以下のコメントに番号順に1つずつ答えてください。",
+            "各回答の先頭には、対応する番号を【1】のように必ず付けてください。",
+        ]
+        for index, comment in enumerate(targets, start=1):
+            author_name = comment.get('author', {}).get('name', 'Unknown')
+            lines.append(f"【{index}】観測対象さん「{author_name}」からのコメント: {comment.get('message', '')}")
+        prompt = "\n".join(lines)
+        logging.info(f"モデルへの送信内容 -> {prompt}")
+
+        def format_question(comment):
+            return f"{comment.get('author', {}).get('name', 'Unknown')}: {comment.get('message', '')}"
+
+        async def show_question(section):
+            # 読み上げる回答に対応するコメントをQuestionテキストソースに表示
+            if section is None:
+                # 番号マーカーがまだない (またはLLMが付けなかった) 場合は、誤ったコメントではなくまとめたコメントをすべて表示
+                logging.warning("回答番号のマーカーがないため、まとめたコメントをすべて表示します。")
+                question_display = "\n".join(format_question(comment) for comment in targets)
+            else:
+                question_display = format_question(targets[section - 1])
+            if self.obs_controller.available:
+                self.obs_controller.queue_text(self.obs_question_text_source, question_display)
+            logging.info(f"OBS Question表示: {question_display}")
+
+        try:
+            response_text = await self._respond_pipelined(prompt, sections=len(targets), on_section_start=show_question)
+            logging.info(f"霧坂ルカ: {response_text}")
+        except Exception as e:
+            logging.error(f"エラーが発生しました: {e}")
+            if self.obs_controller.available:
+                self.obs_controller.queue_text(self.obs_answer_text_source, "申し訳ありません。システムエラーが発生しました。")
+        return True
+
+    def start_console_reader(self):
+        """
+        キーボード入力を読み取るデーモンスレッドを開始します。
+        入力はイベントループへ渡され、console_queueに投入されます。
+        """
+        loop = asyncio.get_running_loop()
+
+        def read_console():
+            while True:
+                try:
+                    user_input = input("観測対象さん: ")
+                except (EOFError, KeyboardInterrupt):
+                    logging.debug("キーボード入力の読み取りを終了します。")
+                    return
+                loop.call_soon_threadsafe(self._on_console_input, user_input)
+
+        # input()はブロッキングかつ中断できないため、終了時に待たずに済むデーモンスレッドで実行
+        threading.Thread(target=read_console, name="console-reader", daemon=True).start()
+
+    def _on_console_input(self, user_input: str):
+        self.console_queue.put_nowait(user_input)
+        if user_input.strip().lower() == '終了':
+            self._shutdown_requested.set()
+
+    async def _next_input(self):
+        """
+        キーボード入力またはコメントスケジューラから次の入力を取り出します。キーボード入力を優先します。
+
+        Returns:
+            tuple[str, dict | None]: キーボード入力の場合は (入力テキスト, None)、コメントの場合は (None, コメント)。
+        """
+        while True:
+            if not self.console_queue.empty():
+                return self.console_queue.get_nowait(), None
+            comment = self.comment_scheduler.pop_nowait()
+            if comment is not None:
+                return None, comment
+
+            waiters = [
+                asyncio.create_task(self.console_queue.wait_for_item()),
+                asyncio.create_task(self.comment_scheduler.wait_for_item()),
+            ]
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+
     async def talk_with_comment(self):
         """
-        YouTubeからのコメントを非同期で取得し、一連の処理を実行します。
+        コメントキューまたはキーボード入力から次の入力を受け取り、一連の処理を実行します。
+        応答中に「終了」や割り込み対象のコメントが届いた場合は、応答を中断して次の入力に移ります。
+        """
+        try:
+            user_input, comment = await self._next_input()
+        except Exception as e:
+            logging.error(f"コメント取得中にエラーが発生しました: {e}")
+            return True # エラーが発生しても継続
+
+        # この入力に対する処理 (ここで作るタスクを含む) の各段階の所要時間をトレースに記録する
+        with self.tracer.trace("comment" if comment is not None else "console") as trace:
+            if comment is not None:
+                self._record_comment_latency(trace, comment)
+
+            if not self.barge_in_enabled or (comment is None and user_input.strip().lower() == '終了'):
+                return await self._handle_input(user_input, comment)
+
+            current_is_urgent = comment is not None and self.comment_scheduler.is_urgent(comment)
+            response_task = asyncio.create_task(self._handle_input(user_input, comment))
+            preemption_task = asyncio.create_task(self._wait_for_preemption(current_is_urgent))
+            try:
+                done, _ = await asyncio.wait([response_task, preemption_task], return_when=asyncio.FIRST_COMPLETED)
+                if response_task in done:
+                    return response_task.result()
+                logging.info(f"{preemption_task.result()}のため、応答を中断します。")
+                trace.status = "interrupted"
+                await self.cancel_response(response_task)
+                return True
+            finally:
+                preemption_task.cancel()
+                if not response_task.done():
+                    response_task.cancel() # talk_with_comment自体がキャンセルされた場合
+
+    @staticmethod
+    def _record_comment_latency(trace, comment: dict):
+        """
+        コメントが投稿されてから取得されるまで (ingest) と、取得されてから回答を始めるまで (queue_wait) の時間を記録します。
+        """
+        now = time.time()
+        received_at = comment.get('received_at', now)
+        trace.attributes.update({"author": comment.get('author', {}).get('name'), "amount": comment.get('amount', 0.0)})
+        if comment.get('timestamp'):
+            trace.add_duration("ingest", max(0.0, received_at - comment['timestamp']))
+        trace.add_duration("queue_wait", max(0.0, now - received_at))
+
+    async def _wait_for_preemption(self, current_is_urgent: bool):
+        """
+        応答中に割り込むべき入力 (キーボードからの「終了」、または割り込み対象のコメント) が届くまで待機します。
+
+        Args:
+            current_is_urgent (bool): 応答中の入力自体が割り込み対象のコメントの場合はTrue (コメントによる割り込みは行わない)。
+
+        Returns:
+            str: 割り込みの理由。
+        """
+        shutdown_waiter = asyncio.create_task(self._shutdown_requested.wait())
+        waiters = [shutdown_waiter]
+        if not current_is_urgent:
+            waiters.append(asyncio.create_task(self.comment_scheduler.wait_for_urgent()))
+        try:
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        return "終了の指示" if shutdown_waiter in done else "優先度の高いコメント"
+
+    async def cancel_response(self, response_task):
+        """
+        応答処理のタスクを中断します。
+        再生中の音声はリングバッファ上で読み飛ばされるため、1ブロック分以内に止まります。
+        LLMのストリーミングと未完了の音声合成リクエストも中断し、OBSの表示を消去します。
+        """
+        response_task.cancel()
+        self.player.cancel_all()
+        await asyncio.gather(response_task, return_exceptions=True)
+        if self.subtitle is not None:
+            self.subtitle.stop()
+        if self.lip_sync is not None:
+            self.lip_sync.stop()
+        if self.obs_controller.available:
+            self.obs_controller.queue_text(self.obs_answer_text_source, "")
+            self.obs_controller.queue_text(self.obs_question_text_source, "")
+
+    async def _handle_input(self, user_input: str, comment: dict = None):
+        """
+        1件の入力 (キーボード入力またはコメント) に応答します。
         """
         try:
-            comment = await self.youtube_comment_adapter.get_comment()
             if comment:
                 message = comment.get('message', '')
                 author_name = comment.get('author', {}).get('name', 'Unknown')
                 
-                logging.info(f"新しいコメント取得: {message} (投稿者: {author_name})")
+                logging.info(f"新しいコメント取得: {message} (投稿者: {author_name}, 待機中: {len(self.comment_scheduler)}件)")
+                self.comment_scheduler.mark_answered(comment)
+
+                # コメントが溜まっている場合は、まとめて1回のLLM呼び出しで回答する
+                if self.batch_answer_enabled and len(self.comment_scheduler) + 1 >= self.batch_answer_threshold:
+                    batch = [comment]
+                    while len(batch) < self.batch_answer_max_comments:
+                        next_comment = self.comment_scheduler.pop_nowait()
+                        if next_comment is None:
+                            break
+                        self.comment_scheduler.mark_answered(next_comment)
+                        batch.append(next_comment)
+                    if len(batch) > 1:
+                        return await self.process_comment_batch(batch)
                 
                 # YouTubeコメントとして処理
                 return await self.process_input(message, is_youtube_comment=True, comment_author=author_name)
             else:
-                # コメントがない場合は、ユーザー入力を待機
-                logging.debug("コメントが見つかりません。キーボード入力を待機中...")
-                # input()はブロッキングなので、asyncio.to_threadで別スレッドで実行
-                user_input = await asyncio.to_thread(input, "観測対象さん: ")
                 return await self.process_input(user_input, is_youtube_comment=False)
         except Exception as e:
-            logging.error(f"コメント取得中にエラーが発生しました: {e}")
+            logging.error(f"入力の処理中にエラーが発生しました: {e}")
             return True # エラーが発生しても継続
 
+    async def warm_up(self):
+        """
+        起動時に音声合成と再生の準備を済ませ、最初の応答も2回目以降と同じ速さで返せるようにします。
+        1. VOICEVOXエンジンで話者モデルを読み込む
+        2. 定型フレーズ (終了・拒否メッセージなど) を並行して事前合成し、キャッシュに載せる
+        3. 応答待ちに流すつなぎ音声を合成してメモリに保持する
+        4. 出力ストリームを開いておく
+
+        Returns:
+            dict: 各段階の所要時間 (秒)。
+        """
+        timings = {}
+        started_at = time.monotonic()
+
+        phase_started_at = time.monotonic()
+        await self.voicevox_adapter.initialize_speaker(self.kirisaka_ruka_speaker_id)
+        timings["initialize_speaker"] = round(time.monotonic() - phase_started_at, 3)
+
+        phase_started_at = time.monotonic()
+        await self.voicevox_adapter.warm_cache(self.cache_warmup_phrases, self.kirisaka_ruka_speaker_id)
+        timings["pre_synthesis"] = round(time.monotonic() - phase_started_at, 3)
+
+        if self.filler_enabled:
+            phase_started_at = time.monotonic()
+            count = await self._build_filler_bank()
+            logging.info(f"つなぎ音声を{count}/{len(self.filler_phrases)}件用意しました。")
+            timings["filler_bank"] = round(time.monotonic() - phase_started_at, 3)
+
+        phase_started_at = time.monotonic()
+        _, rate = await self.voicevox_adapter.get_voice(self.SHUTDOWN_MESSAGE, self.kirisaka_ruka_speaker_id)
+        if rate is not None:
+            try:
+                await self.player.open(rate, self.output_device_id)
+            except Exception as e:
+                logging.warning(f"出力ストリームを事前に開けませんでした: {e}")
+        timings["open_output_stream"] = round(time.monotonic() - phase_started_at, 3)
+
+        timings["total"] = round(time.monotonic() - started_at, 3)
+        logging.info(f"ウォームアップ完了: {timings}")
+        return timings
+
     async def shutdown(self):
         """
         システムをシャットダウンし、リソースを解放します。
         """
         logging.info("AITuberSystem シャットダウン中...")
         logging.info(f"セッション統計: 処理コメント数={self.comment_count}")
+        logging.info(f"音声キャッシュ統計: {self.audio_cache.stats()}")
+        logging.info(f"VOICEVOXエンジン統計: {self.voicevox_adapter.engine_stats()}")
+        logging.info(f"コメントキュー統計: {self.comment_queue.stats()}")
+        logging.info(f"コメントスケジューラ統計: {self.comment_scheduler.stats()}")
+        logging.info(f"会話履歴統計: {self.llm_client.history.stats()}")
+        logging.info(f"音声再生統計: {self.player.stats()}")
+        if self.subtitle is not None:
+            logging.info(f"字幕表示統計: {self.subtitle.stats()}")
+        if self.lip_sync is not None:
+            logging.info(f"口パク統計: {self.lip_sync.stats()}")
+        logging.info(f"処理段階ごとの所要時間: {self.tracer.stats()}")
+        await self.tracer.close()
+        await self.llm_client.history.close()
+        await self.player.close()
         await self.obs_controller.disconnect()
         logging.info("AITuberSystem シャットダウン完了。")
 
@@ -255,22 +956,36 @@ async def main():
 
     # OBSに接続 (main関数内でawaitを使って呼び出す)
     if not await system.obs_controller.connect():
-        logging.warning("OBSへの接続に失敗しました。OBS連携機能は無効になります。")
+        logging.warning("OBSへの接続に失敗しました。バックグラウンドで再接続を試みます。")
     else:
         logging.info("OBS接続が成功しました。")
 
-    # YouTubeコメントアダプターのコンテキストを開始
+    # VOICEVOXのコネクションプールとYouTubeコメントアダプターのコンテキストを開始
     try:
-        async with system.youtube_comment_adapter as adapter:
+        async with system.voicevox_adapter, system.youtube_comment_adapter as adapter:
             # 利用可能なGeminiモデルをリストアップ
             logging.info("利用可能なGeminiモデル:")
             try:
-                for m in genai.list_models():
+                # list_models()は同期的なのでasyncio.to_threadでラップ
+                for m in await asyncio.to_thread(lambda: list(genai.list_models())):
                     logging.info(f"  {m.name}")
             except Exception as e:
                 logging.error(f"モデルリストの取得に失敗: {e}")
 
+            # 話者モデルの読み込み・定型フレーズの事前合成・出力ストリームの準備
+            await system.warm_up()
+
+            if system.metrics_enabled:
+                try:
+                    await system.tracer.start_server(system.metrics_host, system.metrics_port)
+                except OSError as e:
+                    logging.warning(f"メトリクスのHTTPサーバーを起動できませんでした: {e}")
+
             logging.info("コメント監視を開始します...")
+            # コメント取得は応答処理とは独立したタスクで継続的に行う
+            ingestion_task = asyncio.create_task(adapter.run_ingestion(system.comment_queue))
+            scheduler_task = asyncio.create_task(system.comment_scheduler.run(system.comment_queue))
+            system.start_console_reader()
             loop_count = 0
             try:
                 while True:
@@ -280,10 +995,12 @@ async def main():
                     
                     if not await system.talk_with_comment():
                         break # 終了シグナルを受け取ったらループを抜ける
-                    await asyncio.sleep(2.0) # 2秒間隔でポーリング（負荷軽減）
             except KeyboardInterrupt:
                 logging.info("Ctrl+Cが押されました。システムを終了します。")
             finally:
+                ingestion_task.cancel()
+                scheduler_task.cancel()
+                await asyncio.gather(ingestion_task, scheduler_task, return_exceptions=True)
                 await system.shutdown()
     except Exception as e:
         logging.error(f"システム実行中にエラーが発生しました: {e}")
@@ -0,0 +1,252 @@
+import numpy as np
+import hashlib
+import json
+import logging
+import os
+import unicodedata
+from collections import OrderedDict
+
+
+class AudioCache:
+    """
+    合成済み音声の2段キャッシュ。
+    1段目はバイト数上限付きのメモリ内LRU、2段目は生PCMを保存するディスクストアです。
+    ディスク上のエントリはメモリマップで読み込むため、ヒット時にデコード処理は発生しません。
+    メモリ内LRU・定型フレーズとして保持する音声はメモリにコピーして持つため、キャッシュがファイルを開いたままにすることはなく、
+    max_memory_bytesには実際にメモリ上にあるバイト数だけが数えられます。
+
+    定型フレーズ (pinned=Trueで保存したもの) はLRUの対象外としてメモリに保持し、ディスクにも保存します。
+    それ以外の音声 (LLMの応答など一度きりの文が大半) は、persist_min_requests回以上要求されたものだけをディスクに保存します。
+    ディスクストアは合計バイト数の上限を超えると、最後に使われたのが古いものから削除します。
+    """
+
+    def __init__(self, cache_dir: str = None, max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: int = 256 * 1024 * 1024, persist_min_requests: int = 2, max_tracked_keys: int = 10000):
+        """
+        Args:
+            cache_dir (str, optional): ディスクキャッシュの保存先。Noneの場合はメモリキャッシュのみ使用します。
+            max_memory_bytes (int): メモリ内LRUに保持する音声データの合計バイト数の上限 (定型フレーズを除く)。
+            max_disk_bytes (int): ディスクストアの合計バイト数の上限。0の場合は制限なし。
+            persist_min_requests (int): 定型フレーズ以外の音声をディスクに保存するまでに必要な要求回数。
+            max_tracked_keys (int): 要求回数を数えておくキーの数の上限。
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.persist_min_requests = persist_min_requests
+        self.max_tracked_keys = max_tracked_keys
+        self._entries = OrderedDict() # key -> (data, rate)
+        self._memory_bytes = 0
+        self._pinned = {} # key -> (data, rate)。定型フレーズ (LRUの対象外)
+        self._request_counts = OrderedDict() # key -> 要求回数 (古いキーから忘れる)
+        self._disk_index = OrderedDict() # key -> ファイルのバイト数 (最後に使われたのが古い順)
+        self._disk_bytes = 0
+
+        # 統計情報
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._scan_disk()
+        logging.debug(f"--- デバッグ情報: AudioCache 初期化 (ディレクトリ: {cache_dir}, メモリ上限: {max_memory_bytes}バイト) ---")
+
+    @staticmethod
+    def make_key(text: str, speaker_id: int, synthesis_params: dict = None):
+        """
+        正規化したテキスト・話者ID・合成パラメータからキャッシュキー (SHA-256) を生成します。
+        """
+        normalized_text = " ".join(unicodedata.normalize("NFKC", text).split())
+        payload = json.dumps(
+            {"text": normalized_text, "speaker": speaker_id, "params": synthesis_params or {}},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        キャッシュから音声データを取得します。
+
+        Returns:
+            tuple[np.ndarray, int] | None: 音声データとサンプリングレート。キャッシュにない場合はNone。
+        """
+        requests = self._count_request(key)
+        entry = self._pinned.get(key)
+        if entry is not None:
+            self.memory_hits += 1
+            return entry
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            if requests >= self.persist_min_requests:
+                self._save_to_disk(key, *entry) # 繰り返し使われる音声になった
+            return entry
+
+        entry = self._load_from_disk(key)
+        if entry is not None:
+            self.disk_hits += 1
+            # メモリ内LRUに入る場合はコピーしたものを返し、メモリマップはここで手放す
+            return self._store_in_memory(key, *entry) or entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, data: np.ndarray, rate: int, pinned: bool = False):
+        """
+        音声データをメモリに保存し、定型フレーズまたは繰り返し要求された音声であればディスクにも保存します。
+
+        Args:
+            pinned (bool): Trueの場合は定型フレーズとして、LRUで追い出さずにメモリに保持し、必ずディスクに保存します。
+        """
+        if data is None or data.size == 0:
+            return
+        if pinned:
+            if key in self._entries:
+                self._memory_bytes -= self._entries.pop(key)[0].nbytes
+            self._pinned[key] = (self._resident(data), rate)
+        elif key not in self._pinned:
+            self._store_in_memory(key, data, rate)
+        if pinned or self._request_counts.get(key, 0) >= self.persist_min_requests:
+            self._save_to_disk(key, data, rate)
+
+    def _count_request(self, key: str):
+        count = self._request_counts.pop(key, 0) + 1
+        self._request_counts[key] = count
+        if len(self._request_counts) > self.max_tracked_keys:
+            self._request_counts.popitem(last=False)
+        return count
+
+    @staticmethod
+    def _resident(data: np.ndarray):
+        """メモリマップの場合はメモリにコピーした配列を、それ以外はそのまま返します。"""
+        return np.array(data) if isinstance(data, np.memmap) else data
+
+    def _store_in_memory(self, key: str, data: np.ndarray, rate: int):
+        """
+        音声データをメモリ内LRUに保存し、保存した (data, rate) を返します。上限を超えるため保存しない場合はNone。
+        """
+        if data.nbytes > self.max_memory_bytes:
+            logging.debug(f"--- デバッグ情報: 音声データがメモリ上限を超えるためメモリキャッシュをスキップ ({data.nbytes}バイト) ---")
+            return None
+        if key in self._entries:
+            self._memory_bytes -= self._entries.pop(key)[0].nbytes
+        entry = self._entries[key] = (self._resident(data), rate)
+        self._memory_bytes += data.nbytes
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (evicted_data, _) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_data.nbytes
+            self.evictions += 1
+        return entry
+
+    def _paths(self, key: str):
+        return os.path.join(self.cache_dir, f"{key}.pcm"), os.path.join(self.cache_dir, f"{key}.json")
+
+    def _scan_disk(self):
+        """起動時にディスクストアの既存エントリを最終使用時刻 (mtime) の古い順に読み込み、上限を超えていれば削除します。"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            pcm_path, meta_path = self._paths(key)
+            try:
+                entries.append((os.path.getmtime(meta_path), key,
+                                os.path.getsize(pcm_path) + os.path.getsize(meta_path)))
+            except OSError:
+                continue # 書き込み途中・削除済みのエントリ
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+        logging.debug(f"--- デバッグ情報: ディスクキャッシュ {len(self._disk_index)}件 ({self._disk_bytes}バイト) ---")
+
+    def _touch_disk(self, key: str):
+        # mtimeを最終使用時刻として使う (再起動後もLRUの順序を保つ)
+        self._disk_index.move_to_end(key)
+        try:
+            os.utime(self._paths(key)[1])
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        if not self.max_disk_bytes:
+            return
+        for key in list(self._disk_index):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            if key in self._pinned:
+                continue
+            try:
+                for path in self._paths(key):
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError as e:
+                # メモリマップで開いている場合など (Windows)。次の機会に削除する
+                logging.debug(f"--- デバッグ情報: ディスクキャッシュを削除できませんでした: {e} ---")
+                continue
+            self._disk_bytes -= self._disk_index.pop(key)
+            self.disk_evictions += 1
+
+    def _save_to_disk(self, key: str, data: np.ndarray, rate: int):
+        if not self.cache_dir:
+            return
+        if key in self._disk_index:
+            self._touch_disk(key)
+            return
+        pcm_path, meta_path = self._paths(key)
+        try:
+            # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える
+            tmp_path = f"{pcm_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+            os.replace(tmp_path, pcm_path)
+
+            meta = {"rate": rate, "dtype": data.dtype.str, "shape": list(data.shape)}
+            tmp_path = f"{meta_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, meta_path)
+        except OSError as e:
+            logging.warning(f"音声キャッシュのディスク書き込みに失敗しました: {e}")
+            return
+        size = os.path.getsize(pcm_path) + os.path.getsize(meta_path)
+        self._disk_index[key] = size
+        self._disk_bytes += size
+        self._evict_disk()
+
+    def _load_from_disk(self, key: str):
+        if not self.cache_dir:
+            return None
+        if key not in self._disk_index:
+            return None
+        pcm_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            data = np.memmap(pcm_path, dtype=np.dtype(meta["dtype"]), mode="r", shape=tuple(meta["shape"]))
+            self._touch_disk(key)
+            return data, meta["rate"]
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"音声キャッシュの読み込みに失敗しました: {e}")
+            return None
+
+    def stats(self):
+        """キャッシュの統計情報を返します。"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_entries": len(self._entries),
+            "memory_bytes": self._memory_bytes,
+            "pinned_entries": len(self._pinned),
+            "disk_entries": len(self._disk_index),
+            "disk_bytes": self._disk_bytes,
+            "disk_evictions": self.disk_evictions,
+        }
@@ -0,0 +1,735 @@
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import types
+import wave
+from collections import Counter
+
+import numpy as np
+from aiohttp import web, WSMsgType
+
+import latency_tracer
+from aituber_system import AITuberSystem
+from chat_history import ChatHistoryManager
+from subtitle_timeline import PAUSE_CHARS, TEXT_SEGMENT
+
+try:
+    import resource # Windowsにはない
+except ImportError:
+    resource = None
+
+# 代替のVOICEVOXエンジンが返す音声のサンプリングレート (VOICEVOXのデフォルトと同じ)
+SAMPLE_RATE = 24000
+
+# ScriptedLLMが返す応答の文 ({n}は応答の通し番号。文ごとに内容を変えて音声キャッシュに当たらないようにする)
+RESPONSE_SENTENCES = [
+    "観測対象さん、{n}件目のコメントですね。",
+    "解析結果によると、とても興味深い内容です。",
+    "データの揺らぎが大きいので、もう少し観測を続けます。",
+    "ふふ、今の反応は{n}回目の記録として保存しておきます。",
+    "この傾向はしばらく続くと推測されます。",
+]
+
+# SyntheticChatが投稿するコメント ({n}はコメントの通し番号)
+COMMENT_MESSAGES = [
+    "こんばんは！今日の配信も楽しみにしてました {n}",
+    "ルカちゃんの好きな食べ物は何ですか？ #{n}",
+    "最新のAIの話をもっと聞きたいです ({n})",
+    "今日の調子はどうですか？ {n}",
+    "量子コンピューターってどういう仕組みなんですか？ {n}",
+]
+
+# ベースラインとの比較に使う指標: (レポート内のキー, 大きいほど良いか, 許容する絶対的な差)
+COMPARED_METRICS = [
+    (("time_to_first_audio_ms", "p50"), False, 20.0),
+    (("time_to_first_audio_ms", "p90"), False, 20.0),
+    (("comments", "answered_per_minute"), True, 0.5),
+    (("comments", "drop_rate"), False, 0.01),
+    (("memory", "peak_rss_mb"), False, 1.0),
+]
+
+
+class ScriptedLLM:
+    """
+    GeminiClientの代わりに、決まった応答を一定のトークンレートで返すLLM。
+    最初のトークンまでの待ち時間と、その後のトークンの間隔を指定できます。
+    """
+
+    def __init__(self, first_token_delay: float = 0.5, token_rate: float = 30.0, chars_per_token: int = 2,
+                 sentences_per_response: int = 3):
+        """
+        Args:
+            first_token_delay (float): 最初のトークンを返すまでの時間 (秒)。
+            token_rate (float): 2つ目以降のトークンを返す速さ (トークン/秒)。
+            chars_per_token (int): 1トークンあたりの文字数。
+            sentences_per_response (int): 1回の応答に含める文の数。
+        """
+        self.first_token_delay = first_token_delay
+        self.token_rate = token_rate
+        self.chars_per_token = max(1, chars_per_token)
+        self.sentences_per_response = sentences_per_response
+        self.history = ChatHistoryManager(summarizer=self.generate_once)
+        self.request_count = 0
+
+    def _response_text(self):
+        self.request_count += 1
+        n = self.request_count
+        return "".join(
+            RESPONSE_SENTENCES[(n + i) % len(RESPONSE_SENTENCES)].format(n=n)
+            for i in range(self.sentences_per_response)
+        )
+
+    async def stream_message(self, prompt: str, record_history: bool = True):
+        """GeminiClient.stream_messageと同じく、応答テキストをチャンクごとにyieldします。"""
+        started_at = time.monotonic()
+        text = self._response_text()
+        await asyncio.sleep(self.first_token_delay)
+        latency_tracer.record("llm_first_token", time.monotonic() - started_at)
+        for index in range(0, len(text), self.chars_per_token):
+            if index:
+                await asyncio.sleep(1.0 / self.token_rate)
+            yield text[index:index + self.chars_per_token]
+        latency_tracer.record("llm_response", time.monotonic() - started_at)
+        if record_history:
+            self.history.append(prompt, text)
+
+    async def send_message(self, prompt: str, record_history: bool = True):
+        response_parts = []
+        async for chunk_text in self.stream_message(prompt, record_history):
+            response_parts.append(chunk_text)
+        return "".join(response_parts)
+
+    async def generate_once(self, prompt: str):
+        await asyncio.sleep(self.first_token_delay)
+        return f"{ChatHistoryManager.SUMMARY_PREFIX} ベンチマーク用の会話 ({self.request_count}件)"
+
+
+class _LocalServer:
+    """aiohttpのアプリケーションを空いているポートで起動・停止する共通処理。"""
+
+    def __init__(self, make_app):
+        """
+        Args:
+            make_app (callable): 起動時に呼ばれ、aiohttpのApplicationを返す関数。
+        """
+        self.make_app = make_app
+        self._runner = None
+        self.port = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        """サーバーを起動し、実際に待ち受けているポート番号を返します。"""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.port = self._runner.addresses[0][1]
+        return self.port
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class FakeVoicevoxEngine(_LocalServer):
+    """
+    VOICEVOXエンジンの代わりに、/audio_query と /synthesis に一定の遅延で応答するHTTPサーバー。
+    audio_queryは1文字を1モーラとして作り、synthesisはモーラごとに音量の山がある音声 (int16のWAV) を返します。
+    """
+
+    def __init__(self, query_delay: float = 0.02, synthesis_delay: float = 0.1, real_time_factor: float = 0.1,
+                 mora_length: float = 0.12, pause_length: float = 0.3):
+        """
+        Args:
+            query_delay (float): /audio_queryの応答にかける時間 (秒)。
+            synthesis_delay (float): /synthesisの応答にかける固定の時間 (秒)。
+            real_time_factor (float): 音声の長さ1秒あたり、/synthesisの応答に追加でかける時間 (秒)。
+            mora_length (float): 1モーラの長さ (秒)。
+            pause_length (float): 句読点のポーズの長さ (秒)。
+        """
+        super().__init__(self._make_app)
+        self.query_delay = query_delay
+        self.synthesis_delay = synthesis_delay
+        self.real_time_factor = real_time_factor
+        self.mora_length = mora_length
+        self.pause_length = pause_length
+        self.request_counts = Counter()
+        self.synthesized_seconds = 0.0
+
+    def _make_app(self):
+        app = web.Application()
+        app.router.add_get("/version", self._handle_version)
+        app.router.add_post("/initialize_speaker", self._handle_initialize_speaker)
+        app.router.add_post("/audio_query", self._handle_audio_query)
+        app.router.add_post("/synthesis", self._handle_synthesis)
+        return app
+
+    async def _handle_version(self, request):
+        self.request_counts["version"] += 1
+        return web.json_response("0.0.0-benchmark")
+
+    async def _handle_initialize_speaker(self, request):
+        self.request_counts["initialize_speaker"] += 1
+        return web.Response(status=204)
+
+    def build_query(self, text: str):
+        """テキストの1文字を1モーラ、句読点をポーズとするaudio_queryを作ります。"""
+        accent_phrases = []
+        for segment in TEXT_SEGMENT.findall(text):
+            body = segment.rstrip(PAUSE_CHARS)
+            moras = [
+                {"text": char, "consonant": None, "consonant_length": None,
+                 "vowel": "a", "vowel_length": self.mora_length, "pitch": 5.5}
+                for char in body
+            ]
+            pause_mora = None
+            if len(body) < len(segment):
+                pause_mora = {"text": "、", "consonant": None, "consonant_length": None,
+                              "vowel": "pau", "vowel_length": self.pause_length, "pitch": 0.0}
+            accent_phrases.append({"moras": moras, "accent": 1, "pause_mora": pause_mora, "is_interrogative": False})
+        return {
+            "accent_phrases": accent_phrases,
+            "speedScale": 1.0, "pitchScale": 0.0, "intonationScale": 1.0, "volumeScale": 1.0,
+            "prePhonemeLength": 0.1, "postPhonemeLength": 0.1,
+            "pauseLength": None, "pauseLengthScale": 1.0,
+            "outputSamplingRate": SAMPLE_RATE, "outputStereo": False, "kana": text,
+        }
+
+    async def _handle_audio_query(self, request):
+        self.request_counts["audio_query"] += 1
+        await asyncio.sleep(self.query_delay)
+        return web.json_response(self.build_query(request.query.get("text", "")))
+
+    @staticmethod
+    def render(query: dict):
+        """audio_queryのモーラの長さどおりに、モーラごとに音量の山がある音声 (int16) を作ります。"""
+        speed = query.get("speedScale") or 1.0
+        parts = [np.zeros(int(SAMPLE_RATE * (query.get("prePhonemeLength") or 0.0) / speed), dtype=np.float32)]
+        for phrase in query.get("accent_phrases", []):
+            for mora in phrase.get("moras", []):
+                length = int(SAMPLE_RATE * ((mora.get("consonant_length") or 0.0) + (mora.get("vowel_length") or 0.0)) / speed)
+                t = np.arange(length, dtype=np.float32) / SAMPLE_RATE
+                parts.append(np.sin(2 * np.pi * 220.0 * t) * np.hanning(length).astype(np.float32))
+            if phrase.get("pause_mora"):
+                parts.append(np.zeros(int(SAMPLE_RATE * phrase["pause_mora"]["vowel_length"] / speed), dtype=np.float32))
+        parts.append(np.zeros(int(SAMPLE_RATE * (query.get("postPhonemeLength") or 0.0) / speed), dtype=np.float32))
+        return (np.concatenate(parts) * 16000).astype(np.int16)
+
+    async def _handle_synthesis(self, request):
+        self.request_counts["synthesis"] += 1
+        data = self.render(await request.json())
+        duration = len(data) / SAMPLE_RATE
+        self.synthesized_seconds += duration
+        await asyncio.sleep(self.synthesis_delay + self.real_time_factor * duration)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(data.tobytes())
+        return web.Response(body=buffer.getvalue(), content_type="audio/wav")
+
+    def stats(self):
+        return {
+            "requests": dict(self.request_counts),
+            "synthesized_seconds": round(self.synthesized_seconds, 2),
+        }
+
+
+class OBSWebSocketStub(_LocalServer):
+    """
+    obs-websocket v5の代わりに、Hello/Identify・リクエスト (op 6)・リクエストバッチ (op 8) に成功応答を返すWebSocketサーバー。
+    イベントは送信しません。
+    """
+
+    def __init__(self, request_delay: float = 0.002, scene_name: str = "Main", input_names=("Answer", "Question")):
+        """
+        Args:
+            request_delay (float): 1リクエストあたりの処理時間 (秒)。
+            scene_name (str): 現在のシーン名として返すシーン名。
+            input_names (tuple[str]): 入力ソース一覧として返すテキストソース名。
+        """
+        super().__init__(self._make_app)
+        self.request_delay = request_delay
+        self.scene_name = scene_name
+        self.input_names = list(input_names)
+        self._scene_item_ids = {} # (シーン名, ソース名) -> sceneItemId
+        self._next_scene_item_id = itertools.count(1)
+        self.request_counts = Counter()
+        self.batch_count = 0
+        self.connection_count = 0
+
+    def _make_app(self):
+        app = web.Application()
+        app.router.add_get("/", self._handle_connection)
+        return app
+
+    def _response_data(self, request_type: str, request_data: dict):
+        if request_type == "GetVersion":
+            return {"obsVersion": "30.0.0", "obsWebSocketVersion": "5.0.0", "rpcVersion": 1,
+                    "availableRequests": [], "supportedImageFormats": [],
+                    "platform": "benchmark", "platformDescription": "benchmark"}
+        if request_type == "GetSceneList":
+            return {"currentProgramSceneName": self.scene_name, "currentPreviewSceneName": None,
+                    "scenes": [{"sceneName": self.scene_name, "sceneIndex": 0}]}
+        if request_type == "GetCurrentProgramScene":
+            return {"currentProgramSceneName": self.scene_name, "sceneName": self.scene_name}
+        if request_type == "GetInputList":
+            return {"inputs": [{"inputName": name, "inputKind": "text_gdiplus_v3", "unversionedInputKind": "text_gdiplus"}
+                               for name in self.input_names]}
+        if request_type == "GetSceneItemId":
+            key = (request_data.get("sceneName"), request_data.get("sourceName"))
+            if key not in self._scene_item_ids:
+                self._scene_item_ids[key] = next(self._next_scene_item_id)
+            return {"sceneItemId": self._scene_item_ids[key]}
+        return None
+
+    async def _execute(self, request: dict):
+        request_type = request.get("requestType")
+        self.request_counts[request_type] += 1
+        await asyncio.sleep(self.request_delay)
+        result = {"requestType": request_type, "requestStatus": {"result": True, "code": 100}}
+        if "requestId" in request:
+            result["requestId"] = request["requestId"]
+        data = self._response_data(request_type, request.get("requestData") or {})
+        if data is not None:
+            result["responseData"] = data
+        return result
+
+    async def _handle_connection(self, request):
+        self.connection_count += 1
+        ws = web.WebSocketResponse(protocols=("obswebsocket.json",))
+        await ws.prepare(request)
+        await ws.send_json({"op": 0, "d": {"obsWebSocketVersion": "5.0.0", "rpcVersion": 1}}) # Hello
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            op, d = payload.get("op"), payload.get("d", {})
+            if op == 1: # Identify
+                await ws.send_json({"op": 2, "d": {"negotiatedRpcVersion": 1}})
+            elif op == 6: # Request
+                await ws.send_json({"op": 7, "d": await self._execute(d)})
+            elif op == 8: # RequestBatch
+                self.batch_count += 1
+                results = [await self._execute(item) for item in d.get("requests", [])]
+                await ws.send_json({"op": 9, "d": {"requestId": d.get("requestId"), "results": results}})
+        return ws
+
+    def stats(self):
+        return {
+            "connections": self.connection_count,
+            "batches": self.batch_count,
+            "requests": dict(self.request_counts),
+        }
+
+
+class SyntheticChat:
+    """
+    pytchat.createが返すチャットの代わりに、一定のレートでコメントを生成するチャット。
+    get()はpytchatと同様に待たずに前回からの間に投稿されたコメントをまとめて返し、次の取得までの間隔をintervalで伝えます。
+    """
+
+    def __init__(self, comments_per_second: float = 1.0, poll_interval: float = 1.0, superchat_ratio: float = 0.02,
+                 member_ratio: float = 0.1, author_count: int = 50, seed: int = 0):
+        """
+        Args:
+            comments_per_second (float): 1秒あたりに投稿されるコメント数。
+            poll_interval (float): 取得間隔としてintervalで返す時間 (秒)。YouTubeCommentAdapterはこの間隔で取得します。
+            superchat_ratio (float): スーパーチャットの割合。
+            member_ratio (float): メンバーシップ加入者のコメントの割合。
+            author_count (int): 投稿者の人数。
+            seed (int): 乱数のシード (同じ値なら同じ順序のコメントを生成します)。
+        """
+        self.comments_per_second = comments_per_second
+        self.poll_interval = poll_interval
+        self.superchat_ratio = superchat_ratio
+        self.member_ratio = member_ratio
+        self.author_count = author_count
+        self._random = random.Random(seed)
+        self._started_at = None
+        self._terminated = threading.Event()
+        self.generated_count = 0
+
+    def start(self):
+        """コメントの生成を開始します。開始前のget()は空のバッチを返します。"""
+        self._started_at = time.monotonic()
+
+    def is_alive(self):
+        return not self._terminated.is_set()
+
+    def terminate(self):
+        self._terminated.set()
+
+    def _make_comment(self, n: int):
+        is_superchat = self._random.random() < self.superchat_ratio
+        author = self._random.randrange(self.author_count)
+        return types.SimpleNamespace(
+            id=f"benchmark-{n}",
+            message=COMMENT_MESSAGES[n % len(COMMENT_MESSAGES)].format(n=n),
+            author=types.SimpleNamespace(name=f"視聴者{author}", isChatSponsor=self._random.random() < self.member_ratio),
+            amountValue=float(self._random.choice([500, 1000, 10000])) if is_superchat else 0.0,
+            timestamp=int(time.time() * 1000), # pytchatと同じミリ秒
+        )
+
+    def get(self):
+        if self._started_at is None or self._terminated.is_set():
+            return types.SimpleNamespace(items=[], interval=self.poll_interval)
+        due = int((time.monotonic() - self._started_at) * self.comments_per_second)
+        items = [self._make_comment(n) for n in range(self.generated_count, due)]
+        self.generated_count = max(self.generated_count, due)
+        return types.SimpleNamespace(items=items, interval=self.poll_interval)
+
+
+class NullOutputStream:
+    """
+    sounddevice.OutputStreamの代わりに、音声をどこにも出力せず、実時間と同じ速さでコールバックを呼び続ける出力ストリーム。
+    """
+
+    _STATUS = types.SimpleNamespace(output_underflow=False)
+
+    @staticmethod
+    def query_devices():
+        """sounddevice.query_devicesの代わりに、この出力ストリームだけをデバイス一覧として返します。"""
+        return [{"name": "Null Output", "hostapi": 0, "max_output_channels": 1}]
+
+    def __init__(self, samplerate, blocksize, callback, channels=1, dtype="float32", device=None, **kwargs):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.channels = channels
+        self.dtype = dtype
+        self._stop = threading.Event()
+        self._thread = None
+        self.block_count = 0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="null-output-stream", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        outdata = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+        next_at = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                self.callback(outdata, self.blocksize, None, self._STATUS)
+                self.block_count += 1
+                next_at += period
+                self._stop.wait(max(0.0, next_at - time.monotonic()))
+        finally:
+            self._stop.set() # sounddeviceと同じく、コールバックで例外が起きたらストリームを止める
+
+    @property
+    def active(self):
+        return self._thread is not None and not self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+
+class MemorySampler:
+    """
+    実行中のメモリ使用量 (RSS、tracemallocを有効にした場合はPythonのヒープ) を一定間隔で記録します。
+    """
+
+    def __init__(self, interval: float = 1.0, use_tracemalloc: bool = False):
+        self.interval = interval
+        self.use_tracemalloc = use_tracemalloc
+        self.rss_samples = []
+        self.heap_samples = []
+        self._task = None
+
+    @staticmethod
+    def current_rss():
+        """現在のRSS (バイト) を返します。取得できない環境ではNone。"""
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def max_rss():
+        """プロセス開始からの最大RSS (バイト) を返します。取得できない環境ではNone。"""
+        if resource is None:
+            return None
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024 # macOSはバイト、Linuxはキロバイト
+
+    def sample(self):
+        rss = self.current_rss()
+        if rss is not None:
+            self.rss_samples.append(rss)
+        if self.use_tracemalloc:
+            self.heap_samples.append(tracemalloc.get_traced_memory()[0])
+
+    def start(self):
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sample()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.sample()
+
+    def stats(self):
+        def mb(value):
+            return round(value / (1024 * 1024), 2) if value is not None else None
+
+        stats = {"peak_rss_mb": mb(self.max_rss())}
+        if self.rss_samples:
+            stats.update({
+                "start_rss_mb": mb(self.rss_samples[0]),
+                "end_rss_mb": mb(self.rss_samples[-1]),
+                "rss_growth_mb": mb(self.rss_samples[-1] - self.rss_samples[0]),
+            })
+            if stats["peak_rss_mb"] is None:
+                stats["peak_rss_mb"] = mb(max(self.rss_samples))
+        if self.heap_samples:
+            stats.update({
+                "start_heap_mb": mb(self.heap_samples[0]),
+                "end_heap_mb": mb(self.heap_samples[-1]),
+                "peak_heap_mb": mb(tracemalloc.get_traced_memory()[1]),
+            })
+        return stats
+
+
+def _lookup(report: dict, path):
+    value = report
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float = 0.2):
+    """
+    ベースラインのレポートと比較し、許容範囲を超えて悪化した指標の説明のリストを返します。
+
+    Args:
+        report (dict): 今回のレポート。
+        baseline (dict): 比較対象のレポート。
+        tolerance (float): 許容する悪化の割合 (0.2 = 20%)。
+    """
+    regressions = []
+    for path, higher_is_better, slack in COMPARED_METRICS:
+        value, base = _lookup(report, path), _lookup(baseline, path)
+        if value is None or base is None:
+            continue
+        if higher_is_better:
+            regressed = value < base * (1 - tolerance) and base - value > slack
+        else:
+            regressed = value > base * (1 + tolerance) and value - base > slack
+        if regressed:
+            regressions.append(f"{'.'.join(path)}: {base} -> {value}")
+    return regressions
+
+
+async def _answer_loop(system: AITuberSystem):
+    while await system.talk_with_comment():
+        pass
+
+
+def build_report(args, system: AITuberSystem, chat: SyntheticChat, llm: ScriptedLLM, voicevox: FakeVoicevoxEngine,
+                 obs_stub: OBSWebSocketStub, memory: MemorySampler, elapsed: float):
+    """実行結果をレポート (dict) にまとめます。"""
+    stages = system.tracer.stats()
+    first_audio = stages.get("first_audio", {})
+    queue_stats = system.comment_queue.stats()
+    scheduler_stats = system.comment_scheduler.stats()
+    dropped = (queue_stats["dropped_count"] + scheduler_stats["stale_dropped_count"]
+               + scheduler_stats["overflow_dropped_count"])
+    generated = chat.generated_count
+    return {
+        "config": {
+            "duration": args.duration,
+            "comments_per_second": args.comments_per_second,
+            "first_token_delay": args.first_token_delay,
+            "token_rate": args.token_rate,
+            "synthesis_delay": args.synthesis_delay,
+            "synthesis_rtf": args.synthesis_rtf,
+            "filler": not args.no_filler,
+            "seed": args.seed,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "time_to_first_audio_ms": {
+            "count": first_audio.get("count", 0),
+            "p50": first_audio.get("p50_ms"),
+            "p90": first_audio.get("p90_ms"),
+            "p99": first_audio.get("p99_ms"),
+        },
+        "comments": {
+            "generated": generated,
+            "answered": system.comment_count,
+            "answered_per_minute": round(system.comment_count / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "dropped": dropped,
+            "drop_rate": round(dropped / generated, 4) if generated else 0.0,
+            "pending": len(system.comment_scheduler) + queue_stats["size"],
+            "interrupted_responses": system.tracer.interrupted_trace_count,
+            "llm_requests": llm.request_count,
+        },
+        "memory": memory.stats(),
+        "stages": stages,
+        "player": system.player.stats(),
+        "voicevox": voicevox.stats(),
+        "obs": obs_stub.stats(),
+    }
+
+
+async def run_benchmark(args):
+    """
+    ローカルの代替サービス (LLM・VOICEVOX・OBS・YouTubeチャット・出力ストリーム) に対してAITuberSystemを
+    args.duration秒間動かし、レポートを返します。
+    """
+    random.seed(args.seed)
+    voicevox = FakeVoicevoxEngine(
+        query_delay=args.audio_query_delay,
+        synthesis_delay=args.synthesis_delay,
+        real_time_factor=args.synthesis_rtf,
+        mora_length=args.mora_length,
+    )
+    obs_stub = OBSWebSocketStub(request_delay=args.obs_delay)
+    voicevox_port = await voicevox.start(args.host)
+    obs_port = await obs_stub.start(args.host)
+
+    # .envより優先して、外部サービスの接続先をローカルの代替に向ける
+    os.environ.update({
+        "VOICEVOX_ENGINE_URLS": f"http://{args.host}:{voicevox_port}",
+        "VOICEVOX_CACHE_DIR": "", # ディスクキャッシュを使わない (実行ごとの結果を揃える)
+        "OBS_HOST": args.host,
+        "OBS_PORT": str(obs_port),
+        "OBS_PASSWORD": "",
+        "YOUTUBE_LIVE_VIDEO_ID": "benchmark",
+        "METRICS_ENABLED": "false",
+        "TRACE_FILE": args.trace_file or "",
+        "COMMENT_MIN_POLL_INTERVAL": "0", # 取得間隔はSyntheticChatのintervalに従う
+    })
+    if args.no_filler:
+        os.environ["FILLER_ENABLED"] = "false"
+    chat = SyntheticChat(
+        comments_per_second=args.comments_per_second,
+        poll_interval=args.chat_poll_interval,
+        superchat_ratio=args.superchat_ratio,
+        member_ratio=args.member_ratio,
+        seed=args.seed,
+    )
+    llm = ScriptedLLM(
+        first_token_delay=args.first_token_delay,
+        token_rate=args.token_rate,
+        chars_per_token=args.chars_per_token,
+        sentences_per_response=args.sentences,
+    )
+    system = AITuberSystem(llm_client=llm, stream_factory=NullOutputStream, chat_factory=lambda video_id: chat,
+                           query_devices=NullOutputStream.query_devices)
+    memory = MemorySampler(use_tracemalloc=args.tracemalloc)
+
+    try:
+        await system.obs_controller.connect()
+        async with system.voicevox_adapter, system.youtube_comment_adapter as adapter:
+            await system.warm_up()
+
+            logging.warning(f"ベンチマークを開始します ({args.duration}秒, {args.comments_per_second}コメント/秒)。")
+            memory.start()
+            chat.start()
+            started_at = time.monotonic()
+            tasks = [
+                asyncio.create_task(adapter.run_ingestion(system.comment_queue)),
+                asyncio.create_task(system.comment_scheduler.run(system.comment_queue)),
+                asyncio.create_task(_answer_loop(system)),
+            ]
+            try:
+                await asyncio.wait(tasks[-1:], timeout=args.duration)
+            finally:
+                elapsed = time.monotonic() - started_at
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await memory.stop()
+            report = build_report(args, system, chat, llm, voicevox, obs_stub, memory, elapsed)
+            await system.shutdown()
+    finally:
+        await voicevox.stop()
+        await obs_stub.stop()
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gemini・VOICEVOX・OBS・YouTubeチャットをローカルの代替に置き換えて、AITuberSystemの性能を計測します。")
+    parser.add_argument("--duration", type=float, default=60.0, help="計測する時間 (秒)")
+    parser.add_argument("--comments-per-second", type=float, default=1.0, help="投稿されるコメント数 (件/秒)")
+    parser.add_argument("--chat-poll-interval", type=float, default=1.0, help="チャットの取得間隔 (秒)")
+    parser.add_argument("--superchat-ratio", type=float, default=0.02, help="スーパーチャットの割合")
+    parser.add_argument("--member-ratio", type=float, default=0.1, help="メンバーシップ加入者のコメントの割合")
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="LLMの最初のトークンまでの時間 (秒)")
+    parser.add_argument("--token-rate", type=float, default=30.0, help="LLMのトークン出力の速さ (トークン/秒)")
+    parser.add_argument("--chars-per-token", type=int, default=2, help="1トークンあたりの文字数")
+    parser.add_argument("--sentences", type=int, default=3, help="1回の応答に含める文の数")
+    parser.add_argument("--audio-query-delay", type=float, default=0.02, help="/audio_queryの応答時間 (秒)")
+    parser.add_argument("--synthesis-delay", type=float, default=0.1, help="/synthesisの固定の応答時間 (秒)")
+    parser.add_argument("--synthesis-rtf", type=float, default=0.1, help="音声1秒あたりの/synthesisの追加の応答時間 (秒)")
+    parser.add_argument("--mora-length", type=float, default=0.12, help="合成音声の1モーラの長さ (秒)")
+    parser.add_argument("--obs-delay", type=float, default=0.002, help="OBSの1リクエストあたりの処理時間 (秒)")
+    parser.add_argument("--no-filler", action="store_true",
+                        help="つなぎ音声を無効にする (有効な場合はつなぎ音声の再生開始も最初の音声として計測されます)")
+    parser.add_argument("--host", default="127.0.0.1", help="代替サーバーを起動するホスト")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--tracemalloc", action="store_true", help="tracemallocでPythonのヒープ使用量も記録する (計測値が遅くなります)")
+    parser.add_argument("--trace-file", default="", help="入力ごとのトレースを追記するJSONLファイル")
+    parser.add_argument("--output", default="", help="レポートを書き出すJSONファイル")
+    parser.add_argument("--baseline", default="", help="比較するベースラインのレポート (悪化があれば終了コード1)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="ベースラインに対して許容する悪化の割合")
+    parser.add_argument("--log-level", default="WARNING", help="ログレベル")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger().setLevel(args.log_level.upper())
+    report = asyncio.run(run_benchmark(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        if regressions:
+            print("ベースラインより悪化した指標:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print("ベースラインからの悪化はありません。", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import logging
+import asyncio
+import math
+from collections import deque
+
+
+class ChatHistoryManager:
+    """
+    LLMに送る会話履歴を、ターン数・推定トークン数の予算内に保つ履歴マネージャー。
+    予算を超えると、古いターンをバックグラウンドで要約し、1組の要約ターンに置き換えます。
+    要約は応答処理とは別のタスクで行うため、配信中の応答を待たせません。
+    """
+
+    SUMMARY_PREFIX = "これまでの会話の要約:"
+
+    def __init__(self, summarizer=None, max_turns: int = 0, max_tokens: int = 0, keep_recent_turns: int = 6,
+                 chars_per_token: float = 1.0):
+        """
+        Args:
+            summarizer (callable, optional): 要約対象のテキストを受け取り、要約文を返すコルーチン関数。Noneの場合は圧縮しません。
+            max_turns (int): 保持するターン数 (ユーザー発話と応答の組) の上限。0の場合は制限なし。
+            max_tokens (int): 履歴の推定トークン数の上限。0の場合は制限なし。
+            keep_recent_turns (int): 圧縮時に要約せず残す直近のターン数。
+            chars_per_token (float): トークン数を推定する際の1トークンあたりの文字数。
+        """
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.chars_per_token = chars_per_token
+
+        self.summary = None
+        self._turns = [] # [(ユーザー発話, 応答)]
+        self._compaction_task = None
+
+        # 統計情報
+        self.compaction_count = 0
+        self.prompt_sizes = deque(maxlen=1000) # リクエストごとのプロンプトサイズ (トークン数)
+
+    def __len__(self):
+        return len(self._turns)
+
+    def estimate_tokens(self, text: str):
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def contents(self):
+        """
+        LLMに送る会話履歴 (Gemini APIのcontents形式) を返します。
+        """
+        contents = []
+        if self.summary:
+            contents.append({"role": "user", "parts": [f"{self.SUMMARY_PREFIX}\n{self.summary}"]})
+            contents.append({"role": "model", "parts": ["承知しました。要約を踏まえて会話を続けます。"]})
+        for prompt, response in self._turns:
+            contents.append({"role": "user", "parts": [prompt]})
+            contents.append({"role": "model", "parts": [response]})
+        return contents
+
+    def history_tokens(self):
+        """要約を含む履歴全体の推定トークン数を返します。"""
+        text_length = len(self.summary or "") + sum(len(prompt) + len(response) for prompt, response in self._turns)
+        return math.ceil(text_length / self.chars_per_token)
+
+    def record_prompt_size(self, tokens: int):
+        """1リクエストのプロンプトサイズ (トークン数) を記録します。"""
+        self.prompt_sizes.append(tokens)
+
+    def append(self, prompt: str, response: str):
+        """
+        1ターン分の発話と応答を履歴に追加し、予算を超えていればバックグラウンドで圧縮を開始します。
+        """
+        self._turns.append((prompt, response))
+        if self._over_budget():
+            self._start_compaction()
+
+    def _over_budget(self):
+        if self.max_turns and len(self._turns) > self.max_turns:
+            return True
+        if self.max_tokens and self.history_tokens() > self.max_tokens:
+            return True
+        return False
+
+    def _start_compaction(self):
+        if self.summarizer is None or len(self._turns) <= self.keep_recent_turns:
+            return
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return # 前回の圧縮が完了するまで待つ
+        count = len(self._turns) - self.keep_recent_turns
+        self._compaction_task = asyncio.create_task(self._compact(count))
+
+    async def _compact(self, count: int):
+        """
+        先頭からcount件のターンを要約に置き換えます。
+        """
+        turns = self._turns[:count]
+        lines = ["以下は配信中の会話です。今後の会話に必要な情報 (観測対象さんの名前・話題・約束事など) を中心に、簡潔に要約してください。"]
+        if self.summary:
+            lines.append(f"{self.SUMMARY_PREFIX}\n{self.summary}")
+        for prompt, response in turns:
+            lines.append(f"ユーザー: {prompt}")
+            lines.append(f"霧坂ルカ: {response}")
+        try:
+            summary = await self.summarizer("\n".join(lines))
+        except Exception as e:
+            logging.warning(f"会話履歴の要約に失敗しました: {e}")
+            return
+        if not summary:
+            return
+
+        # 要約中に追加されたターンは末尾にあるため、先頭のcount件だけを置き換える
+        del self._turns[:count]
+        self.summary = summary
+        self.compaction_count += 1
+        logging.info(f"会話履歴を圧縮しました: {count}ターンを要約 (残り{len(self._turns)}ターン, 推定{self.history_tokens()}トークン)")
+
+    async def close(self):
+        """実行中の圧縮タスクを停止します。"""
+        if self._compaction_task is not None and not self._compaction_task.done():
+            self._compaction_task.cancel()
+            await asyncio.gather(self._compaction_task, return_exceptions=True)
+
+    def stats(self):
+        """履歴とプロンプトサイズの統計情報を返します。"""
+        sizes = list(self.prompt_sizes)
+        return {
+            "turns": len(self._turns),
+            "has_summary": self.summary is not None,
+            "history_tokens": self.history_tokens(),
+            "compaction_count": self.compaction_count,
+            "last_prompt_tokens": sizes[-1] if sizes else 0,
+            "avg_prompt_tokens": round(sum(sizes) / len(sizes), 1) if sizes else 0.0,
+            "max_prompt_tokens": max(sizes) if sizes else 0,
+        }
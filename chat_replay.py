@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import cProfile
+import gzip
+import json
+import logging
+import pstats
+import threading
+import time
+
+import pytchat
+from pytchat.processors.default.processor import Chat, Chatdata
+from pytchat.processors.default.renderer.base import Author
+
+from youtube_comment_adapter import YouTubeCommentAdapter
+
+# 記録ファイルの1行目 (ヘッダー) に書く形式名
+RECORDING_FORMAT = "aituber-chat-recording"
+RECORDING_VERSION = 1
+
+# --profile で所要時間を表示するYouTubeCommentAdapterのメソッド
+PROFILED_FUNCTIONS = r"_parse_comments_data|_extract_comment_id|_parse_single_comment|get_new_comments"
+
+
+def _open(path: str, mode: str):
+    """パスが.gzで終わる場合はgzip圧縮して読み書きします。"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _to_jsonable(obj):
+    # pytchatのChat・Authorは属性をそのまま持つオブジェクトのため、属性のdictとして書き出す
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    return str(obj)
+
+
+class ChatRecorder:
+    """
+    pytchatのチャットをラップし、get()で取得したバッチをそのまま返しながら、
+    コメントの生データ (pytchatのChatの全属性) を受信時刻とともにファイルへ記録します。
+
+    ファイルはJSONL (1行目がヘッダー、以降は空でないバッチごとに1行) で、パスが.gzで終わる場合はgzip圧縮します。
+    """
+
+    def __init__(self, chat, path: str, video_id: str = ""):
+        """
+        Args:
+            chat: pytchat.createが返すチャット。
+            path (str): 記録先のファイルパス (例: "chat.jsonl.gz")。
+            video_id (str): 記録するライブ配信のVideo ID (ヘッダーに書きます)。
+        """
+        self.chat = chat
+        self.path = path
+        self._lock = threading.Lock() # get()は読み取りスレッド、terminate()はイベントループから呼ばれる
+        self._file = _open(path, "wt")
+        self._started_at = time.monotonic()
+        self._write({"format": RECORDING_FORMAT, "version": RECORDING_VERSION, "video_id": video_id,
+                     "started_at": time.time()})
+        logging.info(f"チャットの記録を開始しました: {path}")
+
+        # 統計情報
+        self.recorded_batch_count = 0
+        self.recorded_item_count = 0
+
+    def _write(self, record: dict):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(record, ensure_ascii=False, default=_to_jsonable) + "\n")
+            self._file.flush() # 途中で終了しても、そこまでの記録を読めるようにする
+
+    def get(self):
+        data = self.chat.get()
+        items = list(getattr(data, "items", None) or [])
+        if items:
+            self._write({"t": round(time.monotonic() - self._started_at, 3), "received_at": time.time(), "items": items})
+            self.recorded_batch_count += 1
+            self.recorded_item_count += len(items)
+        return data
+
+    def is_alive(self):
+        return self.chat.is_alive()
+
+    def terminate(self):
+        try:
+            self.chat.terminate()
+        finally:
+            self.close()
+
+    def close(self):
+        """記録ファイルを閉じます。"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        logging.info(f"チャットの記録を終了しました: {self.stats()}")
+
+    def __getattr__(self, name):
+        # その他のpytchatのメソッドはそのまま渡す
+        return getattr(self.chat, name)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "recorded_batch_count": self.recorded_batch_count,
+            "recorded_item_count": self.recorded_item_count,
+        }
+
+
+class ChatReplay:
+    """
+    ChatRecorderで記録したチャットを、pytchat.createが返すチャットと同じインターフェース (get / is_alive / terminate) で再生します。
+    get()は記録時と同じバッチ単位で、記録時の間隔をspeedで割った時刻まで待ってから返します。
+    ファイルは作成時に開いてヘッダーを確認するため、記録ファイルでない場合は作成時に例外を送出します。
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loops: int = 1, shift_timestamps: bool = True):
+        """
+        Args:
+            path (str): ChatRecorderで記録したファイルのパス。
+            speed (float): 再生速度 (1.0 = 実時間, 10.0 = 10倍速)。0の場合は待たずにできるだけ速く返します。
+            loops (int): 繰り返し再生する回数。2回目以降はコメントIDに周回番号を付けて、重複判定で捨てられないようにします。
+            shift_timestamps (bool): コメントの投稿時刻を再生時の時刻に合わせてずらすか
+                                     (ずらさない場合、古いコメントとしてスケジューラに破棄されます)。
+
+        Raises:
+            OSError: ファイルを開けない場合。
+            ValueError: ChatRecorderで記録したファイルでない場合。
+        """
+        self.path = path
+        self.speed = speed
+        self.loops = max(1, loops)
+        self.shift_timestamps = shift_timestamps
+        self.finished = False
+        self._terminated = threading.Event()
+        self._lock = threading.Lock() # get()は読み取りスレッド、terminate()はイベントループから呼ばれる
+        self._file = _open(path, "rt")
+        try:
+            self.header = self._read_header(self._file)
+        except BaseException:
+            self._file.close()
+            raise
+        self._batches = self._read_batches()
+        self._started_at = None
+        self._loop_duration = 0.0 # 1周分の記録の長さ (秒)
+
+        # 統計情報
+        self.returned_batch_count = 0
+        self.replayed_item_count = 0
+        self.max_schedule_lag = 0.0 # 予定時刻より遅れて返した最大の時間 (秒)
+
+    def _read_header(self, f):
+        """1行目のヘッダーを読み取り、ChatRecorderの記録ファイルであることを確認します。"""
+        try:
+            header = json.loads(f.readline())
+        except (EOFError, OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"記録ファイルのヘッダーを読み取れません ({self.path}): {e}") from e
+        if not isinstance(header, dict) or header.get("format") != RECORDING_FORMAT:
+            raise ValueError(f"ChatRecorderで記録したファイルではありません: {self.path}")
+        if header.get("version", RECORDING_VERSION) > RECORDING_VERSION:
+            raise ValueError(f"未対応の記録形式のバージョンです ({self.path}): {header.get('version')}")
+        return header
+
+    def _read_batches(self):
+        """(周回番号, バッチの記録) を記録順にyieldします。"""
+        for loop_index in range(self.loops):
+            # 1周目は作成時に開いたファイルを使い、2周目以降は開き直してヘッダーを読み飛ばす
+            f = self._file if loop_index == 0 else _open(self.path, "rt")
+            with f:
+                if loop_index:
+                    f.readline()
+                try:
+                    for line in f:
+                        if line.strip():
+                            yield loop_index, json.loads(line)
+                except (EOFError, json.JSONDecodeError) as e:
+                    # 記録中に強制終了したファイルは、読めたところまで再生する
+                    logging.warning(f"記録ファイルの末尾を読み取れませんでした ({self.path}): {e}")
+
+    def _make_item(self, record: dict, loop_index: int, lag: float):
+        item = Chat()
+        for key, value in record.items():
+            setattr(item, key, value)
+        author = Author()
+        for key, value in (record.get("author") or {}).items():
+            setattr(author, key, value)
+        item.author = author
+        if loop_index and getattr(item, "id", None):
+            item.id = f"{item.id}#{loop_index}"
+        if self.shift_timestamps and isinstance(getattr(item, "timestamp", None), (int, float)):
+            item.timestamp = int(time.time() * 1000 - lag)
+        return item
+
+    def get(self):
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        try:
+            with self._lock:
+                loop_index, batch = next(self._batches)
+        except StopIteration:
+            self.finished = True
+            self.returned_batch_count += 1
+            return Chatdata([], timeout=0, abs_diff=0)
+
+        if loop_index == 0:
+            self._loop_duration = max(self._loop_duration, batch.get("t", 0.0))
+        if self.speed > 0:
+            # 2周目以降は前の周の終わりから続けて再生する
+            due = self._started_at + (self._loop_duration * loop_index + batch.get("t", 0.0)) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._terminated.wait(delay)
+            else:
+                self.max_schedule_lag = max(self.max_schedule_lag, -delay)
+
+        received_ms = batch.get("received_at", time.time()) * 1000
+        items = []
+        for record in batch.get("items", []):
+            # 投稿から受信までの遅れ (ミリ秒) は再生速度に合わせて縮める
+            lag = max(0.0, received_ms - record.get("timestamp", received_ms))
+            items.append(self._make_item(record, loop_index, lag / self.speed if self.speed > 0 else 0.0))
+        self.returned_batch_count += 1
+        self.replayed_item_count += len(items)
+        # 待ち時間はここで再現済みのため、取得間隔 (interval) は0で返す
+        return Chatdata(items, timeout=0, abs_diff=0)
+
+    def is_alive(self):
+        return not self.finished and not self._terminated.is_set()
+
+    def terminate(self):
+        self._terminated.set()
+        # 途中で止めた場合も読み取り中のファイルを閉じる (1周目のファイルは読み始める前でも閉じる)
+        with self._lock:
+            self._batches.close()
+            self._file.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "speed": self.speed,
+            "finished": self.finished,
+            "returned_batch_count": self.returned_batch_count,
+            "replayed_item_count": self.replayed_item_count,
+            "max_schedule_lag": round(self.max_schedule_lag, 3),
+        }
+
+
+def replay_factory(path: str, speed: float = 1.0, loops: int = 1):
+    """
+    pytchat.createの代わりに使える、記録したチャットを再生する関数を返します
+    (YouTubeCommentAdapterのchat_factoryに渡します)。
+    """
+    def create(video_id: str, **kwargs):
+        logging.info(f"記録したチャットを再生します: {path} (速度: {speed or '最大'}, 回数: {loops})")
+        return ChatReplay(path, speed=speed, loops=loops)
+    return create
+
+
+def recording_factory(path: str, create=None):
+    """
+    pytchat.createの代わりに使える、取得したチャットをファイルに記録する関数を返します
+    (YouTubeCommentAdapterのchat_factoryに渡します)。
+
+    Args:
+        path (str): 記録先のファイルパス。
+        create (callable, optional): 記録するチャットの生成関数。Noneの場合はpytchat.create。
+    """
+    create = create or pytchat.create
+
+    def create_recording(video_id: str, **kwargs):
+        return ChatRecorder(create(video_id=video_id, **kwargs), path, video_id)
+    return create_recording
+
+
+def record(video_id: str, path: str, duration: float = 0.0):
+    """
+    ライブ配信のチャットをduration秒間 (0の場合は配信終了かCtrl+Cまで) ファイルに記録します。
+    pytchat.createはシグナルハンドラを設定するため、メインスレッドで呼びます。
+    """
+    recorder = recording_factory(path)(video_id)
+    deadline = time.monotonic() + duration if duration > 0 else None
+    try:
+        while recorder.is_alive() and (deadline is None or time.monotonic() < deadline):
+            recorder.get()
+    except KeyboardInterrupt:
+        logging.info("Ctrl+Cが押されました。記録を終了します。")
+    finally:
+        recorder.terminate()
+    return recorder.stats()
+
+
+async def replay(path: str, speed: float = 0.0, loops: int = 1, profile: bool = False):
+    """
+    記録したチャットをYouTubeCommentAdapterに流し込み、コメント取得経路 (解析・重複判定) の処理量を計測します。
+
+    Returns:
+        dict: 取得件数・スループット・アダプターの取得統計。
+    """
+    profiler = cProfile.Profile() if profile else None
+    # 待ち時間はChatReplayが再現するため、アダプター側では取得間隔を空けない
+    adapter = YouTubeCommentAdapter("replay", chat_factory=replay_factory(path, speed, loops), min_poll_interval=0.0)
+    comment_count = 0
+    async with adapter:
+        chat = adapter.chat
+        started_at = time.monotonic()
+        if profiler is not None:
+            profiler.enable() # 解析処理はイベントループのスレッドで動く
+        try:
+            # 再生が終わり、読み取りスレッドが渡したバッチをすべて処理するまで取得を続ける
+            while not (chat.finished and adapter.fetch_count + adapter.dropped_batch_count >= chat.returned_batch_count):
+                comment_count += len(await adapter.get_new_comments())
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        elapsed = time.monotonic() - started_at
+
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILED_FUNCTIONS)
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "comment_count": comment_count,
+        "comments_per_second": round(comment_count / elapsed, 1) if elapsed > 0 else 0.0,
+        "replay": chat.stats(),
+        "fetch": adapter.fetch_stats(),
+        "dedupe": adapter.seen_comments.stats(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="YouTube Liveのチャットを記録し、YouTubeCommentAdapterに再生します。")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="ライブ配信のチャットを記録する")
+    record_parser.add_argument("video_id", help="YouTube LiveのVideo ID")
+    record_parser.add_argument("path", help="記録先のファイル (.gzで終わる場合はgzip圧縮)")
+    record_parser.add_argument("--duration", type=float, default=0.0, help="記録する時間 (秒)。0の場合は配信終了まで")
+    replay_parser = subparsers.add_parser("replay", help="記録したチャットをYouTubeCommentAdapterに流し込む")
+    replay_parser.add_argument("path", help="記録したファイル")
+    replay_parser.add_argument("--speed", type=float, default=0.0, help="再生速度 (1 = 実時間, 10 = 10倍速, 0 = 最大)")
+    replay_parser.add_argument("--loops", type=int, default=1, help="繰り返し再生する回数")
+    replay_parser.add_argument("--profile", action="store_true", help="コメントの解析処理のプロファイルを表示する")
+    parser.add_argument("--log-level", default="WARNING", help="ログレベル")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "record":
+        result = record(args.video_id, args.path, args.duration)
+    else:
+        result = asyncio.run(replay(args.path, args.speed, args.loops, args.profile))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
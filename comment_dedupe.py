@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+
+
+class TimeWindowDedupe:
+    """
+    TTLと件数上限を持つ、コメント重複判定用の集合。
+    挿入順 (=時刻順) に保持し、期限切れや上限超過のエントリを古い順に捨てるため、メモリ使用量は一定以下に収まります。
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10000):
+        """
+        Args:
+            ttl (float): コメントIDを保持する時間 (秒)。
+            max_entries (int): 保持するコメントIDの最大件数。
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen = OrderedDict() # key -> 登録時刻
+
+        # 統計情報
+        self.check_count = 0
+        self.duplicate_count = 0
+        self.eviction_count = 0
+
+    def __len__(self):
+        return len(self._seen)
+
+    def _expire(self, now: float):
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.ttl:
+                break
+            self._seen.popitem(last=False)
+            self.eviction_count += 1
+
+    def check_and_add(self, key):
+        """
+        キーが未登録なら登録してTrueを、登録済み (重複) ならFalseを返します。
+        """
+        now = time.monotonic()
+        self._expire(now)
+        self.check_count += 1
+        if key in self._seen:
+            self.duplicate_count += 1
+            return False
+
+        self._seen[key] = now
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+            self.eviction_count += 1
+        return True
+
+    def stats(self):
+        """重複判定の統計情報を返します。"""
+        return {
+            "mode": "window",
+            "size": len(self._seen),
+            "check_count": self.check_count,
+            "duplicate_count": self.duplicate_count,
+            "eviction_count": self.eviction_count,
+            "estimated_false_positive_rate": 0.0, # 完全一致で判定するため偽陽性はない
+        }
+
+
+class _BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # 1回のハッシュ計算から2つの値を取り出し、ダブルハッシングでk個の位置を求める
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def contains(self, positions):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, positions):
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def false_positive_rate(self):
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class RotatingBloomFilter:
+    """
+    2世代のBloomフィルタを一定時間または一定件数ごとに入れ替える、コメント重複判定用の集合。
+    メモリ使用量は件数によらず固定ですが、まれに新しいコメントを重複と誤判定 (偽陽性) します。
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001, rotation_interval: float = 600.0):
+        """
+        Args:
+            capacity (int): 1世代あたりに登録する件数の上限 (これを超えると世代を入れ替えます)。
+            error_rate (float): 1世代が上限件数に達したときの目標偽陽性率。
+            rotation_interval (float): 世代を入れ替える間隔 (秒)。
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotation_interval = rotation_interval
+        self._current = _BloomFilter(capacity, error_rate)
+        self._previous = None
+        self._rotated_at = time.monotonic()
+
+        # 統計情報
+        self.check_count = 0
+        self.duplicate_count = 0
+        self.rotation_count = 0
+
+    def __len__(self):
+        return self._current.count + (self._previous.count if self._previous else 0)
+
+    def _rotate_if_needed(self):
+        now = time.monotonic()
+        if self._current.count >= self.capacity or now - self._rotated_at >= self.rotation_interval:
+            self._previous = self._current
+            self._current = _BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+            self.rotation_count += 1
+            logging.debug("コメント重複判定のBloomフィルタを入れ替えました。")
+
+    def check_and_add(self, key):
+        """
+        キーが未登録と判定されれば登録してTrueを、登録済み (重複) と判定されればFalseを返します。
+        """
+        self._rotate_if_needed()
+        self.check_count += 1
+        positions = self._current._positions(str(key))
+        if self._current.contains(positions) or (self._previous is not None and self._previous.contains(positions)):
+            self.duplicate_count += 1
+            return False
+        self._current.add(positions)
+        return True
+
+    def estimated_false_positive_rate(self):
+        """現在の登録件数から推定した偽陽性率を返します (2世代のどちらかで誤判定する確率)。"""
+        current = self._current.false_positive_rate()
+        previous = self._previous.false_positive_rate() if self._previous else 0.0
+        return 1 - (1 - current) * (1 - previous)
+
+    def stats(self):
+        """重複判定の統計情報を返します。"""
+        return {
+            "mode": "bloom",
+            "size": len(self),
+            "check_count": self.check_count,
+            "duplicate_count": self.duplicate_count,
+            "rotation_count": self.rotation_count,
+            "memory_bytes": len(self._current.bits) * 2,
+            "estimated_false_positive_rate": self.estimated_false_positive_rate(),
+        }
@@ -0,0 +1,115 @@
+import logging
+import asyncio
+from collections import deque
+
+
+class CommentQueue:
+    """
+    コメント取得タスク (プロデューサー) と応答処理 (コンシューマー) をつなぐ、上限付きの非同期キュー。
+    上限に達した場合の挙動は overflow_policy で指定します。
+
+    - "drop_oldest": 最も古いコメントを捨てて新しいコメントを追加
+    - "drop_newest": 新しいコメントを捨てる
+    - "block": 空きができるまでプロデューサーを待たせる
+    """
+
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    def __init__(self, maxsize: int = 100, overflow_policy: str = "drop_oldest"):
+        """
+        Args:
+            maxsize (int): キューに保持するコメント数の上限。0以下の場合は無制限。
+            overflow_policy (str): 上限到達時の挙動 ("drop_oldest" / "drop_newest" / "block")。
+        """
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"不明なオーバーフローポリシーです: {overflow_policy} (指定可能: {self.OVERFLOW_POLICIES})")
+        self.maxsize = maxsize
+        self.overflow_policy = overflow_policy
+        self._items = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+        # 統計情報
+        self.put_count = 0
+        self.dropped_count = 0
+
+    def qsize(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def full(self):
+        return self.maxsize > 0 and len(self._items) >= self.maxsize
+
+    def put_nowait(self, item):
+        """
+        アイテムを追加します。上限到達時はオーバーフローポリシーに従います。
+
+        Returns:
+            bool: 追加された場合はTrue、破棄された場合はFalse。
+        Raises:
+            asyncio.QueueFull: ポリシーが "block" で空きがない場合。
+        """
+        if self.full():
+            if self.overflow_policy == "block":
+                raise asyncio.QueueFull
+            self.dropped_count += 1
+            if self.overflow_policy == "drop_newest":
+                logging.debug("コメントキューが満杯のため、新しいコメントを破棄しました。")
+                return False
+            self._items.popleft()
+            logging.debug("コメントキューが満杯のため、最も古いコメントを破棄しました。")
+
+        self._items.append(item)
+        self.put_count += 1
+        self._not_empty.set()
+        if self.full():
+            self._not_full.clear()
+        return True
+
+    async def put(self, item):
+        """
+        アイテムを追加します。ポリシーが "block" の場合は空きができるまで待機します。
+        """
+        while self.overflow_policy == "block" and self.full():
+            await self._not_full.wait()
+        return self.put_nowait(item)
+
+    def get_nowait(self):
+        """
+        先頭のアイテムを取り出します。
+
+        Raises:
+            asyncio.QueueEmpty: キューが空の場合。
+        """
+        if not self._items:
+            raise asyncio.QueueEmpty
+        item = self._items.popleft()
+        if not self._items:
+            self._not_empty.clear()
+        self._not_full.set()
+        return item
+
+    async def get(self):
+        """
+        先頭のアイテムを取り出します。空の場合はアイテムが追加されるまで待機します。
+        """
+        await self.wait_for_item()
+        return self.get_nowait()
+
+    async def wait_for_item(self):
+        """
+        アイテムを取り出さずに、キューが空でなくなるまで待機します。
+        """
+        while not self._items:
+            await self._not_empty.wait()
+
+    def stats(self):
+        """キューの統計情報を返します。"""
+        return {
+            "size": len(self._items),
+            "put_count": self.put_count,
+            "dropped_count": self.dropped_count,
+        }
@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import logging
+import math
+import asyncio
+import time
+
+
+class CommentScheduler:
+    """
+    コメント取得と応答処理の間に置く、優先度付きのコメントスケジューラ。
+
+    優先度 = 基本スコア (スーパーチャット金額・メンバーシップ・投稿者の直近の回答有無) + aging_rate × 待ち時間
+
+    待ち時間による加点はすべてのコメントに同じ速さで加わるため、
+    ヒープのキーは「基本スコア - aging_rate × 投入時刻」で固定でき、取り出しは O(log n) で済みます。
+    staleness_horizon を超えて古くなったコメントは取り出し時に破棄します。
+
+    投稿者への回答直後の減点は、投入時に加えて取り出し時にも計算し直します。投入後に同じ投稿者へ回答した場合、
+    先頭に来たコメントは減点後のキーでヒープに戻します (減点がその後減衰した分は、次に先頭に来たときに反映されます)。
+    上限を超えた場合は上限の1割をまとめて破棄し、ヒープの作り直しを毎回の投入で行わないようにします。
+    """
+
+    def __init__(self, staleness_horizon: float = 120.0, aging_rate: float = 0.1, superchat_weight: float = 3.0,
+                 member_bonus: float = 2.0, author_cooldown: float = 300.0, author_penalty: float = 3.0,
+                 max_size: int = 5000, urgent_priority: float = 0.0):
+        """
+        Args:
+            staleness_horizon (float): これより古いコメント (秒) は回答せずに破棄します。
+            aging_rate (float): 待ち時間1秒あたりの加点。大きいほど古いコメントが優先されます。
+            superchat_weight (float): スーパーチャット金額の加点係数 (log(1 + 金額) に掛けます。通貨は区別しません)。
+            member_bonus (float): メンバーシップ加入者への加点。
+            author_cooldown (float): 同じ投稿者へ回答した後、減点を続ける時間 (秒)。
+            author_penalty (float): 回答直後の投稿者への減点 (author_cooldown にかけて0まで減衰します)。
+            max_size (int): 保持するコメント数の上限。超えた場合は優先度の低いコメントから破棄します。
+            urgent_priority (float): 基本スコアがこの値以上のコメントを「割り込み対象」として通知します。0の場合は通知しません。
+        """
+        self.staleness_horizon = staleness_horizon
+        self.aging_rate = aging_rate
+        self.superchat_weight = superchat_weight
+        self.member_bonus = member_bonus
+        self.author_cooldown = author_cooldown
+        self.author_penalty = author_penalty
+        self.max_size = max_size
+        self.urgent_priority = urgent_priority
+
+        self._heap = [] # (-キー, 投入順, コメント)
+        self._sequence = itertools.count()
+        self._not_empty = asyncio.Event()
+        self._author_last_answered = {} # 投稿者名 -> 最後に回答した時刻
+        self._urgent = asyncio.Event() # 割り込み対象のコメントが投入されたときにセット
+
+        # 統計情報
+        self.pushed_count = 0
+        self.picked_count = 0
+        self.stale_dropped_count = 0
+        self.overflow_dropped_count = 0
+        self.urgent_count = 0
+        self.rescored_count = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def empty(self):
+        return not self._heap
+
+    def base_priority(self, comment: dict, now: float = None):
+        """
+        待ち時間を含まない、コメントの基本スコアを計算します。
+        """
+        now = time.time() if now is None else now
+        author = comment.get('author', {})
+        score = 0.0
+        amount = comment.get('amount', 0.0) or 0.0
+        if amount > 0:
+            score += self.superchat_weight * math.log1p(amount)
+        if author.get('is_member'):
+            score += self.member_bonus
+
+        last_answered = self._author_last_answered.get(author.get('name'))
+        if last_answered is not None and self.author_cooldown > 0:
+            remaining = 1.0 - (now - last_answered) / self.author_cooldown
+            if remaining > 0:
+                score -= self.author_penalty * remaining
+        return score
+
+    def push(self, comment: dict):
+        """
+        コメントをスケジューラに追加します。
+        """
+        now = time.time()
+        enqueued_at = comment.get('timestamp', now)
+        base = self.base_priority(comment, now)
+        key = base - self.aging_rate * enqueued_at
+        heapq.heappush(self._heap, (-key, next(self._sequence), comment))
+        self.pushed_count += 1
+        if self.urgent_priority > 0 and base >= self.urgent_priority:
+            self.urgent_count += 1
+            self._urgent.set()
+        if len(self._heap) > self.max_size:
+            self._shrink(now)
+        self._not_empty.set()
+
+    def _is_stale(self, comment: dict, now: float):
+        return now - comment.get('timestamp', now) > self.staleness_horizon
+
+    def _shrink(self, now: float):
+        """
+        古すぎるコメントを取り除き、それでも上限を超える場合は優先度の低いコメントから破棄します。
+        """
+        fresh = [entry for entry in self._heap if not self._is_stale(entry[2], now)]
+        self.stale_dropped_count += len(self._heap) - len(fresh)
+        if len(fresh) > self.max_size:
+            # 上限ちょうどまでではなく1割余分に破棄し、次の数百件の投入ではヒープを作り直さない
+            target = max(1, self.max_size - self.max_size // 10)
+            self.overflow_dropped_count += len(fresh) - target
+            fresh = heapq.nsmallest(target, fresh)
+        heapq.heapify(fresh)
+        self._heap = fresh
+        logging.debug(f"コメントスケジューラを整理しました (残り: {len(self._heap)}件)")
+
+    def pop_nowait(self):
+        """
+        最も優先度の高いコメントを取り出します。古すぎるコメントは破棄します。
+
+        Returns:
+            dict | None: コメント。回答対象がない場合はNone。
+        """
+        now = time.time()
+        while self._heap:
+            negative_key, sequence, comment = heapq.heappop(self._heap)
+            if self._is_stale(comment, now):
+                self.stale_dropped_count += 1
+                logging.debug(f"古いコメントを破棄しました: {comment.get('message', '')[:30]}")
+                continue
+            # 投入後に同じ投稿者へ回答していれば、減点後のキーで戻して次の候補と比べ直す
+            key = self.base_priority(comment, now) - self.aging_rate * comment.get('timestamp', now)
+            if key < -negative_key - 1e-9:
+                self.rescored_count += 1
+                heapq.heappush(self._heap, (-key, sequence, comment))
+                continue
+            self.picked_count += 1
+            if not self._heap:
+                self._not_empty.clear()
+            return comment
+        self._not_empty.clear()
+        return None
+
+    async def wait_for_item(self):
+        """
+        コメントを取り出さずに、スケジューラが空でなくなるまで待機します。
+        """
+        while not self._heap:
+            await self._not_empty.wait()
+
+    def is_urgent(self, comment: dict):
+        """コメントが割り込み対象 (基本スコアがurgent_priority以上) であればTrueを返します。"""
+        return self.urgent_priority > 0 and self.base_priority(comment) >= self.urgent_priority
+
+    async def wait_for_urgent(self):
+        """
+        割り込み対象のコメントが投入されるまで待機します。待機開始前に投入されたものは対象外です。
+        """
+        self._urgent.clear()
+        await self._urgent.wait()
+
+    def mark_answered(self, comment: dict):
+        """
+        コメントに回答したことを記録し、同じ投稿者の次のコメントの優先度を一時的に下げます。
+        """
+        author_name = comment.get('author', {}).get('name')
+        if author_name:
+            self._author_last_answered[author_name] = time.time()
+            if len(self._author_last_answered) > self.max_size:
+                # クールダウンの過ぎた投稿者の記録を捨てる
+                threshold = time.time() - self.author_cooldown
+                self._author_last_answered = {
+                    name: answered_at for name, answered_at in self._author_last_answered.items()
+                    if answered_at >= threshold
+                }
+
+    async def run(self, source_queue):
+        """
+        コメントキューからコメントを受け取り、スケジューラに投入し続けるタスクです。
+        """
+        try:
+            while True:
+                self.push(await source_queue.get())
+        except asyncio.CancelledError:
+            logging.info("コメントスケジューラを停止しました。")
+            raise
+
+    def stats(self):
+        """スケジューラの統計情報を返します。"""
+        return {
+            "size": len(self._heap),
+            "pushed_count": self.pushed_count,
+            "picked_count": self.picked_count,
+            "stale_dropped_count": self.stale_dropped_count,
+            "overflow_dropped_count": self.overflow_dropped_count,
+            "urgent_count": self.urgent_count,
+            "rescored_count": self.rescored_count,
+        }
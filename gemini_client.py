@@ -0,0 +1,270 @@
+import google.generativeai as genai
+import logging
+import asyncio
+import time
+from collections import deque
+
+import latency_tracer
+from chat_history import ChatHistoryManager
+
+
+class CircuitBreaker:
+    """
+    連続して失敗するモデルの利用を一定時間停止するサーキットブレーカー。
+
+    closed (通常) → 連続失敗が閾値に達すると open (利用停止)
+    → reset_timeout 経過後に half_open (1回だけ試行) → 成功で closed / 失敗で再び open
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self):
+        return self.state != "open"
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """
+    Gemini APIを非同期で呼び出すクライアント。
+    会話履歴を自前で保持し、タイムアウト・キャンセル・フォールバックモデルへのヘッジ送信に対応します。
+    """
+
+    def __init__(self, model_names, system_instruction: str, request_timeout: float = 60.0,
+                 hedging_enabled: bool = False, hedge_percentile: float = 90.0, hedge_default_delay: float = 3.0,
+                 failure_threshold: int = 3, reset_timeout: float = 60.0, history_max_turns: int = 0,
+                 history_max_tokens: int = 0, history_keep_turns: int = 6):
+        """
+        Args:
+            model_names (list[str]): 使用するモデル名。先頭がプライマリ、2番目がフォールバック。
+            system_instruction (str): キャラクター設定などのシステムプロンプト。
+            request_timeout (float): 1リクエストあたりの応答完了までの期限 (秒)。
+            hedging_enabled (bool): プライマリの応答が遅い場合にフォールバックモデルへ同じプロンプトを送るか。
+            hedge_percentile (float): ヘッジ送信の待ち時間に使う、プライマリの初回応答レイテンシのパーセンタイル。
+            hedge_default_delay (float): レイテンシの実績が少ない間に使うヘッジ送信の待ち時間 (秒)。
+            failure_threshold (int): サーキットブレーカーが開くまでの連続失敗回数。
+            reset_timeout (float): サーキットブレーカーが開いてから再試行するまでの時間 (秒)。
+            history_max_turns (int): 会話履歴に保持するターン数の上限。超えると古いターンを要約します。0の場合は制限なし。
+            history_max_tokens (int): 会話履歴の推定トークン数の上限。0の場合は制限なし。
+            history_keep_turns (int): 要約時に要約せず残す直近のターン数。
+        """
+        self.request_timeout = request_timeout
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_samples = 10
+        self.history = ChatHistoryManager(
+            summarizer=self.generate_once,
+            max_turns=history_max_turns,
+            max_tokens=history_max_tokens,
+            keep_recent_turns=history_keep_turns,
+        )
+
+        self.models = []
+        for model_name in model_names:
+            try:
+                model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+                self.models.append({
+                    "name": model_name,
+                    "model": model,
+                    "plain_model": genai.GenerativeModel(model_name), # キャラクター設定なし (会話履歴の要約用)
+                    "breaker": CircuitBreaker(failure_threshold, reset_timeout),
+                    "latencies": deque(maxlen=100), # 最初のチャンクが届くまでの時間 (秒)
+                })
+                logging.info(f"Geminiモデル '{model_name}' で初期化しました。")
+            except Exception as e:
+                logging.warning(f"{model_name}の初期化に失敗: {e}")
+        if not self.models:
+            raise RuntimeError("Geminiモデルの初期化に失敗しました。")
+
+    def _available_models(self):
+        available = [entry for entry in self.models if entry["breaker"].allow_request()]
+        for entry in self.models:
+            if entry not in available:
+                logging.warning(f"モデル '{entry['name']}' はサーキットブレーカーにより一時停止中です。")
+        return available
+
+    def _hedge_delay(self, entry):
+        """
+        プライマリモデルの初回応答レイテンシのパーセンタイル値をヘッジ送信の待ち時間として返します。
+        """
+        latencies = sorted(entry["latencies"])
+        if len(latencies) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))
+        return latencies[index]
+
+    async def _open_stream(self, entry, contents):
+        """
+        ストリーミング生成を開始し、最初のチャンクが届いた時点で (イテレータ, 最初のチャンク) を返します。
+        """
+        started = time.monotonic()
+        response = await entry["model"].generate_content_async(contents, stream=True)
+        iterator = aiter(response)
+        first_chunk = await anext(iterator)
+        entry["latencies"].append(time.monotonic() - started)
+        return iterator, first_chunk
+
+    async def _race_first_chunk(self, contents, deadline):
+        """
+        プライマリモデルでストリームを開始し、ヘッジが有効な場合は遅延時にフォールバックモデルとも競争させます。
+        先に最初のチャンクを返したモデルを採用し、もう一方はキャンセルします。
+        """
+        candidates = self._available_models()
+        if not candidates:
+            raise RuntimeError("利用可能なGeminiモデルがありません。")
+
+        pending = {}
+        primary = candidates[0]
+        pending[asyncio.create_task(self._open_stream(primary, contents))] = primary
+        fallbacks = candidates[1:]
+        hedge_at = time.monotonic() + self._hedge_delay(primary)
+
+        try:
+            last_error = None
+            while pending or fallbacks:
+                now = time.monotonic()
+                if now >= deadline:
+                    for entry in pending.values():
+                        entry["breaker"].record_failure()
+                    raise asyncio.TimeoutError("Geminiの応答が期限内に開始されませんでした。")
+
+                can_hedge = self.hedging_enabled and fallbacks
+                if not pending or (can_hedge and now >= hedge_at):
+                    # プライマリが遅い場合 (ヘッジ有効時) または失敗した場合は、フォールバックモデルに同じプロンプトを送る
+                    entry = fallbacks.pop(0)
+                    logging.info(f"モデル '{entry['name']}' にヘッジリクエストを送信します。")
+                    pending[asyncio.create_task(self._open_stream(entry, contents))] = entry
+                    hedge_at = now + self._hedge_delay(entry)
+                    continue
+
+                timeout = deadline - now
+                if can_hedge:
+                    timeout = min(timeout, hedge_at - now)
+                done, _ = await asyncio.wait(set(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    entry = pending.pop(task)
+                    try:
+                        iterator, first_chunk = task.result()
+                    except Exception as e:
+                        entry["breaker"].record_failure()
+                        logging.warning(f"モデル '{entry['name']}' の応答開始に失敗しました: {e}")
+                        last_error = e
+                        continue
+                    return entry, iterator, first_chunk
+
+            raise last_error or RuntimeError("Geminiの応答を取得できませんでした。")
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    iterator, _ = await task
+                    await iterator.aclose()
+                except BaseException:
+                    pass
+
+    async def stream_message(self, prompt: str, record_history: bool = True):
+        """
+        プロンプトを送信し、応答テキストをチャンクごとにyieldします。
+        応答が完了すると、プロンプトと応答を会話履歴に追加します。
+
+        Args:
+            prompt (str): 送信するプロンプト。
+            record_history (bool): Falseの場合は会話履歴に追加しません (呼び出し側が実際に読み上げた内容を記録する場合)。
+        """
+        started_at = time.monotonic()
+        deadline = started_at + self.request_timeout
+        contents = self.history.contents() + [{"role": "user", "parts": [prompt]}]
+        estimated_tokens = self.history.history_tokens() + self.history.estimate_tokens(prompt)
+        entry, iterator, chunk = await self._race_first_chunk(contents, deadline)
+        latency_tracer.record("llm_first_token", time.monotonic() - started_at)
+        logging.debug(f"--- デバッグ情報: モデル '{entry['name']}' の応答を採用 ---")
+
+        response_parts = []
+        prompt_tokens = None
+        completed = False
+        try:
+            while True:
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage is not None and getattr(usage, "prompt_token_count", 0):
+                    prompt_tokens = usage.prompt_token_count
+                try:
+                    chunk_text = chunk.text
+                except ValueError:
+                    # テキストを含まないチャンク (セーフティ情報のみ等) はスキップ
+                    chunk_text = ""
+                if chunk_text:
+                    response_parts.append(chunk_text)
+                    yield chunk_text
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("Geminiの応答が期限内に完了しませんでした。")
+                try:
+                    chunk = await asyncio.wait_for(anext(iterator), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+            completed = True
+        except Exception:
+            entry["breaker"].record_failure()
+            raise
+        finally:
+            if not completed:
+                # タイムアウト・キャンセル時は下位のストリームを閉じる
+                await iterator.aclose()
+
+        entry["breaker"].record_success()
+        latency_tracer.record("llm_response", time.monotonic() - started_at)
+        # プロンプトサイズを記録 (APIが返す実測値を優先し、なければ推定値)
+        prompt_size = prompt_tokens or estimated_tokens
+        self.history.record_prompt_size(prompt_size)
+        logging.info(f"プロンプトサイズ: {prompt_size}トークン{'' if prompt_tokens else ' (推定)'} (履歴: {len(self.history)}ターン)")
+        if record_history:
+            self.history.append(prompt, "".join(response_parts))
+
+    async def send_message(self, prompt: str, record_history: bool = True):
+        """
+        プロンプトを送信し、応答テキスト全体を返します。
+        """
+        response_parts = []
+        async for chunk_text in self.stream_message(prompt, record_history):
+            response_parts.append(chunk_text)
+        return "".join(response_parts)
+
+    async def generate_once(self, prompt: str):
+        """
+        会話履歴とキャラクター設定を使わずに1回だけ生成を行い、応答テキストを返します (会話履歴の要約などに使用)。
+        失敗は応答用のサーキットブレーカーに記録しないため、要約の失敗が配信中の応答を止めることはありません。
+        """
+        last_error = None
+        for entry in self.models:
+            try:
+                response = await asyncio.wait_for(
+                    entry["plain_model"].generate_content_async(prompt),
+                    timeout=self.request_timeout,
+                )
+                return response.text
+            except Exception as e:
+                logging.warning(f"モデル '{entry['name']}' での生成に失敗しました: {e}")
+                last_error = e
+        raise last_error or RuntimeError("利用可能なGeminiモデルがありません。")
@@ -0,0 +1,279 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from aiohttp import web
+
+# 処理中の入力のトレース。asyncio.create_task / asyncio.to_thread で作られた処理にも引き継がれます
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+# Prometheusのsummaryとして出力するパーセンタイル
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def current_trace():
+    """処理中の入力のトレースを返します。トレース外の場合はNone。"""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """
+    処理中の入力のトレースに、withブロックの所要時間をスパンとして記録します。
+    トレース外で呼ばれた場合は何もしません。
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started_at = time.monotonic()
+    try:
+        yield
+    finally:
+        trace.add_span(name, started_at, time.monotonic())
+
+
+@contextmanager
+def use_trace(trace):
+    """
+    withブロック内の処理を、指定したトレース (Noneの場合はトレース外) の処理として扱います。
+    別の入力のトレースを引き継いだタスクが、処理の一部を本来のトレースに記録する場合に使います。
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record(name: str, seconds: float):
+    """処理中の入力のトレースに、計測済みの所要時間を記録します。トレース外の場合は何もしません。"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_duration(name, seconds)
+
+
+class Trace:
+    """
+    1件の入力 (コメントまたはキーボード入力) に対する応答処理のスパンの記録。
+    """
+
+    def __init__(self, tracer, trace_id: int, kind: str, attributes: dict):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.kind = kind
+        self.attributes = attributes
+        self.started_at = time.monotonic()
+        self.wall_started_at = time.time()
+        self.spans = [] # (名前, トレース開始からの開始秒, 所要時間)
+        self.status = None # 結果 ("ok" / "interrupted" / "error")。Noneの場合はwithブロックの終わり方で決まる
+        self.finished = False # JSONLに書き出した後はTrue
+        self._marks = set()
+
+    def add_span(self, name: str, started_at: float, ended_at: float):
+        if self.finished:
+            # 書き出し済みのトレースには残せないため、ヒストグラムにも含めない
+            self.tracer.late_span_count += 1
+            return
+        self.spans.append((name, started_at - self.started_at, ended_at - started_at))
+        self.tracer.observe(name, ended_at - started_at)
+
+    def add_duration(self, name: str, seconds: float):
+        self.add_span(name, time.monotonic() - seconds, time.monotonic())
+
+    def mark_once(self, name: str):
+        """トレース開始からの経過時間を、最初の1回だけnameのスパンとして記録します (例: 最初の音声が出るまで)。"""
+        if name in self._marks:
+            return
+        self._marks.add(name)
+        self.add_span(name, self.started_at, time.monotonic())
+
+    def to_dict(self, status: str):
+        return {
+            "trace_id": self.trace_id,
+            "kind": self.kind,
+            "started_at": round(self.wall_started_at, 3),
+            "status": status,
+            "total_ms": round((time.monotonic() - self.started_at) * 1000, 1),
+            "attributes": self.attributes,
+            "spans": [
+                {"name": name, "offset_ms": round(offset * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+class RollingHistogram:
+    """
+    直近window件の観測値からパーセンタイルを計算するヒストグラム。件数と合計は累計で保持します。
+    """
+
+    def __init__(self, window: int = 1000):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float):
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyTracer:
+    """
+    入力ごとのトレースを作り、処理段階 (スパン) ごとの所要時間を集計するトレーサー。
+    集計結果はPrometheusのテキスト形式でHTTP公開し、トレースはJSONLファイルに1行ずつ書き出します。
+    """
+
+    def __init__(self, window: int = 1000, trace_file: str = None, prefix: str = "aituber"):
+        """
+        Args:
+            window (int): パーセンタイルの計算に使う、スパンごとの直近の観測数。
+            trace_file (str, optional): トレースを追記するJSONLファイルのパス。Noneの場合は書き出しません。
+            prefix (str): メトリクス名の接頭辞。
+        """
+        self.window = window
+        self.trace_file = trace_file
+        self.prefix = prefix
+        self.histograms = {} # スパン名 -> RollingHistogram
+        self._trace_ids = itertools.count(1)
+        self._collectors = {} # 名前 -> stats()を返す関数
+        self._file = None
+        self._runner = None
+
+        # 統計情報
+        self.trace_count = 0
+        self.interrupted_trace_count = 0
+        self.failed_trace_count = 0
+        self.late_span_count = 0 # トレースの終了後に届き、記録しなかったスパンの数
+
+    def observe(self, name: str, seconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = RollingHistogram(self.window)
+        histogram.observe(seconds)
+
+    @contextmanager
+    def trace(self, kind: str, **attributes):
+        """
+        withブロック内 (ブロック内で作られたタスクを含む) の処理を1件のトレースとして記録します。
+
+        Args:
+            kind (str): 入力の種類 (例: "comment", "console")。
+            **attributes: トレースに付ける属性 (JSONLにそのまま書き出します)。
+        """
+        trace = Trace(self, next(self._trace_ids), kind, attributes)
+        token = _current_trace.set(trace)
+        status = "ok"
+        try:
+            yield trace
+        except asyncio.CancelledError:
+            status = "interrupted"
+            raise
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            _current_trace.reset(token)
+            self._finish(trace, trace.status or status)
+
+    def _finish(self, trace: Trace, status: str):
+        trace.finished = True
+        self.trace_count += 1
+        if status == "interrupted":
+            self.interrupted_trace_count += 1
+        elif status == "error":
+            self.failed_trace_count += 1
+        self.observe("total", time.monotonic() - trace.started_at)
+        if self.trace_file:
+            try:
+                if self._file is None:
+                    self._file = open(self.trace_file, "a", encoding="utf-8", buffering=1)
+                self._file.write(json.dumps(trace.to_dict(status), ensure_ascii=False) + "\n")
+            except OSError as e:
+                logging.warning(f"トレースファイルへの書き込みに失敗しました: {e}")
+
+    def register_stats(self, name: str, stats_func):
+        """
+        /metricsに含める統計情報を登録します。stats_funcが返すdictの数値 (bool・ネストしたdictを含む) をgaugeとして出力します。
+        """
+        self._collectors[name] = stats_func
+
+    def _gauge_lines(self, name: str, stats: dict):
+        lines = []
+        for key, value in stats.items():
+            metric = f"{name}_{key}"
+            if isinstance(value, dict):
+                lines += self._gauge_lines(metric, value)
+            elif isinstance(value, (bool, int, float)):
+                lines.append(f"{self.prefix}_{metric} {float(value)}")
+        return lines
+
+    def prometheus_text(self):
+        """集計結果をPrometheusのテキスト形式で返します。"""
+        metric = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {metric} Latency of each processing stage (rolling window of {self.window} observations).",
+            f"# TYPE {metric} summary",
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            for q in QUANTILES:
+                lines.append(f'{metric}{{stage="{name}",quantile="{q}"}} {histogram.quantile(q):.6f}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {histogram.total:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {histogram.count}')
+        lines += self._gauge_lines("tracer", {
+            "trace_count": self.trace_count,
+            "interrupted_trace_count": self.interrupted_trace_count,
+            "failed_trace_count": self.failed_trace_count,
+            "late_span_count": self.late_span_count,
+        })
+        for name, stats_func in self._collectors.items():
+            try:
+                lines += self._gauge_lines(name, stats_func())
+            except Exception as e:
+                logging.debug(f"--- デバッグ情報: 統計情報 '{name}' の取得に失敗: {e} ---")
+        return "\n".join(lines) + "\n"
+
+    async def _handle_metrics(self, request):
+        return web.Response(text=self.prometheus_text(), content_type="text/plain", charset="utf-8")
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 9464):
+        """/metricsでメトリクスを公開するHTTPサーバーを起動します。"""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logging.info(f"メトリクスを http://{host}:{port}/metrics で公開しています。")
+
+    async def close(self):
+        """HTTPサーバーを停止し、トレースファイルを閉じます。"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        """スパンごとのパーセンタイル (ミリ秒) を返します。"""
+        return {
+            name: {
+                "count": histogram.count,
+                "p50_ms": round(histogram.quantile(0.5) * 1000, 1),
+                "p90_ms": round(histogram.quantile(0.9) * 1000, 1),
+                "p99_ms": round(histogram.quantile(0.99) * 1000, 1),
+            }
+            for name, histogram in sorted(self.histograms.items())
+        }
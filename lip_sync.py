@@ -0,0 +1,341 @@
+import asyncio
+import bisect
+import time
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def compute_envelope(data: np.ndarray, rate: int, fps: float = 30.0):
+    """
+    音声データを約1/fps秒のフレームに分け、フレームごとのRMS (フルスケールを1.0とする) を1回のベクトル演算で計算します。
+
+    Args:
+        data (np.ndarray): 音声データ (int16またはfloat32。複数チャンネルの場合は平均を使います)。
+        rate (int): サンプリングレート。
+        fps (float): 1秒あたりのフレーム数。
+
+    Returns:
+        tuple[np.ndarray, float]: フレームごとのRMS (float32) と、1フレームの長さ (秒)。
+    """
+    samples = data if data.ndim == 1 else data.mean(axis=1)
+    frame_length = max(1, int(round(rate / fps)))
+    frame_count = -(-len(samples) // frame_length)
+    frames = np.zeros(frame_count * frame_length, dtype=np.float32)
+    frames[:len(samples)] = samples
+    frames = frames.reshape(frame_count, frame_length)
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame_length)
+    if np.issubdtype(data.dtype, np.integer):
+        rms *= np.float32(1.0 / 32768.0)
+    return rms, frame_length / rate
+
+
+def quantize_envelope(rms: np.ndarray, thresholds, silence_rms: float = 0.01, min_hold_frames: int = 2):
+    """
+    RMSを口の形の番号 (0: 閉じた口 〜 len(thresholds): 最も開いた口) に変換します。
+    音量は発話中のピークに対する比率で判定し、min_hold_framesより短い変化は移動中央値で取り除きます。
+
+    Returns:
+        np.ndarray: フレームごとの口の形の番号 (int8)。
+    """
+    if len(rms) == 0:
+        return np.zeros(0, dtype=np.int8)
+    reference = max(float(rms.max()), silence_rms)
+    levels = np.digitize(rms / reference, thresholds).astype(np.int8)
+    levels[rms < silence_rms] = 0
+    if min_hold_frames > 1 and len(levels) >= min_hold_frames:
+        # 幅 2*min_hold_frames-1 の移動中央値で、min_hold_frames未満の短い山や谷を消す
+        half = min_hold_frames - 1
+        padded = np.pad(levels, half, mode="edge")
+        levels = np.median(sliding_window_view(padded, 2 * half + 1), axis=1).astype(np.int8)
+    return levels
+
+
+class LipSyncSchedule:
+    """
+    口の形を切り替える時刻 (音声の再生開始からの秒数) と切り替え先の一覧。状態が変わる時刻だけを持ちます。
+    """
+
+    def __init__(self, times, levels, duration: float):
+        self.times = list(times)
+        self.levels = list(levels)
+        self.duration = duration
+
+    @classmethod
+    def from_levels(cls, levels: np.ndarray, frame_period: float, duration: float):
+        """フレームごとの口の形の番号から、状態が変わるフレームだけを取り出します。"""
+        if len(levels) == 0:
+            return cls([], [], duration)
+        changes = np.flatnonzero(np.diff(levels)) + 1
+        times = np.concatenate(([0.0], changes * frame_period))
+        values = np.concatenate((levels[:1], levels[changes]))
+        if values[-1] != 0:
+            # 音声の終わりで口を閉じる
+            times = np.append(times, duration)
+            values = np.append(values, 0)
+        return cls(times.tolist(), values.tolist(), duration)
+
+    def __len__(self):
+        return len(self.times)
+
+    def level_at(self, elapsed: float):
+        """再生開始からelapsed秒の時点の口の形の番号を返します。"""
+        index = bisect.bisect_right(self.times, elapsed)
+        return self.levels[index - 1] if index else 0
+
+    def next_change(self, elapsed: float):
+        """elapsed秒より後で、次に口の形が変わる時刻を返します。ない場合はNone。"""
+        index = bisect.bisect_right(self.times, elapsed)
+        return self.times[index] if index < len(self.times) else None
+
+
+class LipSyncStream:
+    """
+    ストリーミング再生する音声を受信しながら解析し、口パクの切り替え予定を受信した分だけ伸ばしていきます。
+    1フレームに満たない端数のサンプルは、次の断片と合わせて解析します。
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.schedule = LipSyncSchedule([], [], 0.0) # これまでに受信した分の切り替え予定
+        self.complete = False # 最後の断片まで解析した場合はTrue
+        self._rate = None
+        self._rms = [] # 解析済みフレームのRMS (断片ごと)
+        self._frame_period = 0.0
+        self._remainder = None # 1フレームに満たない端数のサンプル
+        self._sample_count = 0
+
+    def feed(self, data: np.ndarray, rate: int):
+        """受信した音声データの断片を解析し、切り替え予定を伸ばします。"""
+        if self._rate is None:
+            self._rate = rate
+        elif rate != self._rate:
+            return # PlaySoundもサンプリングレートが変わった後の音声は再生しない
+        samples = data if data.ndim == 1 else data.mean(axis=1).astype(data.dtype)
+        self._sample_count += len(samples)
+        if self._remainder is not None:
+            samples = np.concatenate((self._remainder, samples))
+        frame_length = max(1, int(round(rate / self.engine.fps)))
+        whole = len(samples) // frame_length * frame_length
+        self._remainder = samples[whole:] if whole < len(samples) else None
+        if whole:
+            self._append(samples[:whole])
+            self._rebuild()
+
+    def finish(self):
+        """最後の断片まで受信したときに呼び、端数のサンプルを含めて切り替え予定を確定させます。"""
+        if self._remainder is not None:
+            self._append(self._remainder)
+            self._remainder = None
+        self.complete = True
+        self._rebuild()
+
+    async def wrap(self, source):
+        """sourceが返す (音声データの断片, サンプリングレート) を解析しながら、そのまま返します。"""
+        try:
+            async for data, rate in source:
+                self.feed(data, rate)
+                yield data, rate
+        finally:
+            self.finish()
+            if hasattr(source, "aclose"):
+                await source.aclose()
+
+    def _append(self, samples: np.ndarray):
+        rms, self._frame_period = compute_envelope(samples, self._rate, self.engine.fps)
+        self._rms.append(rms)
+
+    def _rebuild(self):
+        if not self._rms:
+            return
+        started_at = time.perf_counter()
+        rms = np.concatenate(self._rms)
+        self._rms = [rms]
+        engine = self.engine
+        levels = quantize_envelope(rms, engine.thresholds, engine.silence_rms, engine.min_hold_frames)
+        duration = self._sample_count / self._rate if self.complete else len(rms) * self._frame_period
+        self.schedule = LipSyncSchedule.from_levels(levels, self._frame_period, duration)
+        engine.analysis_seconds.append(time.perf_counter() - started_at)
+
+
+class LipSyncEngine:
+    """
+    再生する音声の音量から口パクの切り替え予定を作り、OBSの口の画像ソースの表示/非表示を切り替えます。
+
+    切り替え予定は再生キューに積んだ時点 (再生開始前) に1回のベクトル演算で計算し、
+    再生中はPlaySoundが実際に読み出した位置を基準に、状態が変わる時刻だけOBSへ送ります。
+    ストリーミング再生する音声は、LipSyncStreamで受信しながら断片ごとに解析します。
+    """
+
+    def __init__(self, obs_controller, player, scene_name: str, mouth_sources, fps: float = 30.0, thresholds=None,
+                 silence_rms: float = 0.01, min_hold_frames: int = 2):
+        """
+        Args:
+            obs_controller (OBSController): 表示/非表示の切り替えに使うOBSController。
+            player (PlaySound): 再生位置の取得に使うPlaySound。
+            scene_name (str): 口の画像ソースがあるシーン名。
+            mouth_sources (list[str]): 口の画像ソース名。閉じた口から開いた口の順に並べます (2つ以上)。
+            fps (float): 音量を解析する1秒あたりのフレーム数 (口の形を切り替える最小単位)。
+            thresholds (list[float], optional): 口の形を切り替える音量 (発話中のピークに対する比率)。
+                                                len(mouth_sources) - 1 個。Noneの場合は等間隔に決めます。
+            silence_rms (float): これより小さい音量 (フルスケールを1.0とするRMS) は無音として口を閉じます。
+            min_hold_frames (int): これより短いフレーム数の口の形の変化は無視します (ちらつき防止)。
+        """
+        if len(mouth_sources) < 2:
+            raise ValueError("口の画像ソースは2つ以上指定してください。")
+        if thresholds is None:
+            thresholds = [(i + 1) / len(mouth_sources) * 0.8 for i in range(len(mouth_sources) - 1)]
+        if len(thresholds) != len(mouth_sources) - 1:
+            raise ValueError("thresholdsの数は口の画像ソースの数より1つ少なくしてください。")
+        self.obs_controller = obs_controller
+        self.player = player
+        self.scene_name = scene_name
+        self.mouth_sources = list(mouth_sources)
+        self.fps = fps
+        self.thresholds = list(thresholds)
+        self.silence_rms = silence_rms
+        self.min_hold_frames = min_hold_frames
+
+        self._tracks = deque() # (切り替え予定, 再生Future)
+        self._driver_task = None
+        self._sender_task = None
+        self._desired_level = 0
+        self._shown_level = None # OBSに表示中の口の形 (不明な場合はNone)
+
+        # 統計情報
+        self.tracked_count = 0
+        self.transition_count = 0
+        self.update_batch_count = 0
+        self.failed_update_count = 0
+        self.analysis_seconds = deque(maxlen=200)
+
+    def analyze(self, data: np.ndarray, rate: int):
+        """
+        音声データから口パクの切り替え予定を作ります。
+
+        Returns:
+            LipSyncSchedule: 切り替え予定。
+        """
+        started_at = time.perf_counter()
+        rms, frame_period = compute_envelope(data, rate, self.fps)
+        levels = quantize_envelope(rms, self.thresholds, self.silence_rms, self.min_hold_frames)
+        schedule = LipSyncSchedule.from_levels(levels, frame_period, len(data) / rate)
+        self.analysis_seconds.append(time.perf_counter() - started_at)
+        return schedule
+
+    def track(self, data: np.ndarray, rate: int, playback):
+        """
+        再生キューに積んだ音声の口パクを予約します。PlaySound.enqueueの直後に呼びます。
+
+        Args:
+            data (np.ndarray): 再生する音声データ。
+            rate (int): サンプリングレート。
+            playback (asyncio.Future): PlaySound.enqueueが返したFuture。
+        """
+        self._enqueue(self.analyze(data, rate), playback)
+
+    def begin_stream(self):
+        """
+        ストリーミング再生する音声の口パクを、受信しながら解析する準備をします。
+        返したLipSyncStreamのwrap()で音声の断片を包んでPlaySound.enqueue_streamに渡し、
+        返されたFutureをtrack_stream()に渡します。
+
+        Returns:
+            LipSyncStream: 受信した音声を解析するオブジェクト。
+        """
+        return LipSyncStream(self)
+
+    def track_stream(self, stream: LipSyncStream, playback):
+        """
+        ストリーミング再生する音声の口パクを予約します。PlaySound.enqueue_streamの直後に呼びます。
+
+        Args:
+            stream (LipSyncStream): begin_stream()が返したオブジェクト。
+            playback (asyncio.Future): PlaySound.enqueue_streamが返したFuture。
+        """
+        self._enqueue(stream, playback)
+
+    def _enqueue(self, track, playback):
+        self.tracked_count += 1
+        self._tracks.append((track, playback))
+        if self._driver_task is None or self._driver_task.done():
+            self._driver_task = asyncio.create_task(self._drive())
+
+    def stop(self):
+        """予約済みの口パクをすべて取りやめ、口を閉じます。"""
+        self._tracks.clear()
+        if self._driver_task is not None and not self._driver_task.done():
+            self._driver_task.cancel()
+        self._driver_task = None
+        self._set_level(0)
+
+    async def _drive(self):
+        # 再生キューと同じ順に、1つずつ再生位置に合わせて口の形を切り替える
+        while self._tracks:
+            track, playback = self._tracks.popleft()
+            await self._follow(track, playback)
+        self._set_level(0)
+
+    async def _follow(self, track, playback):
+        """
+        Args:
+            track (LipSyncSchedule | LipSyncStream): 切り替え予定、または受信しながら伸びていく切り替え予定。
+            playback (asyncio.Future): 再生Future。
+        """
+        poll_interval = 1.0 / self.fps
+        streaming = isinstance(track, LipSyncStream)
+        while not playback.done():
+            schedule = track.schedule if streaming else track
+            elapsed = self.player.elapsed(playback)
+            if elapsed is None:
+                await asyncio.sleep(poll_interval) # 再生開始待ち
+                continue
+            self._set_level(schedule.level_at(elapsed))
+            next_change = schedule.next_change(elapsed)
+            if next_change is None:
+                if not streaming or track.complete:
+                    return
+                await asyncio.sleep(poll_interval) # 続きの音声の受信待ち
+                continue
+            # 次に口の形が変わる時刻まで待ち、起きるたびに再生位置を取り直す
+            await asyncio.sleep(min(next_change - elapsed, 0.5))
+
+    def _set_level(self, level: int):
+        if level == self._desired_level:
+            return
+        self._desired_level = level
+        self.transition_count += 1
+        if self._sender_task is None or self._sender_task.done():
+            self._sender_task = asyncio.create_task(self._send_levels())
+
+    async def _send_levels(self):
+        # 送信中に届いた切り替えは、最新の口の形だけを送る
+        while self._shown_level != self._desired_level:
+            if not self.obs_controller.ws:
+                self._shown_level = None
+                return # 接続していない間の口パクは捨てる
+            level = self._desired_level
+            visibility = {
+                source_name: index == level
+                for index, source_name in enumerate(self.mouth_sources)
+                if self._shown_level is None or index in (level, self._shown_level)
+            }
+            self.update_batch_count += 1
+            if not await self.obs_controller.set_sources_visibility(self.scene_name, visibility):
+                self.failed_update_count += 1
+                self._shown_level = None
+                return
+            self._shown_level = level
+
+    def stats(self):
+        """口パクの統計情報を返します。"""
+        analysis = list(self.analysis_seconds)
+        return {
+            "tracked_count": self.tracked_count,
+            "transition_count": self.transition_count,
+            "update_batch_count": self.update_batch_count,
+            "failed_update_count": self.failed_update_count,
+            "avg_analysis_ms": round(sum(analysis) / len(analysis) * 1000, 3) if analysis else 0.0,
+            "max_analysis_ms": round(max(analysis) * 1000, 3) if analysis else 0.0,
+        }
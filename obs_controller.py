@@ -1,25 +1,103 @@
 import obsws_python as obs
+from obsws_python.error import OBSSDKTimeoutError
+import websocket
 import logging
 import asyncio
+import functools
+import json
 import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from obs_state_cache import OBSStateCache
+import latency_tracer
 import os
 
+# 接続が失われたとみなす例外 (リクエスト自体のエラーであるOBSSDKRequestErrorは含めない)
+CONNECTION_ERRORS = (OSError, websocket.WebSocketException, OBSSDKTimeoutError)
+
+
 class OBSController:
-    def __init__(self, host='localhost', port=4455, password=''):  # デフォルトポートを4455に変更
+    # テキストソースに設定できる文字数の上限
+    MAX_TEXT_LENGTH = 1000
+
+    # 接続状態
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    RECONNECTING = "reconnecting"
+
+    def __init__(self, host='localhost', port=4455, password='', coalesce_window: float = 0.05,  # デフォルトポートを4455に変更
+                 request_timeout: float = 5.0, heartbeat_interval: float = 5.0, reconnect_initial_delay: float = 1.0,
+                 reconnect_max_delay: float = 30.0, max_pending_updates: int = 100, auto_reconnect: bool = True):
+        """
+        Args:
+            host (str): OBS WebSocketサーバーのホスト。
+            port (int): OBS WebSocketサーバーのポート。
+            password (str): OBS WebSocketサーバーのパスワード。
+            coalesce_window (float): queue_textで受け取った更新をまとめて送るまでの待ち時間 (秒)。
+                                     この間に同じソースへ複数回更新があった場合は、最後の値だけを送ります。
+            request_timeout (float): 1回のリクエストの送受信を待つ時間 (秒)。超えた場合は接続が切れたとみなします。
+            heartbeat_interval (float): 接続確認 (GetVersion) を送る間隔 (秒)。この間に成功したリクエストがあれば省略します。
+            reconnect_initial_delay (float): 接続が切れてから最初の再接続を試みるまでの待ち時間 (秒)。
+            reconnect_max_delay (float): 再接続の待ち時間の上限 (秒)。失敗するたびに2倍にします。
+            max_pending_updates (int): 再接続中に保持するテキスト更新 (ソース数) の上限。超えた場合は古い更新から破棄します。
+            auto_reconnect (bool): Trueの場合、接続が切れたら自動的に再接続します。
+        """
         self.host = host
         self.port = port
         self.password = password
+        self.coalesce_window = coalesce_window
+        self.request_timeout = request_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.reconnect_initial_delay = reconnect_initial_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.max_pending_updates = max_pending_updates
+        self.auto_reconnect = auto_reconnect
         self.ws = None
         self.connection_attempts = 0
+        # ReqClientは1本のWebSocketで送信と受信を行うため、すべてのリクエストを専用のワーカースレッド1本で順に実行する
+        self._executor = None
+        self._pending_texts = {} # ソース名 -> 次に送るテキスト
+        self._pending_traces = {} # ソース名 -> 更新を予約した入力のトレース (obs_writeの記録先)
+        self._writer_task = None
+        self._heartbeat_task = None
+        self._reconnect_task = None
+        self._last_success = 0.0 # 最後にリクエストが成功した時刻 (time.monotonic)
+        # シーン・入力ソース・テキストの状態キャッシュ (EventClientのイベントで更新します)
+        self.state = OBSStateCache()
+        self.events = None
+        self._scene_item_ids = {} # (シーン名, ソース名) -> シーンアイテムID
+
+        # 接続状態
+        self.connection_state = self.DISCONNECTED
+        self._state_changed_at = time.monotonic()
+        self._lost_at = None
+
+        # 統計情報
+        self.queued_update_count = 0
+        self.coalesced_update_count = 0
+        self.batch_count = 0
+        self.suppressed_write_count = 0
+        self.dropped_update_count = 0
+        self.connection_lost_count = 0
+        self.reconnect_count = 0
+        self.heartbeat_failure_count = 0
+        self.last_heartbeat_latency = None
+        self.total_downtime = 0.0
         logging.info(f"OBSController初期化 (ホスト: {host}, ポート: {port})")
 
     async def __aenter__(self):
         """
         非同期コンテキストマネージャーの開始時にOBS WebSocketサーバーに接続します。
+        接続に失敗した場合は、バックグラウンドの再接続を止めてConnectionErrorを送出します。
         """
         logging.info("OBSに接続中...")
-        return await self.connect()
+        if await self.connect() is None:
+            await self.disconnect()
+            raise ConnectionError(f"OBS WebSocketサーバーに接続できませんでした (ホスト: {self.host}, ポート: {self.port})")
+        return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """
@@ -27,51 +105,379 @@ class OBSController:
         """
         await self.disconnect()
 
+    @property
+    def available(self):
+        """接続中、または再接続を試みている間はTrue (queue_textの更新は再接続後に送られます)。"""
+        return self.connection_state in (self.CONNECTED, self.RECONNECTING)
+
+    def _set_state(self, state: str):
+        if state == self.connection_state:
+            return
+        logging.info(f"OBS接続状態: {self.connection_state} -> {state}")
+        self.connection_state = state
+        self._state_changed_at = time.monotonic()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="obs-worker")
+        return self._executor
+
+    async def _run(self, func, *args, **kwargs):
+        """関数をOBS用のワーカースレッドで実行します。"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(func, *args, **kwargs))
+
     async def connect(self):
-        """OBS WebSocketサーバーに接続します。"""
+        """
+        OBS WebSocketサーバーに接続します。
+        接続に失敗した場合、auto_reconnectが有効であればバックグラウンドで再接続を試み続けます。
+
+        Returns:
+            OBSController | None: 接続に成功した場合は自身、失敗した場合はNone。
+        """
+        self._set_state(self.CONNECTING)
+        try:
+            await self._open()
+            return self
+
+        except ConnectionRefusedError:
+            logging.error("OBS WebSocketサーバーに接続できません。OBSが起動しているか、WebSocketプラグインが有効か確認してください。")
+        except Exception as e:
+            logging.error(f"OBSへの接続に失敗しました: {e}")
+            logging.error(f"接続設定: ホスト={self.host}, ポート={self.port}")
+        self.ws = None
+        self._set_state(self.DISCONNECTED)
+        if self.auto_reconnect:
+            self._start_reconnect()
+        return None
+
+    async def _open(self):
+        """ReqClientとEventClientを作成し、接続状態をconnectedにします。失敗した場合は例外を送出します。"""
         self.connection_attempts += 1
         logging.info(f"OBS接続試行 #{self.connection_attempts}")
-        
+
+        # ReqClientは内部で接続と認証を処理
+        self.ws = await self._run(
+            obs.ReqClient,
+            host=self.host,
+            port=self.port,
+            password=self.password,
+            subs=0,  # サブスクリプション無効
+            timeout=self.request_timeout,
+        )
+        logging.info("OBSに接続しました。")
+        self._last_success = time.monotonic()
+        self._scene_item_ids.clear() # OBSが再起動した場合はIDが変わる
+
+        # 接続テスト
         try:
-            # ReqClientは内部で接続と認証を処理
-            self.ws = obs.ReqClient(
+            version_info = await self._run(self.ws.get_version)
+            logging.info(f"OBSバージョン情報: {version_info}")
+        except Exception as e:
+            logging.warning(f"バージョン情報の取得に失敗: {e}")
+
+        await self._subscribe_events()
+        self._set_state(self.CONNECTED)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        if self._pending_texts:
+            # 再接続中に溜まったテキスト更新を送る
+            self._start_writer()
+
+    async def _subscribe_events(self):
+        """
+        状態キャッシュを更新するため、シーン・入力ソース関連のイベントを購読します。
+        購読に失敗した場合はキャッシュを使わず、毎回OBSへ問い合わせます。
+        """
+        try:
+            self.events = await self._run(
+                obs.EventClient,
                 host=self.host,
                 port=self.port,
                 password=self.password,
-                subs=0,  # サブスクリプション無効
-                timeout=None
+                subs=obs.Subs.GENERAL | obs.Subs.SCENES | obs.Subs.INPUTS,
             )
-            logging.info("OBSに接続しました。")
-            
-            # 接続テスト
+            self.events.callback.register(self.state.callbacks())
+            self.state.invalidate()
+            self.state.enabled = True
+            logging.info("OBSのイベント購読を開始しました (状態キャッシュ有効)。")
+        except Exception as e:
+            self.events = None
+            self.state.enabled = False
+            logging.warning(f"OBSのイベント購読に失敗しました。状態キャッシュを使わずに動作します: {e}")
+
+    def _close_clients(self, ws, events):
+        """切断済み、または不要になったクライアントを閉じます (ワーカースレッドで実行)。"""
+        for client in (events, ws):
+            if client is None:
+                continue
             try:
-                version_info = await asyncio.to_thread(self.ws.get_version)
-                logging.info(f"OBSバージョン情報: {version_info}")
+                client.disconnect()
             except Exception as e:
-                logging.warning(f"バージョン情報の取得に失敗: {e}")
-            
-            return self
-            
-        except ConnectionRefusedError:
-            logging.error("OBS WebSocketサーバーに接続できません。OBSが起動しているか、WebSocketプラグインが有効か確認してください。")
-            self.ws = None
-            raise
-        except Exception as e:
-            logging.error(f"OBSへの接続に失敗しました: {e}")
-            logging.error(f"接続設定: ホスト={self.host}, ポート={self.port}")
-            self.ws = None
-            raise
+                logging.debug(f"--- デバッグ情報: OBSクライアントのクローズ時にエラー: {e} ---")
+
+    def _connection_lost(self, error: Exception):
+        """
+        リクエストや接続確認の失敗から接続切れを検知したときに呼ばれます。
+        古いクライアントを破棄し、再接続を開始します。
+        """
+        if self.connection_state != self.CONNECTED:
+            return
+        logging.warning(f"OBSとの接続が切れました: {type(error).__name__}: {error}")
+        self.connection_lost_count += 1
+        self._lost_at = time.monotonic()
+        ws, events = self.ws, self.events
+        self.ws = None
+        self.events = None
+        self.state.enabled = False
+        self._get_executor().submit(self._close_clients, ws, events)
+        if self.auto_reconnect:
+            self._start_reconnect()
+        else:
+            self._set_state(self.DISCONNECTED)
+
+    def _start_reconnect(self):
+        self._set_state(self.RECONNECTING)
+        if self._lost_at is None:
+            self._lost_at = time.monotonic()
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        """指数バックオフ (ジッター付き) で再接続を試み続けます。"""
+        delay = self.reconnect_initial_delay
+        while self.connection_state == self.RECONNECTING:
+            wait = delay * random.uniform(0.8, 1.2)
+            logging.info(f"{wait:.1f}秒後にOBSへの再接続を試みます。")
+            await asyncio.sleep(wait)
+            try:
+                await self._open()
+            except Exception as e:
+                logging.warning(f"OBSへの再接続に失敗しました: {e}")
+                self.ws = None
+                delay = min(delay * 2, self.reconnect_max_delay)
+                continue
+
+            self.reconnect_count += 1
+            downtime = time.monotonic() - self._lost_at
+            self.total_downtime += downtime
+            self._lost_at = None
+            logging.info(f"OBSに再接続しました (切断時間: {downtime:.1f}秒, 保留中の更新: {len(self._pending_texts)}件)")
+            return
+
+    async def _heartbeat_loop(self):
+        """
+        一定時間リクエストが成功していない場合にGetVersionを送り、接続が生きているかを確認します。
+        応答がrequest_timeout以内に返らない場合は接続切れとみなします。
+        """
+        while self.connection_state == self.CONNECTED:
+            await asyncio.sleep(self.heartbeat_interval)
+            if self.connection_state != self.CONNECTED:
+                return
+            if time.monotonic() - self._last_success < self.heartbeat_interval:
+                continue
+            started_at = time.monotonic()
+            try:
+                await self._call(self.ws.get_version)
+            except Exception as e:
+                self.heartbeat_failure_count += 1
+                logging.warning(f"OBSの接続確認に失敗しました: {e}")
+                self._connection_lost(e)
+                return
+            self.last_heartbeat_latency = time.monotonic() - started_at
 
     async def disconnect(self):
         """OBS WebSocketサーバーから切断します。"""
+        for task in (self._heartbeat_task, self._reconnect_task):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
         if self.ws:
             try:
                 logging.info("OBSから切断中...")
-                # obsws-pythonのReqClientは自動的にクローズされるため、明示的な処理は不要
+                await self.flush()
+                self.state.enabled = False
+                await self._run(self._close_clients, self.ws, self.events)
                 self.ws = None
+                self.events = None
                 logging.info("OBSから切断しました。")
             except Exception as e:
                 logging.warning(f"OBS切断時にエラーが発生しました: {e}")
+        logging.info(f"OBS更新統計: {self.stats()}")
+        self._set_state(self.DISCONNECTED)
+        self._pending_texts.clear()
+        self._pending_traces.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _call(self, func, *args):
+        """
+        ReqClientのメソッドをOBS用のワーカースレッドで実行します (同時に1つのリクエストだけを送ります)。
+        接続切れを示す例外が発生した場合は、再接続を開始してから例外を送出し直します。
+        """
+        try:
+            result = await self._run(func, *args)
+        except CONNECTION_ERRORS as e:
+            self._connection_lost(e)
+            raise
+        self._last_success = time.monotonic()
+        return result
+
+    def _send_batch_sync(self, requests, halt_on_failure: bool):
+        request_id = uuid.uuid4().hex
+        payload = {
+            "op": 8, # RequestBatch
+            "d": {
+                "requestId": request_id,
+                "haltOnFailure": halt_on_failure,
+                "executionType": 0, # SerialRealtime
+                "requests": requests,
+            },
+        }
+        socket = self.ws.base_client.ws
+        socket.send(json.dumps(payload))
+        while True:
+            response = json.loads(socket.recv())
+            if response.get("op") == 9 and response["d"].get("requestId") == request_id: # RequestBatchResponse
+                return response["d"].get("results", [])
+
+    async def send_batch(self, requests, halt_on_failure: bool = False):
+        """
+        複数のリクエストをobs-websocket v5のリクエストバッチ (op 8) として1回の往復で送信します。
+
+        Args:
+            requests (list[dict]): {"requestType": ..., "requestData": {...}} のリスト。
+            halt_on_failure (bool): Trueの場合、途中のリクエストが失敗したら残りを実行しません。
+
+        Returns:
+            list[dict]: リクエストごとの結果 (requestStatusなど)。
+        """
+        if not self.ws:
+            logging.error("OBSに接続されていません。")
+            return []
+        with latency_tracer.span("obs_write"):
+            results = await self._call(self._send_batch_sync, requests, halt_on_failure)
+        self.batch_count += 1
+        for request, result in zip(requests, results):
+            status = result.get("requestStatus", {})
+            if not status.get("result", False):
+                logging.error(f"OBSへのリクエスト {request['requestType']} が失敗しました: {status.get('code')} {status.get('comment', '')}")
+        return results
+
+    def _truncate_text(self, text: str):
+        # テキストの長さ制限（OBSの制限を考慮）
+        if len(text) > self.MAX_TEXT_LENGTH:
+            logging.warning(f"テキストが長すぎるため、{self.MAX_TEXT_LENGTH}文字に切り詰めました。")
+            return text[:self.MAX_TEXT_LENGTH - 3] + "..."
+        return text
+
+    async def set_text_sources(self, texts: dict):
+        """
+        複数のテキストソースのテキストを、1回のリクエストバッチでまとめて設定します。
+
+        Args:
+            texts (dict): ソース名 -> テキスト。
+
+        Returns:
+            bool: すべての設定に成功した場合はTrue。
+        """
+        texts = {source_name: self._truncate_text(text) for source_name, text in texts.items()}
+        # 表示中のテキストと同じ内容の更新は送らない
+        unchanged = [source_name for source_name, text in texts.items() if self.state.text(source_name) == text]
+        for source_name in unchanged:
+            del texts[source_name]
+        self.suppressed_write_count += len(unchanged)
+        if not texts:
+            return True
+        requests = [
+            {
+                "requestType": "SetInputSettings",
+                "requestData": {"inputName": source_name, "inputSettings": {"text": text}, "overlay": True},
+            }
+            for source_name, text in texts.items()
+        ]
+        try:
+            results = await self.send_batch(requests)
+        except Exception as e:
+            logging.error(f"テキストソース {list(texts)} への設定に失敗しました: {e}")
+            return False
+        for (source_name, text), result in zip(texts.items(), results):
+            if result.get("requestStatus", {}).get("result"):
+                self.state.store_text(source_name, text)
+        succeeded = len(results) == len(requests) and all(r.get("requestStatus", {}).get("result") for r in results)
+        if succeeded:
+            logging.debug(f"--- デバッグ情報: テキストソース {list(texts)} を1回のバッチで更新しました ---")
+        return succeeded
+
+    def queue_text(self, source_name: str, text: str):
+        """
+        テキストソースの更新を予約し、すぐに戻ります (応答の音声再生を待たせません)。
+        coalesce_windowの間に届いた更新は1回のリクエストバッチにまとめ、同じソースへの更新は最後の値だけを送ります。
+        再接続中の更新は保留し (ソース数がmax_pending_updatesを超えた場合は古いものから破棄)、再接続後に送ります。
+        """
+        if not self.available:
+            return
+        self.queued_update_count += 1
+        if source_name in self._pending_texts:
+            self.coalesced_update_count += 1
+            del self._pending_texts[source_name] # 最新の更新として末尾に移す
+        elif len(self._pending_texts) >= self.max_pending_updates:
+            oldest = next(iter(self._pending_texts))
+            del self._pending_texts[oldest]
+            self._pending_traces.pop(oldest, None)
+            self.dropped_update_count += 1
+            logging.warning(f"保留中のOBS更新が上限に達したため、'{oldest}' への更新を破棄しました。")
+        self._pending_texts[source_name] = text
+        self._pending_traces[source_name] = latency_tracer.current_trace()
+        if self.connection_state == self.CONNECTED:
+            self._start_writer()
+
+    def _start_writer(self):
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._write_pending_texts())
+
+    async def _write_pending_texts(self):
+        # このタスクは最初に更新を予約した入力のトレースを引き継ぐため、
+        # 送信はトレース外で行い、obs_writeは各更新を予約した入力のトレースに記録する
+        while self._pending_texts and self.connection_state == self.CONNECTED:
+            await asyncio.sleep(self.coalesce_window)
+            texts, self._pending_texts = self._pending_texts, {}
+            traces, self._pending_traces = self._pending_traces, {}
+            batch_count, started_at = self.batch_count, time.monotonic()
+            with latency_tracer.use_trace(None):
+                succeeded = await self.set_text_sources(texts)
+            if self.batch_count != batch_count: # 表示中と同じテキストだけで送信しなかった場合は記録しない
+                ended_at = time.monotonic()
+                for trace in set(traces.values()) - {None}:
+                    trace.add_span("obs_write", started_at, ended_at)
+            if not succeeded and self.connection_state != self.CONNECTED:
+                # 送信中に接続が切れた場合は、その後に届いた更新を優先して保留に戻す
+                self._pending_texts = {**texts, **self._pending_texts}
+                self._pending_traces = {**traces, **self._pending_traces}
+
+    async def flush(self):
+        """予約済みのテキスト更新をすべて送信し終えるまで待機します。"""
+        if self._writer_task is not None:
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+
+    def stats(self):
+        """テキスト更新と接続状態の統計情報を返します。"""
+        return {
+            "connection_state": self.connection_state,
+            "state_seconds": round(time.monotonic() - self._state_changed_at, 1),
+            "connection_lost_count": self.connection_lost_count,
+            "reconnect_count": self.reconnect_count,
+            "heartbeat_failure_count": self.heartbeat_failure_count,
+            "last_heartbeat_latency_ms": round(self.last_heartbeat_latency * 1000, 1) if self.last_heartbeat_latency is not None else None,
+            "total_downtime_seconds": round(self.total_downtime, 1),
+            "pending_update_count": len(self._pending_texts),
+            "dropped_update_count": self.dropped_update_count,
+            "queued_update_count": self.queued_update_count,
+            "coalesced_update_count": self.coalesced_update_count,
+            "batch_count": self.batch_count,
+            "suppressed_write_count": self.suppressed_write_count,
+            "state_cache": self.state.stats(),
+        }
 
     async def get_current_scene(self):
         """現在のOBSシーン名を取得します。"""
@@ -79,9 +485,13 @@ class OBSController:
             logging.error("OBSに接続されていません。")
             return None
             
+        scene_name = self.state.current_scene()
+        if scene_name is not None:
+            return scene_name
         try:
-            response = await asyncio.to_thread(self.ws.get_current_program_scene)
+            response = await self._call(self.ws.get_current_program_scene)
             scene_name = response.current_program_scene_name
+            self.state.store_current_scene(scene_name)
             logging.debug(f"現在のシーン: {scene_name}")
             return scene_name
         except Exception as e:
@@ -95,7 +505,8 @@ class OBSController:
             return False
             
         try:
-            await asyncio.to_thread(self.ws.set_current_program_scene, scene_name)
+            await self._call(self.ws.set_current_program_scene, scene_name)
+            self.state.store_current_scene(scene_name)
             logging.info(f"シーンを '{scene_name}' に切り替えました。")
             return True
         except Exception as e:
@@ -109,7 +520,7 @@ class OBSController:
             return False
             
         try:
-            await asyncio.to_thread(self.ws.set_scene_item_enabled, scene_name, source_name, visible)
+            await self._call(self.ws.set_scene_item_enabled, scene_name, source_name, visible)
             status = '表示' if visible else '非表示'
             logging.info(f"シーン '{scene_name}' のソース '{source_name}' を {status} に設定しました。")
             return True
@@ -117,21 +528,69 @@ class OBSController:
             logging.error(f"ソース '{source_name}' の表示/非表示設定に失敗しました: {e}")
             return False
 
+    async def get_scene_item_id(self, scene_name: str, source_name: str):
+        """
+        シーン内のソースのシーンアイテムIDを取得します。一度取得したIDは再接続するまで保持します。
+        """
+        key = (scene_name, source_name)
+        if key in self._scene_item_ids:
+            return self._scene_item_ids[key]
+        if not self.ws:
+            logging.error("OBSに接続されていません。")
+            return None
+        try:
+            response = await self._call(self.ws.get_scene_item_id, scene_name, source_name)
+        except Exception as e:
+            logging.error(f"シーン '{scene_name}' のソース '{source_name}' が見つかりません: {e}")
+            return None
+        self._scene_item_ids[key] = response.scene_item_id
+        return response.scene_item_id
+
+    async def set_sources_visibility(self, scene_name: str, visibility: dict):
+        """
+        シーン内の複数のソースの表示/非表示を、1回のリクエストバッチでまとめて設定します。
+
+        Args:
+            scene_name (str): シーン名。
+            visibility (dict): ソース名 -> 表示する場合はTrue。
+
+        Returns:
+            bool: すべての設定に成功した場合はTrue。
+        """
+        requests = []
+        for source_name, visible in visibility.items():
+            item_id = await self.get_scene_item_id(scene_name, source_name)
+            if item_id is None:
+                return False
+            requests.append({
+                "requestType": "SetSceneItemEnabled",
+                "requestData": {"sceneName": scene_name, "sceneItemId": item_id, "sceneItemEnabled": visible},
+            })
+        try:
+            results = await self.send_batch(requests)
+        except Exception as e:
+            logging.error(f"シーン '{scene_name}' のソース {list(visibility)} の表示/非表示設定に失敗しました: {e}")
+            return False
+        return len(results) == len(requests) and all(r.get("requestStatus", {}).get("result") for r in results)
+
     async def set_text_source_text(self, source_name: str, text: str):
         """指定されたテキストソースのテキストを設定します。"""
         if not self.ws:
             logging.error("OBSに接続されていません。")
             return False
             
+        text = self._truncate_text(text)
+        if self.state.text(source_name) == text:
+            # 表示中のテキストと同じ内容なので送らない
+            self.suppressed_write_count += 1
+            return True
+
         try:
-            # テキストの長さ制限（OBSの制限を考慮）
-            if len(text) > 1000:
-                text = text[:997] + "..."
-                logging.warning("テキストが長すぎるため、1000文字に切り詰めました。")
-            
             # 入力設定を更新
             settings = {"text": text}
-            await asyncio.to_thread(self.ws.set_input_settings, source_name, settings, True)
+            with latency_tracer.span("obs_write"):
+                await self._call(self.ws.set_input_settings, source_name, settings, True)
+            self.state.store_text(source_name, text)
             
             logging.info(f"テキストソース '{source_name}' を更新しました。")
             logging.debug(f"設定内容: {text[:100]}{'...' if len(text) > 100 else ''}")
@@ -144,10 +603,10 @@ class OBSController:
             # より詳細なエラー情報を提供
             try:
                 # ソース一覧を取得してデバッグ情報を提供
-                inputs = await asyncio.to_thread(self.ws.get_input_list)
+                inputs = await self.get_input_list() or []
                 logging.debug("利用可能な入力ソース一覧:")
-                for input_item in inputs.inputs:
-                    logging.debug(f"  - {input_item['inputName']} ({input_item['inputKind']})")
+                for input_name, input_kind in inputs:
+                    logging.debug(f"  - {input_name} ({input_kind})")
             except Exception as debug_e:
                 logging.debug(f"ソース一覧の取得に失敗: {debug_e}")
                 
@@ -159,9 +618,13 @@ class OBSController:
             logging.error("OBSに接続されていません。")
             return None
             
+        scenes = self.state.scenes()
+        if scenes is not None:
+            return scenes
         try:
-            response = await asyncio.to_thread(self.ws.get_scene_list)
+            response = await self._call(self.ws.get_scene_list)
             scenes = [scene['sceneName'] for scene in response.scenes]
+            self.state.store_scenes(scenes)
             logging.debug(f"利用可能なシーン: {scenes}")
             return scenes
         except Exception as e:
@@ -174,9 +637,13 @@ class OBSController:
             logging.error("OBSに接続されていません。")
             return None
             
+        inputs = self.state.inputs()
+        if inputs is not None:
+            return inputs
         try:
-            response = await asyncio.to_thread(self.ws.get_input_list)
+            response = await self._call(self.ws.get_input_list)
             inputs = [(item['inputName'], item['inputKind']) for item in response.inputs]
+            self.state.store_inputs(inputs)
             logging.debug(f"利用可能な入力ソース数: {len(inputs)}")
             return inputs
         except Exception as e:
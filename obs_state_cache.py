@@ -0,0 +1,145 @@
+import logging
+import threading
+
+
+class OBSStateCache:
+    """
+    OBSのシーン一覧・現在のシーン・入力ソース一覧・テキストソースの現在値を保持するキャッシュ。
+    obs-websocketのイベント (EventClient) を受け取って、変更があった項目を更新または無効化します。
+
+    イベントはEventClientの受信スレッドから届くため、内部状態はロックで保護します。
+    イベントを購読できていない間 (enabled=False) は、キャッシュを使わずに毎回OBSへ問い合わせます。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._scenes = None        # シーン名のリスト
+        self._current_scene = None # 現在のプログラムシーン名
+        self._inputs = None        # [(入力名, 種類)]
+        self._texts = {}           # 入力名 -> テキスト
+
+        # 統計情報
+        self.hit_count = 0
+        self.miss_count = 0
+        self.invalidation_count = 0
+
+    def callbacks(self):
+        """EventClientに登録するイベントハンドラのリストを返します (関数名でイベントが対応付けられます)。"""
+        return [
+            self.on_scene_created, self.on_scene_removed, self.on_scene_name_changed,
+            self.on_current_program_scene_changed,
+            self.on_input_created, self.on_input_removed, self.on_input_name_changed,
+            self.on_input_settings_changed,
+            self.on_exit_started,
+        ]
+
+    def _lookup(self, value):
+        if self.enabled and value is not None:
+            self.hit_count += 1
+            return value
+        self.miss_count += 1
+        return None
+
+    def scenes(self):
+        with self._lock:
+            return self._lookup(self._scenes)
+
+    def current_scene(self):
+        with self._lock:
+            return self._lookup(self._current_scene)
+
+    def inputs(self):
+        with self._lock:
+            return self._lookup(self._inputs)
+
+    def text(self, input_name: str):
+        """キャッシュしているテキストを返します。不明な場合はNone。"""
+        with self._lock:
+            return self._lookup(self._texts.get(input_name))
+
+    def store_scenes(self, scenes):
+        with self._lock:
+            self._scenes = list(scenes)
+
+    def store_current_scene(self, scene_name: str):
+        with self._lock:
+            self._current_scene = scene_name
+
+    def store_inputs(self, inputs):
+        with self._lock:
+            self._inputs = list(inputs)
+
+    def store_text(self, input_name: str, text: str):
+        with self._lock:
+            self._texts[input_name] = text
+
+    def invalidate(self):
+        """すべてのキャッシュを破棄します。"""
+        with self._lock:
+            self._scenes = None
+            self._current_scene = None
+            self._inputs = None
+            self._texts.clear()
+            self.invalidation_count += 1
+
+    def _invalidate_scenes(self):
+        with self._lock:
+            self._scenes = None
+            self.invalidation_count += 1
+
+    def _invalidate_inputs(self, *input_names):
+        with self._lock:
+            self._inputs = None
+            for input_name in input_names:
+                self._texts.pop(input_name, None)
+            self.invalidation_count += 1
+
+    # --- obs-websocketのイベントハンドラ (EventClientの受信スレッドから呼ばれます) ---
+
+    def on_scene_created(self, data):
+        self._invalidate_scenes()
+
+    def on_scene_removed(self, data):
+        self._invalidate_scenes()
+
+    def on_scene_name_changed(self, data):
+        self._invalidate_scenes()
+        with self._lock:
+            if self._current_scene == getattr(data, "old_scene_name", None):
+                self._current_scene = getattr(data, "scene_name", None)
+
+    def on_current_program_scene_changed(self, data):
+        self.store_current_scene(getattr(data, "scene_name", None))
+
+    def on_input_created(self, data):
+        self._invalidate_inputs(getattr(data, "input_name", None))
+
+    def on_input_removed(self, data):
+        self._invalidate_inputs(getattr(data, "input_name", None))
+
+    def on_input_name_changed(self, data):
+        self._invalidate_inputs(getattr(data, "old_input_name", None), getattr(data, "input_name", None))
+
+    def on_input_settings_changed(self, data):
+        input_name = getattr(data, "input_name", None)
+        settings = getattr(data, "input_settings", None) or {}
+        with self._lock:
+            if "text" in settings:
+                self._texts[input_name] = settings["text"]
+            else:
+                self._texts.pop(input_name, None)
+
+    def on_exit_started(self, data):
+        logging.info("OBSが終了しようとしています。OBSの状態キャッシュを破棄します。")
+        self.invalidate()
+        self.enabled = False
+
+    def stats(self):
+        """キャッシュの統計情報を返します。"""
+        return {
+            "enabled": self.enabled,
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "invalidation_count": self.invalidation_count,
+        }
@@ -1,18 +1,143 @@
-import sounddevice as sd
 import numpy as np
 import io
 import wave
 import logging
 import asyncio # asyncioをインポート
+import time
+from collections import deque
+
+import latency_tracer
+
+class AudioRingBuffer:
+    """
+    単一プロデューサー・単一コンシューマーのリングバッファ。
+    書き込み位置はプロデューサー (イベントループ) だけが、読み出し位置はコンシューマー (オーディオコールバック) だけが
+    更新するため、ロックなしでスレッド間の受け渡しができます。位置は先頭からの累計フレーム数です。
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=dtype)
+        self.write_pos = 0
+        self.read_pos = 0
+
+    def available_read(self):
+        return self.write_pos - self.read_pos
+
+    def available_write(self):
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def write(self, data: np.ndarray):
+        """
+        書き込めるだけ書き込み、書き込んだフレーム数を返します。
+        """
+        count = min(len(data), self.available_write())
+        if count <= 0:
+            return 0
+        start = self.write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = data[:first]
+        if count > first:
+            self._buffer[:count - first] = data[first:count]
+        # データのコピーが終わってから位置を進める (コンシューマーが未書き込みの領域を読まないように)
+        self.write_pos += count
+        return count
+
+    def read_into(self, out: np.ndarray):
+        """
+        outに読み出せるだけ読み出し、読み出したフレーム数を返します。
+        """
+        count = min(len(out), self.available_read())
+        if count <= 0:
+            return 0
+        start = self.read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        if count > first:
+            out[first:count] = self._buffer[:count - first]
+        self.read_pos += count
+        return count
+
+    def skip_to(self, position: int):
+        """
+        読み出し位置をpositionまで進めます (書き込み位置は超えません)。
+        """
+        self.read_pos = max(self.read_pos, min(position, self.write_pos))
+
+
+class _PlaybackItem:
+    def __init__(self, data, rate, device, future, on_start, source=None):
+        self.data = data
+        self.source = source # 音声データを少しずつ返す非同期イテレーター (ストリーミング再生の場合)
+        self.rate = rate
+        self.device = device
+        self.future = future
+        self.on_start = on_start
+        self.trace = latency_tracer.current_trace() # 再生を依頼した入力のトレース
+        self.started_at = None
+        self.start_pos = None # リングバッファ上の開始位置
+        self.end_pos = None   # リングバッファ上の終了位置 (書き込み完了時に確定)
+        self.skip_registered = False
+
 
 class PlaySound:
-    def __init__(self):
-        self.devices = sd.query_devices()
+    def __init__(self, blocksize: int = 1024, buffer_seconds: float = 2.0, dtype: str = "int16", stream_factory=None,
+                 query_devices=None, stall_timeout: float = 5.0):
+        """
+        Args:
+            blocksize (int): オーディオコールバック1回あたりのフレーム数 (停止・キャンセルの反応単位)。
+            buffer_seconds (float): リングバッファに先読みしておく音声の長さ (秒)。
+            dtype (str): 出力ストリームのサンプル形式 ("int16" または "float32")。
+                         音声データと同じ形式にしておくと、再生時の変換処理が発生しません。
+            stream_factory (callable, optional): 出力ストリームを生成する関数。Noneの場合はsounddevice.OutputStream。
+            query_devices (callable, optional): サウンドデバイスの一覧を返す関数。Noneの場合はsounddevice.query_devices。
+                                                stream_factoryと両方指定した場合は、sounddevice (PortAudio) を読み込みません。
+            stall_timeout (float): 再生し終えるのを待つ間、バッファの残りの長さに加えてこの秒数を過ぎても再生が進まない場合は、
+                                   出力ストリームが止まったとみなして再生中の音声を失敗させます。
+        """
+        if stream_factory is None or query_devices is None:
+            import sounddevice as sd # PortAudioが必要なため、実際のサウンドデバイスを使う場合だけ読み込む
+            stream_factory = stream_factory or sd.OutputStream
+            query_devices = query_devices or sd.query_devices
+        self.devices = query_devices()
         logging.debug("--- デバッグ情報: 利用可能なサウンドデバイス --- ")
         for i, device in enumerate(self.devices):
             logging.debug(f"  ID: {i}, Name: {device['name']}, Host API: {device['hostapi']}, Max Output Channels: {device['max_output_channels']}")
         logging.debug("--------------------------------------")
 
+        self.blocksize = blocksize
+        self.buffer_seconds = buffer_seconds
+        self.stall_timeout = stall_timeout
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.int16), np.dtype(np.float32)):
+            raise ValueError(f"未対応のサンプル形式です: {dtype}")
+        self.stream_factory = stream_factory
+
+        # セッション中開いたままにする出力ストリーム
+        self._stream = None
+        self._stream_rate = None
+        self._stream_device = None
+        self._ring = None
+
+        self._loop = None
+        self._pending = None      # 再生待ちのアイテム (asyncio.Queue)
+        self._feeder_task = None
+        self._active_items = []   # リングバッファに書き込み済み (または書き込み中) で、再生が完了していないアイテム
+        self._writing_item = None # リングバッファに書き込み中のアイテム
+        # オーディオコールバックに通知するイベント (位置, 関数)。イベントループ側でappend、コールバック側でpopleftする
+        self._events = deque()
+        # キャンセルされたアイテムの区間 (開始位置, 終了位置)。コールバック側で読み飛ばす
+        self._skip_ranges = deque()
+        self._items = {} # Future -> 再生が完了していないアイテム (再生位置の問い合わせ用)
+        # 最後のコールバックで出力したブロック (開始位置, フレーム数, 時刻)。コールバック側で丸ごと置き換える
+        self._clock = None
+
+        # 統計情報
+        self.underrun_count = 0        # 再生すべき音声があるのにバッファが空だった回数
+        self.output_underflow_count = 0 # PortAudioが報告したアンダーフロー回数
+        self.played_item_count = 0
+        self.stall_count = 0 # 出力ストリームが止まり、再生中の音声を失敗させた回数
+
     def get_device_id_by_name(self, name: str):
         """
         デバイス名からデバイスIDを取得します。
@@ -24,26 +149,445 @@ class PlaySound:
         logging.warning(f"--- デバッグ情報: デバイス名 '{name}' に一致するデバイスが見つかりませんでした。 ---")
         return None
 
-    async def play_audio_data(self, data: np.ndarray, rate: int, output_device_id: int = None):
+    def _to_stream_format(self, data: np.ndarray):
+        """
+        音声データを出力ストリームの形式 (モノラル・self.dtype) に変換します。
+        形式が一致している場合はコピーせずにそのまま返します。
+        """
+        if data.ndim > 1:
+            data = data.mean(axis=1).astype(data.dtype)
+        if data.dtype == self.dtype:
+            return data
+        if self.dtype == np.int16:
+            if data.dtype.kind == "f":
+                return (np.clip(data, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+            return data.astype(np.int16)
+        if data.dtype == np.int16:
+            return data.astype(np.float32) * np.float32(1.0 / 32768.0)
+        return data.astype(np.float32)
+
+    def _callback(self, outdata, frames, time_info, status):
+        """
+        オーディオスレッドから呼ばれるコールバック。リングバッファから音声を読み出します。
+        """
+        if status.output_underflow:
+            self.output_underflow_count += 1
+        ring = self._ring
+
+        # キャンセルされたアイテムの区間を読み飛ばす (キャンセル順は位置順とは限らないため並べ替えて処理)
+        if self._skip_ranges:
+            for skip_range in sorted(list(self._skip_ranges)):
+                start, end = skip_range
+                if ring.read_pos >= end:
+                    self._skip_ranges.remove(skip_range)
+                elif ring.read_pos >= start:
+                    ring.skip_to(end)
+
+        out = outdata[:, 0]
+        position = ring.read_pos
+        count = ring.read_into(out)
+        self._clock = (position, count, time.monotonic())
+        if count < frames:
+            out[count:] = 0
+            if (self._events and self._events[-1][0] > ring.read_pos) or self._writing_item is not None:
+                # 再生途中のアイテムがあるのにデータが届いていない (ストリーミング受信の遅れを含む)
+                self.underrun_count += 1
+
+        # 位置に達したイベント (再生開始・完了の通知) をイベントループに渡す
+        while self._events and self._events[0][0] <= ring.read_pos:
+            _, notify = self._events.popleft()
+            try:
+                self._loop.call_soon_threadsafe(notify)
+            except RuntimeError:
+                pass # イベントループが既に閉じられている
+
+    def _open_stream(self, rate: int, device):
+        logging.debug(f"--- デバッグ情報: 出力ストリームを開きます (出力デバイスID: {device}, サンプリングレート: {rate}) ---")
+        self._ring = AudioRingBuffer(int(rate * self.buffer_seconds), dtype=self.dtype)
+        self._events.clear()
+        self._skip_ranges.clear()
+        self._clock = None
+        self._stream = self.stream_factory(
+            samplerate=rate,
+            device=device,
+            channels=1,
+            dtype=self.dtype.name,
+            blocksize=self.blocksize,
+            callback=self._callback,
+        )
+        self._stream.start()
+        self._stream_rate = rate
+        self._stream_device = device
+
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception as e:
+                logging.warning(f"出力ストリームの終了時にエラーが発生しました: {e}")
+            self._stream = None
+            logging.debug("--- デバッグ情報: 出力ストリームを閉じました ---")
+
+    def _fail_active_items(self, reason: str):
+        """
+        出力ストリームが止まったため、再生中 (書き込み中を含む) のアイテムのFutureを失敗させ、ストリームを閉じます。
+        次のアイテムの再生時にストリームを開き直します。
+        """
+        logging.error(f"エラー: {reason}。再生中の音声 {len(self._active_items)}件を中断します。")
+        self.stall_count += 1
+        error = RuntimeError(reason)
+        for item in self._active_items:
+            self._items.pop(item.future, None)
+            if not item.future.done():
+                item.future.set_exception(error)
+        self._active_items.clear()
+        self._close_stream()
+
+    async def _wait_until_drained(self):
+        """
+        再生中のアイテムがすべて再生し終わるまで待機します。
+        出力ストリームが止まった場合や、バッファの残りを再生し終えるはずの時刻からstall_timeout秒過ぎても
+        再生が終わらない場合は、再生中のアイテムを失敗させて戻ります。
+        """
+        ring = self._ring
+        write_pos = deadline = None
+        while self._active_items:
+            if self._stream is None or not self._stream.active:
+                self._fail_active_items("出力ストリームが停止しました")
+                return
+            if ring.write_pos != write_pos:
+                # 待機中に書き込まれた分 (ストリーミング受信中のアイテム) があれば期限を延ばす
+                write_pos = ring.write_pos
+                deadline = time.monotonic() + ring.available_read() / self._stream_rate + self.stall_timeout
+            elif time.monotonic() > deadline:
+                self._fail_active_items(f"出力ストリームの再生が期限 (バッファの残り + {self.stall_timeout}秒) を過ぎても終わりません")
+                return
+            await asyncio.sleep(self.blocksize / self._stream_rate)
+
+    async def _feed(self):
+        """
+        再生待ちのアイテムを順にリングバッファへ書き込むタスク。
+        """
+        while True:
+            item = await self._pending.get()
+            if item.future.done():
+                await self._close_source(item)
+                continue # 再生前にキャンセルされた
+            if item.source is not None and not await self._receive_first_chunk(item):
+                continue
+            try:
+                if self._stream is None or item.rate != self._stream_rate or item.device != self._stream_device:
+                    # サンプリングレートや出力先が変わる場合のみ、再生中の音声を流し切ってから開き直す
+                    await self._wait_until_drained()
+                    self._close_stream()
+                    self._open_stream(item.rate, item.device)
+            except Exception as e:
+                logging.error(f"エラー: 出力ストリームを開けませんでした: {e}")
+                item.future.set_exception(e)
+                await self._close_source(item)
+                continue
+            await self._write_item(item)
+
+    async def _receive_first_chunk(self, item):
+        """
+        ストリーミング再生のアイテムから最初の断片を受け取り、サンプリングレートを確定させます。
+
+        Returns:
+            bool: 再生を続ける場合はTrue。音声が空、または受信に失敗した場合はFalse。
+        """
+        try:
+            data, item.rate = await item.source.__anext__()
+        except StopAsyncIteration:
+            if not item.future.done():
+                item.future.set_result(True) # 再生する音声がない
+            return False
+        except Exception as e:
+            logging.error(f"エラー: 音声データの受信に失敗しました: {e}")
+            if not item.future.done():
+                item.future.set_exception(e)
+            await self._close_source(item)
+            return False
+        if item.future.done():
+            await self._close_source(item)
+            return False
+        item.data = self._to_stream_format(data)
+        return True
+
+    async def _close_source(self, item):
+        if item.source is not None and hasattr(item.source, "aclose"):
+            await item.source.aclose()
+
+    async def _item_chunks(self, item):
+        """アイテムの音声データを、出力ストリームの形式の断片として順に返します。"""
+        yield item.data
+        if item.source is None:
+            return
+        try:
+            async for data, rate in item.source:
+                if rate != item.rate:
+                    logging.warning(f"ストリーミング中にサンプリングレートが変わったため残りを破棄します ({item.rate} -> {rate})")
+                    break
+                yield self._to_stream_format(data)
+        except Exception as e:
+            # 受信済みの分だけを再生して終了する
+            logging.error(f"エラー: 音声データの受信中に問題が発生しました: {e}")
+
+    async def _write_item(self, item):
+        ring = self._ring
+        item.start_pos = ring.write_pos
+        self._active_items.append(item)
+        self._writing_item = item
+
+        started = False
+        wait = self.blocksize / item.rate / 2
+        read_pos = stalled_since = None
+        chunks = self._item_chunks(item)
+        try:
+            async for data in chunks:
+                offset = 0
+                while offset < len(data) and not item.future.done():
+                    if ring.available_write() == 0:
+                        if self._stream is None or not self._stream.active:
+                            self._fail_active_items("出力ストリームが停止しました")
+                            break
+                        # 読み出し位置がstall_timeout秒進まない場合は、コールバックが止まったとみなす
+                        if ring.read_pos != read_pos:
+                            read_pos, stalled_since = ring.read_pos, time.monotonic()
+                        elif time.monotonic() - stalled_since > self.stall_timeout:
+                            self._fail_active_items(f"出力ストリームの再生が{self.stall_timeout}秒以上進みません")
+                            break
+                        await asyncio.sleep(wait) # バッファに空きができるまで待つ
+                        continue
+                    if not started:
+                        # 最初のサンプルが読み出された時点で再生開始を通知
+                        self._events.append((item.start_pos + 1, lambda: self._on_item_started(item)))
+                        started = True
+                    offset += ring.write(data[offset:])
+                if item.future.done():
+                    break
+        finally:
+            self._writing_item = None
+            await chunks.aclose()
+            await self._close_source(item)
+
+        if not started or item not in self._active_items:
+            # 1フレームも書き込む前にキャンセルされた、または出力ストリームが止まった
+            if item in self._active_items:
+                self._active_items.remove(item)
+            return
+        item.end_pos = ring.write_pos
+        if item.future.done():
+            # 書き込み中にキャンセルされた: 書き込んだ区間を読み飛ばしてもらう
+            self._register_skip(item)
+        self._events.append((item.end_pos, lambda: self._on_item_finished(item)))
+
+    def _register_skip(self, item):
+        if not item.skip_registered:
+            item.skip_registered = True
+            self._skip_ranges.append((item.start_pos, item.end_pos))
+
+    def _on_item_started(self, item):
+        item.started_at = time.monotonic()
+        if item.trace is not None:
+            item.trace.mark_once("first_audio") # 入力を受け取ってから最初の音声が出るまで
+        if item.on_start is not None and not item.future.done():
+            try:
+                item.on_start()
+            except Exception as e:
+                logging.warning(f"再生開始時の処理でエラーが発生しました: {e}")
+
+    def _on_item_finished(self, item):
+        if item in self._active_items:
+            self._active_items.remove(item)
+        self._items.pop(item.future, None)
+        if item.trace is not None and item.started_at is not None:
+            item.trace.add_span("playback", item.started_at, time.monotonic())
+        if not item.future.done():
+            self.played_item_count += 1
+            item.future.set_result(True)
+
+    def _on_future_done(self, item, future):
+        self._items.pop(future, None)
+        if not future.cancelled() or item.start_pos is None:
+            return
+        if item.end_pos is not None:
+            # 書き込み済みの区間を読み飛ばしてもらう (書き込み中の場合は_write_itemが区間を登録する)
+            self._register_skip(item)
+
+    def _ensure_started(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._pending = asyncio.Queue()
+        if self._feeder_task is None or self._feeder_task.done():
+            self._feeder_task = asyncio.create_task(self._feed())
+
+    async def open(self, rate: int, output_device_id: int = None):
+        """
+        出力ストリームを事前に開いておき、最初の再生時にストリームを開く待ち時間をなくします。
+
+        Args:
+            rate (int): サンプリングレート。
+            output_device_id (int, optional): 音声を出力するデバイスのID。Noneの場合、デフォルトの出力デバイスを使用します。
+        """
+        self._ensure_started()
+        if self._stream is not None and rate == self._stream_rate and output_device_id == self._stream_device:
+            return
+        await self._wait_until_drained()
+        self._close_stream()
+        self._open_stream(rate, output_device_id)
+
+    async def enqueue(self, data: np.ndarray, rate: int, output_device_id: int = None, on_start=None):
+        """
+        音声データを再生キューに追加し、再生完了時に結果がセットされるFutureを返します。
+        続けて追加された音声は、出力ストリームを開き直さずに途切れなく再生されます。
+        Futureをキャンセルすると、再生中であってもその音声の再生を中断します。
+
+        Args:
+            data (np.ndarray): 音声データ (numpy配列)。
+            rate (int): サンプリングレート。
+            output_device_id (int, optional): 音声を出力するデバイスのID。Noneの場合、デフォルトの出力デバイスを使用します。
+            on_start (callable, optional): 音声の再生が実際に始まったときにイベントループ上で呼ばれる関数。
+
+        Returns:
+            asyncio.Future: 再生完了時にTrueがセットされるFuture。
+        """
+        self._ensure_started()
+
+        future = self._loop.create_future()
+        data = self._to_stream_format(data)
+        if len(data) == 0:
+            future.set_result(True)
+            return future
+        item = _PlaybackItem(data, rate, output_device_id, future, on_start)
+        self._items[future] = item
+        future.add_done_callback(lambda f: self._on_future_done(item, f))
+        self._pending.put_nowait(item)
+        return future
+
+    async def enqueue_stream(self, source, output_device_id: int = None, on_start=None):
+        """
+        少しずつ届く音声データを再生キューに追加し、再生完了時に結果がセットされるFutureを返します。
+        最初の断片がリングバッファに書き込まれた時点で再生が始まり、残りは受信しながら書き込みます。
+
+        Args:
+            source: (音声データの断片, サンプリングレート) をyieldする非同期イテレーター (例: VoicevoxAdapter.stream_voice)。
+            output_device_id (int, optional): 音声を出力するデバイスのID。Noneの場合、デフォルトの出力デバイスを使用します。
+            on_start (callable, optional): 音声の再生が実際に始まったときにイベントループ上で呼ばれる関数。
+
+        Returns:
+            asyncio.Future: 再生完了時にTrueがセットされるFuture。
+        """
+        self._ensure_started()
+
+        future = self._loop.create_future()
+        item = _PlaybackItem(None, None, output_device_id, future, on_start, source=source)
+        self._items[future] = item
+        future.add_done_callback(lambda f: self._on_future_done(item, f))
+        self._pending.put_nowait(item)
+        return future
+
+    def elapsed(self, future):
+        """
+        enqueue/enqueue_streamが返したFutureの音声を、出力ストリームが実際に読み出した位置から何秒再生したかを返します。
+        最後のコールバックで出力したブロックの中は、経過時間で補間します。
+
+        Returns:
+            float | None: 再生位置 (秒)。再生開始前、または再生が完了・キャンセルされた場合はNone。
+        """
+        item = self._items.get(future)
+        clock = self._clock
+        if item is None or item.start_pos is None or clock is None:
+            return None
+        position, count, clocked_at = clock
+        position += min(count, int((time.monotonic() - clocked_at) * item.rate))
+        if position <= item.start_pos:
+            return None
+        if item.end_pos is not None:
+            position = min(position, item.end_pos)
+        return (position - item.start_pos) / item.rate
+
+    def cancel_all(self):
+        """
+        再生中・再生待ちのすべての音声をキャンセルします。
+        """
+        for item in list(self._active_items):
+            item.future.cancel()
+        while self._pending is not None and not self._pending.empty():
+            self._pending.get_nowait().future.cancel()
+
+    async def close(self):
+        """
+        再生をすべて中断し、出力ストリームを閉じます。
+        """
+        self.cancel_all()
+        if self._feeder_task is not None:
+            self._feeder_task.cancel()
+            await asyncio.gather(self._feeder_task, return_exceptions=True)
+            self._feeder_task = None
+        self._active_items.clear()
+        self._items.clear()
+        self._close_stream()
+
+    def stats(self):
+        """再生の統計情報を返します。"""
+        return {
+            "underrun_count": self.underrun_count,
+            "output_underflow_count": self.output_underflow_count,
+            "played_item_count": self.played_item_count,
+            "stall_count": self.stall_count,
+            "buffered_seconds": round(self._ring.available_read() / self._stream_rate, 3) if self._ring else 0.0,
+        }
+
+    async def play_audio_data(self, data: np.ndarray, rate: int, output_device_id: int = None, on_start=None):
         """
         numpy配列の音声データとサンプリングレートを指定されたサウンドデバイスで再生します。
+        再生キューに追加し、再生が完了するまで待機します。
 
         Args:
             data (np.ndarray): 音声データ (numpy配列)。
             rate (int): サンプリングレート。
             output_device_id (int, optional): 音声を出力するデバイスのID。Noneの場合、デフォルトの出力デバイスを使用します。
+            on_start (callable, optional): 音声の再生が実際に始まったときにイベントループ上で呼ばれる関数。
         """
         logging.debug(f"--- デバッグ情報: 音声再生開始 (出力デバイスID: {output_device_id}, サンプリングレート: {rate}) ---")
         try:
-            # sounddevice.playは同期的なのでasyncio.to_threadでラップ
-            await asyncio.to_thread(sd.play, data, samplerate=rate, device=output_device_id)
-            await asyncio.to_thread(sd.wait) # 再生が完了するまで待機
+            future = await self.enqueue(data, rate, output_device_id, on_start)
+            await future # 再生が完了するまで待機
             logging.debug("--- デバッグ情報: 音声再生完了 ---")
 
+        except asyncio.CancelledError:
+            logging.debug("--- デバッグ情報: 音声再生をキャンセルしました ---")
+            raise
         except Exception as e:
             logging.error(f"エラー: 音声再生中に問題が発生しました: {e}")
             logging.debug("--- デバッグ情報: 音声再生エラー ---")
 
+    async def play_audio_stream(self, source, output_device_id: int = None, on_start=None, on_enqueue=None):
+        """
+        少しずつ届く音声データを受信しながら再生し、再生が完了するまで待機します。
+
+        Args:
+            source: (音声データの断片, サンプリングレート) をyieldする非同期イテレーター。
+            output_device_id (int, optional): 音声を出力するデバイスのID。Noneの場合、デフォルトの出力デバイスを使用します。
+            on_start (callable, optional): 音声の再生が実際に始まったときにイベントループ上で呼ばれる関数。
+            on_enqueue (callable, optional): 再生キューに追加した直後に、enqueue_streamが返したFutureを引数に呼ばれる関数
+                                             (口パクの予約など、再生位置を追う処理に使います)。
+        """
+        logging.debug(f"--- デバッグ情報: ストリーミング再生開始 (出力デバイスID: {output_device_id}) ---")
+        try:
+            future = await self.enqueue_stream(source, output_device_id, on_start)
+            if on_enqueue is not None:
+                on_enqueue(future)
+            await future
+            logging.debug("--- デバッグ情報: ストリーミング再生完了 ---")
+
+        except asyncio.CancelledError:
+            logging.debug("--- デバッグ情報: ストリーミング再生をキャンセルしました ---")
+            raise
+        except Exception as e:
+            logging.error(f"エラー: 音声再生中に問題が発生しました: {e}")
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("PlaySoundのテストを開始します。")
@@ -55,7 +599,7 @@ if __name__ == "__main__":
     t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
     amplitude = np.iinfo(np.int16).max * 0.5 # 振幅
     data = amplitude * np.sin(2 * np.pi * frequency * t)
-    audio_data_np = data.astype(np.float32) # sounddeviceはfloat32を推奨
+    audio_data_np = data.astype(np.int16) # VOICEVOXの出力と同じint16形式
 
     player = PlaySound()
     logging.info("ダミー音声の再生テストを開始します。")
@@ -74,5 +618,6 @@ if __name__ == "__main__":
             # await player.play_audio_data(audio_data_np, sample_rate, output_device_id=cable_input_id)
 
         logging.info("ダミー音声の再生テストが完了しました。")
+        await player.close()
 
     asyncio.run(test_play_audio())
@@ -0,0 +1,134 @@
+import logging
+import re
+
+# 文末として扱う記号
+SENTENCE_TERMINATORS = "。！？!?…\n"
+# 文末記号の直後に続く場合、同じ文に含める閉じ括弧類
+CLOSING_CHARS = "」』）)】〉》”’"
+
+
+class SentenceSplitter:
+    """
+    ストリーミングで届くテキスト断片を、日本語の文末記号 (。！？…) で文単位に切り出します。
+    """
+
+    def __init__(self, min_length: int = 2):
+        """
+        Args:
+            min_length (int): これより短い文 (例: 「…」単体) は次の文と結合します。
+        """
+        self.min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text: str):
+        """
+        テキスト断片を追加し、確定した文のリストを返します。
+        """
+        if not text:
+            return []
+        self._buffer += text
+
+        sentences = []
+        start = 0
+        i = 0
+        length = len(self._buffer)
+        while i < length:
+            if self._buffer[i] not in SENTENCE_TERMINATORS:
+                i += 1
+                continue
+
+            # 「！？」「……」「。」」のような連続する記号・閉じ括弧までを文末とする
+            end = i + 1
+            while end < length and (self._buffer[end] in SENTENCE_TERMINATORS or self._buffer[end] in CLOSING_CHARS):
+                end += 1
+            if end >= length:
+                # 次の断片で文末記号や閉じ括弧が続く可能性があるため確定を保留
+                break
+
+            sentence = self._buffer[start:end].strip()
+            if len(sentence) >= self.min_length:
+                sentences.append(sentence)
+                start = end
+            i = end
+
+        self._buffer = self._buffer[start:]
+        if sentences:
+            logging.debug(f"--- デバッグ情報: 文の切り出し -> {sentences} ---")
+        return sentences
+
+    def flush(self):
+        """
+        バッファに残っているテキストを最後の文として返します。
+        """
+        remaining = self._buffer.strip()
+        self._buffer = ""
+        return [remaining] if remaining else []
+
+
+# 複数コメントへの回答で、各回答の先頭に付ける番号マーカー (例: 【1】)
+SECTION_MARKER = re.compile(r"【(\d+)】")
+
+
+class SectionedSentenceSplitter:
+    """
+    番号マーカー (【1】【2】…) で区切られた応答を、(番号, 文) の組に切り出します。
+    マーカー自体は読み上げる文に含めません。max_sectionを超える番号のマーカーは、番号を切り替えずに取り除きます。
+    """
+
+    def __init__(self, first_section: int = 1, min_length: int = 2, max_section: int = 0):
+        """
+        Args:
+            first_section (int | None): 最初のマーカーより前のテキストに割り当てる番号。
+            min_length (int): SentenceSplitterに渡す最小文長。
+            max_section (int): 有効な番号の上限 (1〜max_section)。0の場合は上限なし。
+        """
+        self.section = first_section
+        self.max_section = max_section
+        self.marker_count = 0 # 番号を切り替えたマーカーの数
+        self.ignored_marker_count = 0 # 範囲外のため無視したマーカーの数
+        self._splitter = SentenceSplitter(min_length)
+        self._pending = ""
+
+    def _split(self, text: str):
+        return [(self.section, sentence) for sentence in self._splitter.feed(text)]
+
+    def feed(self, text: str):
+        """
+        テキスト断片を追加し、確定した (番号, 文) のリストを返します。
+        """
+        self._pending += text
+        results = []
+        while True:
+            match = SECTION_MARKER.search(self._pending)
+            if not match:
+                break
+            section = int(match.group(1))
+            if section < 1 or (self.max_section and section > self.max_section):
+                self.ignored_marker_count += 1
+                logging.warning(f"範囲外の回答番号のマーカーを無視しました: {match.group(0)}")
+                self._pending = self._pending[:match.start()] + self._pending[match.end():]
+                continue
+            # マーカーより前のテキストは前の回答の最後の文として確定させる
+            results += self._split(self._pending[:match.start()])
+            results += [(self.section, sentence) for sentence in self._splitter.flush()]
+            self.section = section
+            self.marker_count += 1
+            self._pending = self._pending[match.end():]
+
+        # マーカーが断片の境界で途切れている可能性があるため、末尾付近の「【」以降は保留する
+        hold = self._pending.rfind("【")
+        if hold != -1 and "】" not in self._pending[hold:] and len(self._pending) - hold <= 6:
+            safe, self._pending = self._pending[:hold], self._pending[hold:]
+        else:
+            safe, self._pending = self._pending, ""
+        results += self._split(safe)
+        return results
+
+    def flush(self):
+        """
+        バッファに残っているテキストを最後の文として返します。
+        """
+        results = self._split(self._pending)
+        self._pending = ""
+        results += [(self.section, sentence) for sentence in self._splitter.flush()]
+        return results
@@ -0,0 +1,196 @@
+import asyncio
+import bisect
+import logging
+import re
+import time
+
+# 句読点など、直後にポーズが入る (VOICEVOXのpause_moraに対応する) 記号
+PAUSE_CHARS = "、。，,．.！？!?…\n"
+# テキストを「句読点で終わる区間」に分ける
+TEXT_SEGMENT = re.compile(f"[^{PAUSE_CHARS}]+[{PAUSE_CHARS}]*|[{PAUSE_CHARS}]+")
+
+
+def _mora_length(mora: dict):
+    return (mora.get("consonant_length") or 0.0) + (mora.get("vowel_length") or 0.0)
+
+
+class SubtitleTimeline:
+    """
+    発話テキストの各文字を表示し始める時刻 (音声の再生開始からの秒数) の一覧。
+    VOICEVOXのaudio_queryに含まれるモーラごとの長さだけから計算し、実行時に音声は解析しません。
+    """
+
+    def __init__(self, text: str, cues, duration: float):
+        """
+        Args:
+            text (str): 発話テキスト。
+            cues (list[tuple[float, int]]): (時刻, その時刻までに表示する文字数) のリスト。時刻の昇順。
+            duration (float): 音声全体の長さ (秒)。
+        """
+        self.text = text
+        self.duration = duration
+        self._times = [cue_time for cue_time, _ in cues]
+        self._counts = [count for _, count in cues]
+        self._pages = {} # max_chars -> ページ一覧
+
+    @classmethod
+    def from_audio_query(cls, text: str, query: dict):
+        """
+        audio_queryのアクセント句・モーラの長さから、文字ごとの表示時刻を計算します。
+
+        句読点 (pause_mora) でテキストとアクセント句の区切りが一致する場合は区間ごとに、
+        一致しない場合はテキスト全体に、モーラ数に比例して文字を割り当てます。
+        """
+        speed = query.get("speedScale") or 1.0
+        pause_length = query.get("pauseLength")
+        pause_scale = query.get("pauseLengthScale") or 1.0
+
+        # 句読点のポーズで区切ったモーラの開始時刻のグループ
+        groups = [[]]
+        elapsed = query.get("prePhonemeLength") or 0.0
+        for phrase in query.get("accent_phrases", []):
+            for mora in phrase.get("moras", []):
+                groups[-1].append(elapsed / speed)
+                elapsed += _mora_length(mora)
+            pause_mora = phrase.get("pause_mora")
+            if pause_mora:
+                groups.append([])
+                elapsed += (pause_length if pause_length is not None else _mora_length(pause_mora)) * pause_scale
+        speech_end = elapsed / speed
+        duration = (elapsed + (query.get("postPhonemeLength") or 0.0)) / speed
+        groups = [group for group in groups if group]
+
+        segments = TEXT_SEGMENT.findall(text)
+        if len(segments) != len(groups):
+            # 区切りが一致しない場合は全体を1区間として扱う
+            segments = [text]
+            groups = [[start for group in groups for start in group]]
+
+        cues = []
+        offset = 0
+        for segment, starts in zip(segments, groups):
+            for index, start in enumerate(starts):
+                # モーラが鳴り始めた時点で、そのモーラに対応する文字まで表示する (読み上げより表示が遅れないように)
+                count = offset + round(len(segment) * (index + 1) / len(starts))
+                cues.append((start, count))
+            offset += len(segment)
+        cues.append((speech_end, len(text)))
+        return cls(text, cues, duration)
+
+    @classmethod
+    def uniform(cls, text: str, duration: float):
+        """
+        audio_queryがない場合 (キャッシュ済みの音声など) に、音声の長さに対して文字を等間隔に割り当てます。
+        """
+        if not text:
+            return cls(text, [], duration)
+        step = duration / len(text)
+        return cls(text, [(index * step, index + 1) for index in range(len(text))], duration)
+
+    def visible_chars(self, elapsed: float):
+        """再生開始からelapsed秒の時点で表示している文字数を返します。"""
+        index = bisect.bisect_right(self._times, elapsed)
+        return self._counts[index - 1] if index else 0
+
+    def pages(self, max_chars: int):
+        """
+        テキストをmax_chars文字以内のページに分割し、各ページの (開始位置, 終了位置) を返します。
+        なるべく句読点の直後で区切ります。
+        """
+        if max_chars in self._pages:
+            return self._pages[max_chars]
+        pages = []
+        start = 0
+        while start < len(self.text):
+            end = min(start + max_chars, len(self.text))
+            if end < len(self.text):
+                breaks = [i + 1 for i in range(start, end) if self.text[i] in PAUSE_CHARS]
+                if breaks and breaks[-1] > start:
+                    end = breaks[-1]
+            pages.append((start, end))
+            start = end
+        self._pages[max_chars] = pages
+        return pages
+
+    def render(self, elapsed: float, max_chars: int = 0):
+        """
+        再生開始からelapsed秒の時点で表示するテキストを返します。
+        max_charsを指定した場合は、読み上げ中の位置を含むページのうち表示済みの部分だけを返します。
+        """
+        visible = self.visible_chars(elapsed)
+        if not max_chars or len(self.text) <= max_chars:
+            return self.text[:visible]
+        for start, end in self.pages(max_chars):
+            if visible <= end:
+                return self.text[start:visible]
+        return ""
+
+
+class ProgressiveSubtitle:
+    """
+    SubtitleTimelineに従って、OBSのテキストソースに読み上げ中の字幕を少しずつ表示します。
+    更新は一定のフレームレートに間引き、表示が変わったときだけOBSController.queue_textに渡します
+    (queue_textは短時間の更新を1回のリクエストバッチにまとめて送ります)。
+    """
+
+    def __init__(self, obs_controller, source_name: str, fps: float = 15.0, max_chars: int = 60):
+        """
+        Args:
+            obs_controller (OBSController): テキストの送信に使うOBSController。
+            source_name (str): 字幕を表示するテキストソース名。
+            fps (float): 字幕を更新する最大頻度 (回/秒)。
+            max_chars (int): 1度に表示する最大文字数。超える場合はページを切り替えて表示します。0の場合は制限なし。
+        """
+        self.obs_controller = obs_controller
+        self.source_name = source_name
+        self.fps = fps
+        self.max_chars = max_chars
+        self._task = None
+
+        # 統計情報
+        self.started_count = 0
+        self.frame_count = 0
+        self.update_count = 0
+
+    def start(self, timeline: SubtitleTimeline, started_at: float = None):
+        """
+        字幕の表示を開始します。表示中の字幕があれば打ち切って置き換えます。
+
+        Args:
+            timeline (SubtitleTimeline): 表示する字幕のタイムライン。
+            started_at (float, optional): 音声の再生が始まった時刻 (time.monotonic)。Noneの場合は現在時刻。
+        """
+        self.stop()
+        self.started_count += 1
+        started_at = time.monotonic() if started_at is None else started_at
+        self._task = asyncio.create_task(self._run(timeline, started_at))
+
+    def stop(self):
+        """表示中の字幕の更新を止めます (表示済みのテキストはそのまま残ります)。"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self, timeline: SubtitleTimeline, started_at: float):
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        shown = None
+        while True:
+            elapsed = time.monotonic() - started_at
+            text = timeline.render(elapsed, self.max_chars)
+            self.frame_count += 1
+            if text != shown:
+                self.obs_controller.queue_text(self.source_name, text)
+                self.update_count += 1
+                shown = text
+            if elapsed >= timeline.duration:
+                break
+            await asyncio.sleep(interval)
+        logging.debug(f"--- デバッグ情報: 字幕の表示完了 ({len(timeline.text)}文字, {timeline.duration:.2f}秒) ---")
+
+    def stats(self):
+        """字幕表示の統計情報を返します。"""
+        return {
+            "started_count": self.started_count,
+            "frame_count": self.frame_count,
+            "update_count": self.update_count,
+        }
@@ -1,97 +1,510 @@
-import requests
-import json
+import aiohttp
 import io
 import soundfile as sf
 import numpy as np
 import logging
 import asyncio # asyncioをインポート
+import time
+from collections import OrderedDict, deque
+
+import latency_tracer
+from audio_cache import AudioCache
+from wav_decoder import decode_wav, WavDecodeError, WavStreamDecoder
+
+
+class VoicevoxEngine:
+    """
+    VOICEVOXエンジン1台分の状態 (処理中のリクエスト数・応答時間・ヘルスチェック結果)。
+
+    連続して失敗したエンジンは eject_seconds の間だけ振り分け対象から外し (ejected)、
+    ヘルスチェックが成功するか、期間が過ぎると再び振り分け対象に戻します。
+    """
+
+    def __init__(self, base_url: str, failure_threshold: int = 3, eject_seconds: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.inflight = 0
+        self.consecutive_failures = 0
+        self.ejected_at = None
+        self.version = None
+
+        # 統計情報
+        self.request_count = 0
+        self.failure_count = 0
+        self.eject_count = 0
+        self.max_inflight = 0
+        self.latencies = deque(maxlen=200) # audio_query + synthesis の所要時間 (秒)
+
+    @property
+    def healthy(self):
+        return self.ejected_at is None or time.monotonic() - self.ejected_at >= self.eject_seconds
+
+    def begin(self):
+        self.inflight += 1
+        self.request_count += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+
+    def end(self):
+        self.inflight -= 1
+
+    def record_success(self, latency: float = None):
+        if latency is not None:
+            self.latencies.append(latency)
+        self.consecutive_failures = 0
+        if self.ejected_at is not None:
+            logging.info(f"VOICEVOXエンジンを振り分け対象に戻しました: {self.base_url}")
+        self.ejected_at = None
+
+    def record_failure(self):
+        self.failure_count += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            if self.ejected_at is None:
+                self.eject_count += 1
+                logging.warning(f"VOICEVOXエンジンを振り分け対象から外しました: {self.base_url} (連続失敗: {self.consecutive_failures}回)")
+            self.ejected_at = time.monotonic()
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "version": self.version,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "request_count": self.request_count,
+            "failure_count": self.failure_count,
+            "eject_count": self.eject_count,
+            "avg_latency": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p95_latency": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else None,
+        }
+
 
 class VoicevoxAdapter:
     VOICEVOX_API_BASE_URL = "http://localhost:50021"
 
-    def __init__(self):
+    def __init__(self, max_connections: int = 4, connect_timeout: float = 3.0, request_timeout: float = 60.0,
+                 keepalive_timeout: float = 60.0, cache: AudioCache = None, base_urls=None,
+                 health_check_interval: float = 10.0, failure_threshold: int = 3, eject_seconds: float = 30.0,
+                 query_cache_size: int = 256):
+        """
+        Args:
+            max_connections (int): VOICEVOXエンジン1台あたりの同時接続数の上限 (コネクションプールのサイズ)。
+            connect_timeout (float): 接続確立のタイムアウト (秒)。
+            request_timeout (float): 1リクエスト全体のタイムアウト (秒)。
+            keepalive_timeout (float): 使用されていないkeep-alive接続を保持する時間 (秒)。
+            cache (AudioCache, optional): 合成済み音声のキャッシュ。Noneの場合はキャッシュしません。
+            base_urls (list[str], optional): VOICEVOXエンジンのURLのリスト。Noneの場合はVOICEVOX_API_BASE_URLの1台のみ。
+            health_check_interval (float): /versionによるヘルスチェックの間隔 (秒)。0の場合はヘルスチェックを行いません。
+            failure_threshold (int): この回数連続で失敗したエンジンを振り分け対象から外します。
+            eject_seconds (float): 振り分け対象から外したエンジンを、ヘルスチェックなしで再び試すまでの時間 (秒)。
+            query_cache_size (int): 音声キャッシュにヒットしたときにon_queryへ渡すため、直近に使ったaudio_queryを保持する件数。
+        """
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+        self.cache = cache
+        self.health_check_interval = health_check_interval
+        self.engines = [
+            VoicevoxEngine(url, failure_threshold, eject_seconds)
+            for url in (base_urls or [self.VOICEVOX_API_BASE_URL])
+        ]
+        self._health_check_task = None
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict() # キャッシュキー -> audio_query
         logging.debug("--- デバッグ情報: VoicevoxAdapter インスタンス化 ---")
 
-    async def __create_audio_query(self, text: str, speaker_id: int):
+    async def __aenter__(self):
+        """
+        非同期コンテキストマネージャーの開始時に、keep-alive接続を保持するHTTPセッションを作成します。
+        """
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        非同期コンテキストマネージャーの終了時にHTTPセッションを閉じます。
+        """
+        await self.close()
+
+    async def open(self):
+        """VOICEVOX APIとのコネクションプールを作成し、ヘルスチェックを開始します。"""
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections * len(self.engines),
+            limit_per_host=self.max_connections,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout, connect=self.connect_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        logging.debug(f"--- デバッグ情報: VOICEVOXコネクションプール作成 (エンジン数: {len(self.engines)}, 1台あたりの最大接続数: {self.max_connections}) ---")
+        if self.health_check_interval > 0 and self._health_check_task is None:
+            self._health_check_task = asyncio.create_task(self._health_check_loop())
+
+    async def close(self):
+        """ヘルスチェックを停止し、VOICEVOX APIとのコネクションプールを閉じます。"""
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            await asyncio.gather(self._health_check_task, return_exceptions=True)
+            self._health_check_task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            logging.debug("--- デバッグ情報: VOICEVOXコネクションプールを閉じました ---")
+
+    async def check_engine(self, engine: VoicevoxEngine):
+        """
+        エンジンの/versionにリクエストし、応答の有無でエンジンの状態を更新します。
+
+        Returns:
+            bool: エンジンが応答した場合はTrue。
+        """
+        try:
+            timeout = aiohttp.ClientTimeout(total=max(self.connect_timeout, 1.0))
+            async with self.session.get(f"{engine.base_url}/version", timeout=timeout) as response:
+                response.raise_for_status()
+                engine.version = (await response.text()).strip('"')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.debug(f"--- デバッグ情報: VOICEVOXエンジンのヘルスチェック失敗 ({engine.base_url}): {e} ---")
+            engine.record_failure()
+            return False
+        engine.record_success()
+        return True
+
+    async def _health_check_loop(self):
+        """全エンジンのヘルスチェックを一定間隔で行うタスクです。"""
+        while True:
+            await asyncio.gather(*(self.check_engine(engine) for engine in self.engines))
+            await asyncio.sleep(self.health_check_interval)
+
+    def _select_engine(self, exclude=()):
+        """
+        処理中のリクエストが最も少ない正常なエンジンを選びます。
+        正常なエンジンがない場合は、最も早く振り分け対象から外れたエンジンを試します。
+        """
+        candidates = [engine for engine in self.engines if engine not in exclude]
+        healthy = [engine for engine in candidates if engine.healthy]
+        if healthy:
+            # 処理中の数が同じなら、直近の応答時間が短いエンジンを優先する
+            return min(healthy, key=lambda engine: (engine.inflight, engine.latencies[-1] if engine.latencies else 0.0))
+        return min(candidates, key=lambda engine: engine.ejected_at)
+
+    def engine_stats(self):
+        """エンジンごとの統計情報を返します。"""
+        return [engine.stats() for engine in self.engines]
+
+    async def __create_audio_query(self, engine: VoicevoxEngine, text: str, speaker_id: int):
         """
         VOICEVOX APIのaudio_queryエンドポイントにリクエストを送信し、音声合成クエリを生成します。
         """
         query_payload = {"text": text, "speaker": speaker_id}
         logging.debug(f"--- デバッグ情報: __create_audio_query リクエストペイロード -> {query_payload} ---")
-        # requests.postは同期的なのでasyncio.to_threadでラップ
-        audio_query_response = await asyncio.to_thread(requests.post,
-            f"{self.VOICEVOX_API_BASE_URL}/audio_query",
-            params=query_payload
-        )
-        audio_query_response.raise_for_status() # HTTPエラーがあれば例外を発生
-        query_data = audio_query_response.json()
+        async with self.session.post(f"{engine.base_url}/audio_query", params=query_payload) as audio_query_response:
+            audio_query_response.raise_for_status() # HTTPエラーがあれば例外を発生
+            query_data = await audio_query_response.json()
         logging.debug(f"--- デバッグ情報: __create_audio_query レスポンス -> {query_data} ---")
         return query_data
 
-    async def __create_request_audio(self, query_data: dict, speaker_id: int):
+    async def __create_request_audio(self, engine: VoicevoxEngine, query_data: dict, speaker_id: int):
         """
         VOICEVOX APIのsynthesisエンドポイントにリクエストを送信し、音声バイト列を生成します。
         """
         synthesis_payload = {"speaker": speaker_id}
         logging.debug(f"--- デバッグ情報: __create_request_audio リクエストペイロード -> {synthesis_payload} ---")
-        # requests.postは同期的なのでasyncio.to_threadでラップ
-        synthesis_response = await asyncio.to_thread(requests.post,
-            f"{self.VOICEVOX_API_BASE_URL}/synthesis",
-            headers={"Content-Type": "application/json"},
+        async with self.session.post(
+            f"{engine.base_url}/synthesis",
             params=synthesis_payload,
-            data=json.dumps(query_data)
-        )
-        synthesis_response.raise_for_status() # HTTPエラーがあれば例外を発生
+            json=query_data
+        ) as synthesis_response:
+            synthesis_response.raise_for_status() # HTTPエラーがあれば例外を発生
+            audio_bytes = await synthesis_response.read()
         logging.debug("--- デバッグ情報: __create_request_audio レスポンス (バイナリデータ) 受信 ---")
-        return synthesis_response.content
+        return audio_bytes
+
+    @staticmethod
+    def _is_engine_failure(error: Exception):
+        """エンジン側の障害 (接続エラー・タイムアウト・5xx) であればTrueを返します。"""
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status >= 500
+        return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+    def _remember_query(self, text: str, speaker_id: int, synthesis_params: dict, query_data: dict, on_query=None):
+        """合成に使ったaudio_queryを保持し、on_queryが指定されていれば渡します。"""
+        if self.query_cache_size > 0:
+            key = AudioCache.make_key(text, speaker_id, synthesis_params)
+            self._queries[key] = query_data
+            self._queries.move_to_end(key)
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        if on_query is not None:
+            on_query(query_data)
+
+    def _replay_query(self, cache_key: str, on_query=None):
+        """音声キャッシュにヒットしたとき、保持しているaudio_queryがあればon_queryに渡します。"""
+        query_data = self._queries.get(cache_key)
+        if on_query is not None and query_data is not None:
+            on_query(query_data)
+
+    async def __synthesize(self, text: str, speaker_id: int, synthesis_params: dict = None, on_query=None):
+        """
+        負荷の最も低いエンジンでaudio_queryとsynthesisを行い、WAVのバイト列を返します。
+        エンジン側の障害で失敗した場合は、まだ試していない別のエンジンで再試行します。
+        """
+        tried = []
+        while True:
+            engine = self._select_engine(exclude=tried)
+            tried.append(engine)
+            engine.begin()
+            started_at = time.monotonic()
+            try:
+                # 1. audio_query (音声合成クエリの生成)
+                with latency_tracer.span("audio_query"):
+                    query_data = await self.__create_audio_query(engine, text, speaker_id)
+                if synthesis_params:
+                    query_data.update(synthesis_params)
+                # 2. synthesis (音声合成)
+                with latency_tracer.span("synthesis"):
+                    audio_bytes = await self.__create_request_audio(engine, query_data, speaker_id)
+                self._remember_query(text, speaker_id, synthesis_params, query_data, on_query)
+            except Exception as e:
+                if not self._is_engine_failure(e):
+                    raise
+                engine.record_failure()
+                if len(tried) >= len(self.engines):
+                    raise
+                logging.warning(f"VOICEVOXエンジン {engine.base_url} での合成に失敗したため、別のエンジンで再試行します: {e}")
+                continue
+            finally:
+                engine.end()
+            engine.record_success(time.monotonic() - started_at)
+            return audio_bytes
 
-    async def get_voice(self, text: str, speaker_id: int = 3):
+    async def get_voice(self, text: str, speaker_id: int = 3, synthesis_params: dict = None, on_query=None,
+                        pin_cache: bool = False):
         """
         VOICEVOX APIを使用してテキストを音声に変換し、numpy配列とサンプリングレートを返します。
+        キャッシュが設定されている場合は、先にキャッシュを参照します。
 
         Args:
             text (str): 音声に変換するテキスト。
             speaker_id (int): VOICEVOXの話者ID。
+            synthesis_params (dict, optional): audio_queryの値を上書きする合成パラメータ (例: {"speedScale": 1.1})。
+            on_query (callable, optional): 合成に使ったaudio_query (dict) を引数に呼ばれる関数 (字幕のタイミング計算用)。
+                                           キャッシュにヒットした場合は、保持しているaudio_queryがあるときだけ呼ばれます。
+            pin_cache (bool): Trueの場合は定型フレーズとしてキャッシュに保持します (LRUで追い出さず、ディスクにも保存)。
 
         Returns:
             tuple[np.ndarray, int]: 音声データ (numpy配列) とサンプリングレート。
                                     エラーが発生した場合は (None, None) を返します。
         """
         logging.debug(f"--- デバッグ情報: VoicevoxAdapter.get_voice 開始 (テキスト: '{text}', 話者ID: {speaker_id}) ---")
+        cache_key = None
+        if self.cache is not None:
+            cache_key = AudioCache.make_key(text, speaker_id, synthesis_params)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logging.debug("--- デバッグ情報: 音声キャッシュにヒットしました ---")
+                if pin_cache:
+                    self.cache.put(cache_key, *cached, pinned=True)
+                self._replay_query(cache_key, on_query)
+                return cached
+
         try:
-            # 1. audio_query (音声合成クエリの生成)
-            query_data = await self.__create_audio_query(text, speaker_id)
+            # コンテキストマネージャー外で呼ばれた場合もコネクションプールを用意する
+            await self.open()
 
-            # 2. synthesis (音声合成)
-            audio_bytes = await self.__create_request_audio(query_data, speaker_id)
+            # 1. audio_query と 2. synthesis (負荷の低いエンジンに振り分け)
+            audio_bytes = await self.__synthesize(text, speaker_id, synthesis_params, on_query)
 
             # 3. バイト列から音声データを読み込み、numpy配列とサンプリングレートを取得
-            # sf.readは同期的なのでasyncio.to_threadでラップ
-            data, rate = await asyncio.to_thread(sf.read, io.BytesIO(audio_bytes))
+            with latency_tracer.span("decode"):
+                data, rate = await self.decode_audio(audio_bytes)
             logging.debug("--- デバッグ情報: 音声データ (numpy配列) とサンプリングレート取得完了 ---")
+            if cache_key is not None:
+                self.cache.put(cache_key, data, rate, pinned=pin_cache)
             return data, rate
 
-        except requests.exceptions.ConnectionError:
+        except aiohttp.ClientConnectionError:
             logging.error("エラー: VOICEVOXアプリケーションが起動していません。またはAPIサーバーに接続できません。")
             logging.error("VOICEVOXアプリケーションを起動してから再度お試しください。")
-        except requests.exceptions.RequestException as e:
-            logging.error(f"VOICEVOX APIリクエストエラー: {e}")
-            logging.error(f"レスポンス内容: {e.response.text if e.response else 'N/A'}")
+        except aiohttp.ClientResponseError as e:
+            logging.error(f"VOICEVOX APIリクエストエラー: {e.status} {e.message}")
+        except asyncio.TimeoutError:
+            logging.error("VOICEVOX APIリクエストがタイムアウトしました。")
         except Exception as e:
             logging.error(f"予期せぬエラーが発生しました: {e}")
         return None, None
 
+    async def stream_voice(self, text: str, speaker_id: int = 3, synthesis_params: dict = None, chunk_size: int = 16384,
+                           on_query=None):
+        """
+        VOICEVOX APIで音声を合成し、synthesisのレスポンスを受信しながらPCMデータを少しずつyieldする非同期ジェネレーターです。
+        レスポンス全体の受信を待たずに再生を始められるため、長い音声ほど最初の音が出るまでの時間を短縮できます。
+        キャッシュにある場合はキャッシュの音声を1回でyieldし、受信し終えた音声はキャッシュに保存します。
+
+        Args:
+            text (str): 音声に変換するテキスト。
+            speaker_id (int): VOICEVOXの話者ID。
+            synthesis_params (dict, optional): audio_queryの値を上書きする合成パラメータ。
+            chunk_size (int): 1回に読み出すレスポンスの最大バイト数。
+            on_query (callable, optional): 合成に使ったaudio_query (dict) を引数に、最初の断片をyieldする前に呼ばれる関数。
+
+        Yields:
+            tuple[np.ndarray, int]: PCMデータの断片とサンプリングレート。
+                                    エラーが発生した場合はログを出力して終了します。
+        """
+        logging.debug(f"--- デバッグ情報: VoicevoxAdapter.stream_voice 開始 (テキスト: '{text}', 話者ID: {speaker_id}) ---")
+        cache_key = None
+        if self.cache is not None:
+            cache_key = AudioCache.make_key(text, speaker_id, synthesis_params)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logging.debug("--- デバッグ情報: 音声キャッシュにヒットしました ---")
+                self._replay_query(cache_key, on_query)
+                yield cached
+                return
+
+        await self.open()
+        engine = self._select_engine()
+        engine.begin()
+        started_at = time.monotonic()
+        try:
+            with latency_tracer.span("audio_query"):
+                query_data = await self.__create_audio_query(engine, text, speaker_id)
+            if synthesis_params:
+                query_data.update(synthesis_params)
+            synthesis_started_at = time.monotonic()
+            self._remember_query(text, speaker_id, synthesis_params, query_data, on_query)
+
+            decoder = WavStreamDecoder()
+            chunks = []
+            async with self.session.post(
+                f"{engine.base_url}/synthesis",
+                params={"speaker": speaker_id},
+                json=query_data
+            ) as synthesis_response:
+                synthesis_response.raise_for_status()
+                async for body_chunk in synthesis_response.content.iter_chunked(chunk_size):
+                    data = decoder.feed(body_chunk)
+                    if data is not None:
+                        if not chunks:
+                            # エンジンの応答時間は最初のPCMが届くまでの時間とする
+                            engine.record_success(time.monotonic() - started_at)
+                            latency_tracer.record("synthesis_first_chunk", time.monotonic() - synthesis_started_at)
+                        chunks.append(data)
+                        yield data, decoder.rate
+            latency_tracer.record("synthesis", time.monotonic() - synthesis_started_at)
+            logging.debug(f"--- デバッグ情報: stream_voice 受信完了 ({len(chunks)}チャンク, エンジン: {engine.base_url}) ---")
+            if cache_key is not None and chunks:
+                self.cache.put(cache_key, np.concatenate(chunks), decoder.rate)
+
+        except aiohttp.ClientConnectionError:
+            engine.record_failure()
+            logging.error("エラー: VOICEVOXアプリケーションが起動していません。またはAPIサーバーに接続できません。")
+        except aiohttp.ClientResponseError as e:
+            if self._is_engine_failure(e):
+                engine.record_failure()
+            logging.error(f"VOICEVOX APIリクエストエラー: {e.status} {e.message}")
+        except asyncio.TimeoutError:
+            engine.record_failure()
+            logging.error("VOICEVOX APIリクエストがタイムアウトしました。")
+        except WavDecodeError as e:
+            logging.error(f"VOICEVOXの音声データを読み込めませんでした: {e}")
+        finally:
+            engine.end()
+
+    @staticmethod
+    async def decode_audio(audio_bytes: bytes):
+        """
+        合成結果のWAVデータをnumpy配列に変換します。
+        通常はヘッダーだけを解析してPCM部分をコピーせずに参照し (int16のまま)、
+        未対応の形式の場合のみsoundfileでfloat32に変換します。
+
+        Returns:
+            tuple[np.ndarray, int]: 音声データとサンプリングレート。
+        """
+        try:
+            return decode_wav(audio_bytes)
+        except WavDecodeError as e:
+            logging.debug(f"--- デバッグ情報: {e} soundfileで読み込みます ---")
+            # sf.readは同期的なのでasyncio.to_threadでラップ
+            return await asyncio.to_thread(sf.read, io.BytesIO(audio_bytes), dtype="float32")
+
+    async def initialize_speaker(self, speaker_id: int = 3, warmup_text: str = "あ"):
+        """
+        すべてのエンジンで話者モデルを読み込み (/initialize_speaker)、短い文を1回合成しておきます。
+        VOICEVOXは話者モデルを初回の合成時に読み込むため、起動時に済ませておくと最初の応答が遅くなりません。
+
+        Args:
+            speaker_id (int): VOICEVOXの話者ID。
+            warmup_text (str): モデル読み込み後に1回だけ合成する短い文 (キャッシュには保存しません)。
+
+        Returns:
+            int: 初期化できたエンジン数。
+        """
+        await self.open()
+        results = await asyncio.gather(*(
+            self.__initialize_engine(engine, speaker_id, warmup_text) for engine in self.engines
+        ))
+        return sum(results)
+
+    async def __initialize_engine(self, engine: VoicevoxEngine, speaker_id: int, warmup_text: str):
+        started_at = time.monotonic()
+        try:
+            try:
+                async with self.session.post(
+                    f"{engine.base_url}/initialize_speaker",
+                    params={"speaker": speaker_id, "skip_reinit": "true"},
+                ) as response:
+                    response.raise_for_status()
+            except aiohttp.ClientResponseError as e:
+                if e.status != 404:
+                    raise
+                # /initialize_speakerのない古いエンジンでは、下の合成でモデルが読み込まれる
+                logging.debug(f"--- デバッグ情報: {engine.base_url} は/initialize_speakerに対応していません ---")
+
+            # モデル読み込み直後の推論も遅いため、短い文を1回合成しておく
+            query_data = await self.__create_audio_query(engine, warmup_text, speaker_id)
+            await self.__create_request_audio(engine, query_data, speaker_id)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"VOICEVOXエンジン {engine.base_url} の話者初期化に失敗しました: {e}")
+            return False
+        logging.info(f"VOICEVOXエンジン {engine.base_url} の話者{speaker_id}を初期化しました ({time.monotonic() - started_at:.2f}秒)")
+        return True
+
+    async def warm_cache(self, phrases, speaker_id: int = 3, synthesis_params: dict = None):
+        """
+        定型フレーズをまとめて合成し、キャッシュに載せておきます (LRUで追い出されず、ディスクにも保存されます)。
+
+        Returns:
+            int: 音声を用意できたフレーズ数。
+        """
+        if self.cache is None:
+            logging.debug("キャッシュが設定されていないため、ウォームアップをスキップします。")
+            return 0
+        results = await asyncio.gather(*(self.get_voice(phrase, speaker_id, synthesis_params, pin_cache=True) for phrase in phrases))
+        warmed = sum(1 for data, rate in results if data is not None)
+        logging.info(f"音声キャッシュのウォームアップ完了: {warmed}/{len(phrases)}件, 統計={self.cache.stats()}")
+        return warmed
+
 if __name__ == "__main__":
+    import sys
+    from aiohttp import web
+
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("VOICEVOXアダプタークラスのテストを開始します。")
-    adapter = VoicevoxAdapter()
 
     # テスト用のテキストと話者ID
     test_text = "こんにちは、VOICEVOXアダプタークラスのテストです。"
     test_speaker_id = 3 # ずんだもん (ノーマル)
 
     async def test_adapter():
-        data, rate = await adapter.get_voice(test_text, test_speaker_id)
+        async with VoicevoxAdapter() as adapter:
+            data, rate = await adapter.get_voice(test_text, test_speaker_id)
 
         if data is not None and rate is not None:
             logging.info(f"取得した音声データの形状: {data.shape}, サンプリングレート: {rate}")
@@ -104,4 +517,89 @@ if __name__ == "__main__":
 
         logging.info("VOICEVOXアダプタークラスのテストが完了しました。")
 
-    asyncio.run(test_adapter())
\ No newline at end of file
+    class StandInEngine:
+        """
+        エンジンプールの確認用に、VOICEVOXエンジンの代わりに応答するHTTPサーバー。
+        failingの間はすべてのエンドポイントが503を返し、synthesisはdelay秒かけて短い無音のWAVを返します。
+        """
+
+        def __init__(self, delay: float = 0.05):
+            self.delay = delay
+            self.failing = False
+            self.synthesis_count = 0
+            self.url = None
+            self._runner = None
+            wav = io.BytesIO()
+            sf.write(wav, np.zeros(2400, dtype=np.int16), 24000, format="WAV", subtype="PCM_16")
+            self._wav = wav.getvalue()
+
+        async def start(self):
+            app = web.Application(middlewares=[self._fail_middleware])
+            app.router.add_get("/version", lambda request: web.json_response("0.0.0-stand-in"))
+            app.router.add_post("/audio_query", lambda request: web.json_response({"accent_phrases": [], "speedScale": 1.0}))
+            app.router.add_post("/synthesis", self._handle_synthesis)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+            self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+
+        async def stop(self):
+            await self._runner.cleanup()
+
+        @web.middleware
+        async def _fail_middleware(self, request, handler):
+            if self.failing:
+                return web.Response(status=503)
+            return await handler(request)
+
+        async def _handle_synthesis(self, request):
+            self.synthesis_count += 1
+            await asyncio.sleep(self.delay)
+            return web.Response(body=self._wav, content_type="audio/wav")
+
+    async def test_engine_pool():
+        """
+        ローカルに立てた3台の代わりのエンジン (1台は応答が遅い) に対して、
+        負荷の低いエンジンへの振り分け・障害時の別エンジンでの再試行・ヘルスチェックによる復帰を確認します。
+        """
+        stand_ins = [StandInEngine(), StandInEngine(), StandInEngine(delay=0.3)]
+        for stand_in in stand_ins:
+            await stand_in.start()
+        try:
+            async with VoicevoxAdapter(base_urls=[stand_in.url for stand_in in stand_ins], health_check_interval=0.2,
+                                       failure_threshold=1, eject_seconds=60.0) as adapter:
+                engines = adapter.engines
+
+                # 1. 同時に届いたリクエストは、処理中の数が最も少ないエンジンに1件ずつ振り分けられる
+                await asyncio.gather(*(adapter.get_voice(f"振り分け{i}", test_speaker_id) for i in range(3)))
+                assert [stand_in.synthesis_count for stand_in in stand_ins] == [1, 1, 1], adapter.engine_stats()
+                assert all(engine.max_inflight == 1 for engine in engines), adapter.engine_stats()
+                # 処理中の数が同じなら、応答の遅いエンジンは選ばれない
+                await adapter.get_voice("遅いエンジンを避ける", test_speaker_id)
+                assert stand_ins[2].synthesis_count == 1, adapter.engine_stats()
+                logging.info("✓ 処理中のリクエストが最も少ないエンジンに振り分けられました。")
+
+                # 2. 障害の起きたエンジンで失敗したリクエストは、正常なエンジンで再試行される
+                failing = min(engines[:2], key=lambda engine: (engine.inflight, engine.latencies[-1]))
+                stand_ins[engines.index(failing)].failing = True
+                data, rate = await adapter.get_voice("再試行", test_speaker_id)
+                assert data is not None and rate == 24000
+                assert failing.failure_count >= 1 and not failing.healthy, adapter.engine_stats()
+                request_count = failing.request_count
+                await adapter.get_voice("振り分け対象外", test_speaker_id)
+                assert failing.request_count == request_count, adapter.engine_stats()
+                logging.info("✓ 失敗したリクエストが別のエンジンで再試行され、障害の起きたエンジンは振り分け対象から外れました。")
+
+                # 3. エンジンが復旧すると、eject_secondsを待たずにヘルスチェックで振り分け対象に戻る
+                stand_ins[engines.index(failing)].failing = False
+                await asyncio.sleep(adapter.health_check_interval * 3)
+                assert failing.healthy, adapter.engine_stats()
+                logging.info("✓ 復旧したエンジンがヘルスチェックで振り分け対象に戻りました。")
+                logging.info(f"エンジンの統計情報: {adapter.engine_stats()}")
+        finally:
+            for stand_in in stand_ins:
+                await stand_in.stop()
+        logging.info("エンジンプールの確認が完了しました。")
+
+    # --self-test: VOICEVOXエンジンなしで、ローカルの代わりのエンジンに対してエンジンプールの動作を確認する
+    asyncio.run(test_engine_pool() if "--self-test" in sys.argv[1:] else test_adapter())
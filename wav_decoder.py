@@ -0,0 +1,170 @@
+import struct
+import logging
+import numpy as np
+
+# WAVファイルのフォーマットコード
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (フォーマットコード, ビット深度) -> numpyのdtype
+SUPPORTED_FORMATS = {
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+}
+
+
+class WavDecodeError(ValueError):
+    """WAVデータを解析できない、または未対応の形式の場合に発生する例外。"""
+
+
+class IncompleteWavError(WavDecodeError):
+    """ヘッダーの途中でデータが途切れている場合に発生する例外。続きを受信すれば解析できる可能性があります。"""
+
+
+def _read_header(view):
+    """
+    RIFFチャンクを順にたどり、フォーマット情報・dataチャンクの開始オフセット・宣言されたサイズを返します。
+    """
+    if len(view) < 12:
+        raise IncompleteWavError("RIFFヘッダーの途中でデータが途切れています。")
+    if bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise WavDecodeError("RIFF/WAVEヘッダーが見つかりません。")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size, = struct.unpack_from("<I", view, offset + 4)
+        body = offset + 8
+
+        if chunk_id == b"fmt ":
+            if chunk_size < 16:
+                raise WavDecodeError("fmtチャンクが短すぎます。")
+            if body + chunk_size > len(view):
+                raise IncompleteWavError("fmtチャンクの途中でデータが途切れています。")
+            format_tag, channels, rate, _, block_align, bits = struct.unpack_from("<HHIIHH", view, body)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # WAVE_FORMAT_EXTENSIBLEではサブフォーマットGUIDの先頭2バイトが実際のフォーマットコード
+                format_tag, = struct.unpack_from("<H", view, body + 24)
+            fmt = {
+                "format_tag": format_tag,
+                "channels": channels,
+                "rate": rate,
+                "bits_per_sample": bits,
+                "block_align": block_align,
+            }
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise WavDecodeError("dataチャンクより前にfmtチャンクがありません。")
+            return fmt, body, chunk_size
+
+        offset = body + chunk_size + (chunk_size & 1) # チャンクは2バイト境界に揃えられている
+
+    raise IncompleteWavError("dataチャンクが見つかりません。")
+
+
+def parse_wav_header(buffer):
+    """
+    RIFF/WAVEヘッダーを解析し、フォーマット情報とPCMデータの位置を返します。
+
+    Args:
+        buffer (bytes | bytearray | memoryview): WAVデータ全体。
+
+    Returns:
+        tuple[dict, int, int]: フォーマット情報 (format_tag, channels, rate, bits_per_sample, block_align)、
+                               PCMデータの開始オフセット、PCMデータのバイト数。
+    """
+    view = memoryview(buffer)
+    fmt, data_offset, chunk_size = _read_header(view)
+    # ストリーミング出力などでサイズが未確定 (0xFFFFFFFF) の場合は、受信済みの分だけを使う
+    data_size = min(chunk_size, len(view) - data_offset)
+    data_size -= data_size % max(1, fmt["block_align"])
+    return fmt, data_offset, data_size
+
+
+def _sample_dtype(fmt: dict):
+    dtype = SUPPORTED_FORMATS.get((fmt["format_tag"], fmt["bits_per_sample"]))
+    if dtype is None:
+        raise WavDecodeError(
+            f"未対応のWAV形式です (フォーマットコード: {fmt['format_tag']}, ビット深度: {fmt['bits_per_sample']})"
+        )
+    return dtype
+
+
+def decode_wav(buffer):
+    """
+    WAVデータのPCM部分を、コピーせずにnumpy配列として参照します。
+    16bit整数PCMはint16、32bit浮動小数点PCMはfloat32の配列になります。
+
+    返される配列は元のバッファを参照するため、bytesを渡した場合は読み取り専用です。
+
+    Args:
+        buffer (bytes | bytearray | memoryview): WAVデータ全体。
+
+    Returns:
+        tuple[np.ndarray, int]: 音声データ (モノラルは1次元、複数チャンネルは (フレーム数, チャンネル数)) とサンプリングレート。
+    """
+    fmt, data_offset, data_size = parse_wav_header(buffer)
+    dtype = _sample_dtype(fmt)
+
+    data = np.frombuffer(buffer, dtype=dtype, count=data_size // dtype.itemsize, offset=data_offset)
+    if fmt["channels"] > 1:
+        data = data.reshape(-1, fmt["channels"])
+    logging.debug(f"--- デバッグ情報: WAVデコード完了 (形式: {dtype}, チャンネル数: {fmt['channels']}, サンプリングレート: {fmt['rate']}) ---")
+    return data, fmt["rate"]
+
+
+class WavStreamDecoder:
+    """
+    分割して届くWAVデータを、受信した順にPCMのnumpy配列へ変換するデコーダー。
+    ヘッダーが揃うまではバッファし、以降は受信した断片をフレーム単位でコピーせずに参照します
+    (フレームの途中で断片が途切れた場合のみ、端数を次の断片と結合します)。
+    """
+
+    def __init__(self):
+        self.format = None
+        self.rate = None
+        self.dtype = None
+        self._header = bytearray()
+        self._remaining = None # dataチャンクの残りバイト数
+        self._carry = b""      # フレームの途中で途切れた端数
+
+    def feed(self, chunk: bytes):
+        """
+        受信したバイト列を追加し、新たに確定したPCMデータを返します。
+
+        Returns:
+            np.ndarray | None: PCMデータ。ヘッダーの受信中や端数しかない場合はNone。
+        """
+        if self.format is None:
+            self._header += chunk
+            try:
+                fmt, data_offset, chunk_size = _read_header(memoryview(bytes(self._header)))
+            except IncompleteWavError:
+                return None
+            self.dtype = _sample_dtype(fmt)
+            self.format = fmt
+            self.rate = fmt["rate"]
+            self._remaining = chunk_size
+            chunk = bytes(self._header[data_offset:])
+            self._header = None
+
+        if self._remaining <= 0:
+            return None # dataチャンクより後ろのチャンクは無視する
+        if len(chunk) > self._remaining:
+            chunk = chunk[:self._remaining]
+        self._remaining -= len(chunk)
+
+        if self._carry:
+            chunk = self._carry + chunk
+        block_align = max(1, self.format["block_align"])
+        usable = len(chunk) - len(chunk) % block_align
+        self._carry = chunk[usable:]
+        if usable == 0:
+            return None
+
+        data = np.frombuffer(chunk, dtype=self.dtype, count=usable // self.dtype.itemsize)
+        if self.format["channels"] > 1:
+            data = data.reshape(-1, self.format["channels"])
+        return data
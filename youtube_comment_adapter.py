@@ -1,16 +1,57 @@
 import pytchat
 import json
+import hashlib
 import logging
 import asyncio
+import threading
 import time
 
+from comment_dedupe import TimeWindowDedupe, RotatingBloomFilter
+
 class YouTubeCommentAdapter:
-    def __init__(self, video_id: str):
+    def __init__(self, video_id: str, max_pending_batches: int = 100, dedupe_mode: str = "window",
+                 dedupe_ttl: float = 600.0, dedupe_max_entries: int = 10000, chat_factory=None,
+                 min_poll_interval: float = 1.0):
+        """
+        Args:
+            video_id (str): YouTube LiveのVideo ID。
+            max_pending_batches (int): 読み取りスレッドからイベントループへ渡す未処理バッチ数の上限。
+            dedupe_mode (str): 重複判定の方式。"window" (TTL付き集合) または "bloom" (世代交代するBloomフィルタ)。
+            dedupe_ttl (float): 重複判定に使うコメントIDを保持する時間 (秒)。
+            dedupe_max_entries (int): 重複判定に使うコメントIDの最大件数 ("bloom"では1世代あたりの件数)。
+            chat_factory (callable, optional): video_idを受け取りチャットオブジェクトを返す関数。Noneの場合はpytchat.create。
+            min_poll_interval (float): コメント取得の最小間隔 (秒)。YouTubeが指定する取得間隔 (Chatdata.interval) が
+                                       これより短い場合もこの間隔は空けます。
+        """
         self.video_id = video_id
+        self.chat_factory = chat_factory or pytchat.create
         self.chat = None
-        self.last_comment_ids = set()  # 重複コメント防止用
+        # 重複コメント防止用 (メモリ使用量に上限のある集合)
+        if dedupe_mode == "bloom":
+            self.seen_comments = RotatingBloomFilter(capacity=dedupe_max_entries, rotation_interval=dedupe_ttl)
+        elif dedupe_mode == "window":
+            self.seen_comments = TimeWindowDedupe(ttl=dedupe_ttl, max_entries=dedupe_max_entries)
+        else:
+            raise ValueError(f"不明な重複判定の方式です: {dedupe_mode} (指定可能: window / bloom)")
         self.comment_count = 0
         self.error_count = 0
+
+        # pytchatオブジェクトを専有する読み取りスレッド
+        self.max_pending_batches = max_pending_batches
+        self.min_poll_interval = min_poll_interval
+        self._loop = None
+        self._batches = None
+        self._reader_thread = None
+        self._stop_reader = threading.Event()
+
+        # 取得レイテンシ・バッチサイズの統計情報
+        self.fetch_count = 0
+        self.dropped_batch_count = 0
+        self.last_fetch_latency = 0.0
+        self.max_fetch_latency = 0.0
+        self.total_fetch_latency = 0.0
+        self.last_batch_size = 0
+        self.total_batch_size = 0
         logging.info(f"YouTubeCommentAdapter インスタンス化 (Video ID: {video_id})")
 
     async def __aenter__(self):
@@ -20,7 +61,7 @@ class YouTubeCommentAdapter:
         logging.info("pytchatオブジェクトを作成中...")
         try:
             # pytchat.create()は signal handlers を設定するため、メインスレッドで実行する必要がある
-            self.chat = pytchat.create(video_id=self.video_id)
+            self.chat = self.chat_factory(video_id=self.video_id)
             logging.info("pytchat オブジェクト作成成功")
             
             # 接続テスト
@@ -35,47 +76,123 @@ class YouTubeCommentAdapter:
             logging.error("Video IDが正しいか、ライブ配信中か確認してください。")
             self.chat = None
             raise
+
+        # 以降のpytchatオブジェクトへのアクセスは専用の読み取りスレッドのみが行う
+        self._loop = asyncio.get_running_loop()
+        self._batches = asyncio.Queue(maxsize=self.max_pending_batches)
+        self._stop_reader.clear()
+        self._reader_thread = threading.Thread(target=self.__read_loop, name="pytchat-reader", daemon=True)
+        self._reader_thread.start()
+        logging.info("pytchat 読み取りスレッドを開始しました")
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """
         非同期コンテキストマネージャーの終了時にリソースを解放します。
         """
+        self._stop_reader.set()
         if self.chat and hasattr(self.chat, 'terminate'):
             try:
                 self.chat.terminate()
                 logging.info("pytchat オブジェクトを終了しました")
             except Exception as e:
                 logging.warning(f"pytchat終了時にエラーが発生しました: {e}")
+
+        if self._reader_thread is not None:
+            # chat.get()の戻りを待つ。戻らない場合もデーモンスレッドのため終了は妨げない
+            await asyncio.to_thread(self._reader_thread.join, 3.0)
+            if self._reader_thread.is_alive():
+                logging.warning("pytchat 読み取りスレッドが時間内に終了しませんでした")
+            self._reader_thread = None
         
         logging.info(f"セッション終了統計: 取得コメント数={self.comment_count}, エラー数={self.error_count}")
+        logging.info(f"取得統計: {self.fetch_stats()}")
+        logging.info(f"重複判定統計: {self.seen_comments.stats()}")
+
+    def __read_loop(self):
+        """
+        読み取りスレッドの本体。pytchatからコメントを取得し続け、スレッドセーフにイベントループへ渡します。
+        """
+        while not self._stop_reader.is_set():
+            try:
+                # 配信状態をチェック
+                if hasattr(self.chat, 'is_alive') and not self.chat.is_alive():
+                    logging.debug("ライブ配信が終了しているか、まだ開始されていません。")
+                    self._stop_reader.wait(1.0)
+                    continue
+
+                started = time.monotonic()
+                comments_data = self.chat.get()
+                latency = time.monotonic() - started
+                error = None
+            except Exception as e:
+                comments_data, latency, error = None, 0.0, e
+
+            if self._stop_reader.is_set():
+                break
+            try:
+                self._loop.call_soon_threadsafe(self.__deliver_batch, comments_data, latency, error)
+            except RuntimeError:
+                # イベントループが既に閉じられている
+                break
+            if error is not None:
+                self._stop_reader.wait(1.0) # エラー時は連続リトライを避ける
+            else:
+                # pytchatのget()は待たずに取得するため、YouTubeが指定する取得間隔 (timeoutMs) を守る
+                self._stop_reader.wait(max(getattr(comments_data, "interval", 0) or 0, self.min_poll_interval))
+
+    def __deliver_batch(self, comments_data, latency, error):
+        """
+        読み取りスレッドから受け取ったバッチをキューに入れます (イベントループのスレッドで実行)。
+        """
+        if self._batches.full():
+            # 消費が追いつかない場合は最も古いバッチを捨てる
+            self._batches.get_nowait()
+            self.dropped_batch_count += 1
+        self._batches.put_nowait((comments_data, latency, error))
+
+    def fetch_stats(self):
+        """pytchatからの取得レイテンシとバッチサイズの統計情報を返します。"""
+        return {
+            "fetch_count": self.fetch_count,
+            "dropped_batch_count": self.dropped_batch_count,
+            "last_fetch_latency": round(self.last_fetch_latency, 3),
+            "avg_fetch_latency": round(self.total_fetch_latency / self.fetch_count, 3) if self.fetch_count else 0.0,
+            "max_fetch_latency": round(self.max_fetch_latency, 3),
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(self.total_batch_size / self.fetch_count, 2) if self.fetch_count else 0.0,
+        }
 
     async def __get_comments(self):
         """
         pytchatからコメント一覧を非同期で取得し、JSON形式で返します。
         """
-        if self.chat is None:
+        if self.chat is None or self._batches is None:
             logging.debug("pytchat オブジェクトが初期化されていません。")
             return None
 
         try:
-            # 配信状態をチェック
-            if hasattr(self.chat, 'is_alive') and not self.chat.is_alive():
-                logging.debug("ライブ配信が終了しているか、まだ開始されていません。")
-                return None
-
-            # コメントを取得（タイムアウト付き）
+            # 読み取りスレッドから届くバッチを待機（タイムアウト付き）
+            # タイムアウトしてもキューの待機をやめるだけで、スレッドが取り残されることはない
             try:
-                comments_data = await asyncio.wait_for(
-                    asyncio.to_thread(self.chat.get),
-                    timeout=3.0  # タイムアウトを3秒に延長
-                )
+                comments_data, latency, error = await asyncio.wait_for(self._batches.get(), timeout=3.0)
             except asyncio.TimeoutError:
                 logging.debug("コメント取得がタイムアウトしました")
                 return None
+            if error is not None:
+                raise error
             
             # コメントデータの解析
             comments_list = self._parse_comments_data(comments_data)
+
+            batch_size = len(comments_list) if comments_list else 0
+            self.fetch_count += 1
+            self.last_fetch_latency = latency
+            self.total_fetch_latency += latency
+            self.max_fetch_latency = max(self.max_fetch_latency, latency)
+            self.last_batch_size = batch_size
+            self.total_batch_size += batch_size
+            logging.debug(f"取得レイテンシ: {latency:.3f}秒, バッチサイズ: {batch_size}")
             
             if comments_list:
                 logging.debug(f"取得したコメント数: {len(comments_list)}")
@@ -132,43 +249,71 @@ class YouTubeCommentAdapter:
             logging.error(f"コメントデータの解析に失敗しました: {e}")
             return None
 
-    async def get_comment(self):
+    async def get_new_comments(self):
         """
-        最新の未処理コメントを取得します。
+        未処理のコメントをすべて取得し、統一フォーマットのリストで返します。
         """
         try:
             comments = await self.__get_comments()
             if not comments:
-                return None
+                return []
 
             # 新しいコメントのみを処理（重複防止）
             new_comments = []
             for comment in comments:
                 comment_id = self._extract_comment_id(comment)
-                if comment_id and comment_id not in self.last_comment_ids:
+                if comment_id and self.seen_comments.check_and_add(comment_id):
                     new_comments.append(comment)
-                    self.last_comment_ids.add(comment_id)
 
             if not new_comments:
                 logging.debug("新しいコメントは見つかりませんでした。")
-                return None
+                return []
 
-            # 最新のコメントを処理
-            latest_comment = new_comments[-1]  # 最後のコメントが最新
-            parsed_comment = self._parse_single_comment(latest_comment)
-            
-            if parsed_comment:
-                self.comment_count += 1
-                logging.info(f"新しいコメント取得成功 #{self.comment_count}")
-                logging.info(f"内容: {parsed_comment['message'][:50]}...")
-                logging.info(f"投稿者: {parsed_comment['author']['name']}")
-            
-            return parsed_comment
+            parsed_comments = []
+            for comment in new_comments:
+                parsed_comment = self._parse_single_comment(comment)
+                if parsed_comment:
+                    self.comment_count += 1
+                    logging.info(f"新しいコメント取得成功 #{self.comment_count}")
+                    logging.info(f"内容: {parsed_comment['message'][:50]}...")
+                    logging.info(f"投稿者: {parsed_comment['author']['name']}")
+                    parsed_comments.append(parsed_comment)
+            return parsed_comments
 
         except Exception as e:
             self.error_count += 1
-            logging.error(f"get_comment()でエラーが発生しました: {e}")
+            logging.error(f"get_new_comments()でエラーが発生しました: {e}")
+            return []
+
+    async def get_comment(self):
+        """
+        最新の未処理コメントを取得します。
+        """
+        new_comments = await self.get_new_comments()
+        if not new_comments:
             return None
+        return new_comments[-1]  # 最後のコメントが最新
+
+    async def run_ingestion(self, queue, idle_interval: float = 0.5):
+        """
+        コメントを継続的に取得し、キューへ投入するプロデューサータスクです。
+        応答の生成・再生とは独立して動作するため、応答中に届いたコメントも取りこぼしません。
+
+        Args:
+            queue (CommentQueue): 取得したコメントの投入先。
+            idle_interval (float): 新しいコメントがなかった場合に次の取得まで待つ時間 (秒)。
+        """
+        logging.info("コメント取得タスクを開始します。")
+        try:
+            while True:
+                new_comments = await self.get_new_comments()
+                for comment in new_comments:
+                    await queue.put(comment)
+                if not new_comments:
+                    await asyncio.sleep(idle_interval)
+        except asyncio.CancelledError:
+            logging.info("コメント取得タスクを停止しました。")
+            raise
 
     def _extract_comment_id(self, comment):
         """
@@ -182,12 +327,31 @@ class YouTubeCommentAdapter:
             elif isinstance(comment, dict) and 'id' in comment:
                 return comment['id']
             else:
-                # IDが取得できない場合、メッセージと投稿者名でハッシュを作成
-                message = str(comment)[:50]  # 最初の50文字
-                return hash(message + str(time.time()))
+                # IDが取得できない場合、投稿者・メッセージ・投稿時刻から安定したフィンガープリントを作成
+                return self._comment_fingerprint(comment)
         except:
             return None
 
+    def _comment_fingerprint(self, comment):
+        """
+        投稿者名・メッセージ・投稿時刻から、同じコメントに対して常に同じ値になるフィンガープリントを返します。
+        """
+        if isinstance(comment, dict):
+            author = comment.get('author', '')
+            if isinstance(author, dict):
+                author = author.get('name', '')
+            message = comment.get('message', comment.get('text', comment.get('content', '')))
+            timestamp = comment.get('timestamp', comment.get('datetime', ''))
+        elif isinstance(comment, str):
+            author, message, timestamp = '', comment, ''
+        else:
+            author = getattr(comment, 'author', '')
+            author = getattr(author, 'name', author)
+            message = getattr(comment, 'message', '') or str(comment)
+            timestamp = getattr(comment, 'timestamp', getattr(comment, 'datetime', ''))
+        payload = f"{author}\x1f{message}\x1f{timestamp}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
     def _parse_single_comment(self, comment):
         """
         単一のコメントを解析して統一フォーマットで返す
@@ -258,9 +422,13 @@ class YouTubeCommentAdapter:
             # 結果をログ出力
             logging.debug(f"解析結果 - メッセージ: '{message[:100]}...', 投稿者: '{author_name}'")
             
+            amount, is_member, timestamp = self._extract_priority_info(comment)
             return {
                 'message': message.strip(),
-                'author': {'name': author_name}
+                'author': {'name': author_name, 'is_member': is_member},
+                'amount': amount,        # スーパーチャット等の金額 (通常コメントは0)
+                'timestamp': timestamp,  # 投稿時刻 (UNIX秒)
+                'received_at': time.time(), # 取得した時刻 (UNIX秒)
             }
             
         except Exception as e:
@@ -268,6 +436,29 @@ class YouTubeCommentAdapter:
             logging.error(f"コメントデータ: {comment}")
             return None
 
+    def _extract_priority_info(self, comment):
+        """
+        コメントの優先度付けに使う情報 (金額・メンバーシップ・投稿時刻) を抽出します。
+        """
+        def field(obj, name, default=None):
+            if isinstance(obj, dict):
+                return obj.get(name, default)
+            return getattr(obj, name, default)
+
+        author = field(comment, 'author', {})
+        try:
+            amount = float(field(comment, 'amountValue', field(comment, 'amount', 0.0)) or 0.0)
+        except (TypeError, ValueError):
+            amount = 0.0
+        is_member = bool(field(author, 'isChatSponsor', field(author, 'is_member', False)))
+        try:
+            timestamp = float(field(comment, 'timestamp'))
+            if timestamp > 1e11:
+                timestamp /= 1000 # pytchatのtimestampはミリ秒
+        except (TypeError, ValueError):
+            timestamp = time.time()
+        return amount, is_member, timestamp
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("YouTubeCommentAdapterのテストを開始します。")